@@ -71,12 +71,11 @@ class BasicAuth(Auth):
         if user_pwd is None or type(user_pwd) is not str:
             return None
         try:
-            users = User.search({"email": user_email})
-            if users is None:
+            user = User.query().filter(email=user_email).first()
+            if user is None:
                 return None
-            for user in users:
-                if user.is_valid_password(user_pwd):
-                    return user
+            if user.is_valid_password(user_pwd):
+                return user
             return None
         except Exception:
             return None
@@ -1,21 +1,60 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from contextlib import nullcontext
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import Callable, TypeVar, List, Iterable, Iterator, Tuple
+from os import path, getenv
+from models.identity import IDENTITY_MAP
+from models.index import IdIndex, Index
+from models.journal import Journal
+from models.query import Query
+from models.lock import FileLock
+from models.serializers import from_epoch, serializer, snapshot_serializers
+from models.version import SharedVersion
+import os
+import sys
+import time
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+STORAGE_MODE = getenv('STORAGE_MODE', 'journal')
+JOURNAL_MAX_RECORDS = int(getenv('JOURNAL_MAX_RECORDS', '10000'))
+JOURNAL_FSYNC = getenv('JOURNAL_FSYNC', '0') == '1'
 DATA = {}
+INDEXES = {}
+JOURNALS = {}
+OBSERVERS = {}
+LOCKS = {}
+VERSIONS = {}
+SEEN = {}
+LAGS = {}
+PENDING = {}
+
+
+def parse_timestamp(value) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT date, or seconds since the epoch
+
+    TIMESTAMP_FORMAT being ISO 8601, fromisoformat can parse it,
+    many times faster than strptime.
+    """
+    if type(value) is int:
+        return from_epoch(value)
+    return datetime.fromisoformat(value)
 
 
 class Base():
     """ Base class
+
+    Attributes live in `__slots__` rather than in a `__dict__`, and
+    the timestamps read from a file are kept as strings until first
+    accessed: subclasses must declare their own `__slots__`.
     """
 
+    __slots__ = ('id', '_created_at', '_updated_at')
+    __indexes__ = (IdIndex(),)
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
@@ -23,17 +62,54 @@ class Base():
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
-        if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
-        else:
-            self.created_at = datetime.utcnow()
-        if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
-        else:
-            self.updated_at = datetime.utcnow()
+        obj_id = kwargs.get('id')
+        self.id = sys.intern(obj_id) if type(obj_id) is str \
+            else str(uuid.uuid4())
+        self._created_at = kwargs.get('created_at') or datetime.utcnow()
+        self._updated_at = kwargs.get('updated_at') or datetime.utcnow()
+
+    @property
+    def created_at(self) -> datetime:
+        """ Creation date, parsed on first access
+        """
+        if type(self._created_at) is not datetime:
+            self._created_at = parse_timestamp(self._created_at)
+        return self._created_at
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """ Setter of the creation date
+        """
+        self._created_at = value
+
+    @property
+    def updated_at(self) -> datetime:
+        """ Last update date, parsed on first access
+        """
+        if type(self._updated_at) is not datetime:
+            self._updated_at = parse_timestamp(self._updated_at)
+        return self._updated_at
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """ Setter of the last update date
+        """
+        self._updated_at = value
+
+    @classmethod
+    def fields(cls) -> List[str]:
+        """ Attribute names of the class, in declaration order
+        """
+        fields = cls.__dict__.get('_fields')
+        if fields is None:
+            fields = []
+            for klass in reversed(cls.__mro__):
+                for name in klass.__dict__.get('__slots__', ()):
+                    if name in ('_created_at', '_updated_at'):
+                        name = name[1:]
+                    fields.append(name)
+            setattr(cls, '_fields', fields)
+        return fields
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -48,64 +124,422 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        for key in self.__class__.fields():
             if not for_serialization and key[0] == '_':
                 continue
+            if key == 'created_at' or key == 'updated_at':
+                value = getattr(self, '_' + key)
+                if type(value) is int:
+                    value = getattr(self, key)
+            else:
+                value = getattr(self, key, None)
             if type(value) is datetime:
                 result[key] = value.strftime(TIMESTAMP_FORMAT)
             else:
                 result[key] = value
         return result
 
+    @classmethod
+    def snapshot_path(cls, extension: str = 'json') -> str:
+        """ Path of the snapshot of the class in a given format
+        """
+        return ".db_{}.{}".format(cls.__name__, extension)
+
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
+
+        The most recent snapshot is read first, whatever its format,
+        then the journal records written since the last compaction
+        are replayed on top of it. The deferred saves and removes of
+        this process, not persisted yet, are applied again last.
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        with cls.lock():
+            objs = DATA.get(s_class, {})
+            pending = {obj_id: objs.get(obj_id)
+                       for obj_id in PENDING.get(s_class, ())}
+            DATA[s_class] = {}
+            INDEXES[s_class] = None
+            snapshots = [(path.getmtime(cls.snapshot_path(s.extension)), s)
+                         for s in snapshot_serializers()
+                         if path.exists(cls.snapshot_path(s.extension))]
+            if len(snapshots) > 0:
+                _, latest = max(snapshots, key=lambda snapshot: snapshot[0])
+                objs_json = latest.load(cls.snapshot_path(latest.extension))
+                for obj_json in objs_json.values():
+                    obj = cls(**obj_json)
+                    DATA[s_class][obj.id] = obj
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+            journal = cls.journal()
+            for record in journal.replay():
+                cls.apply(record)
+            for obj_id, obj in pending.items():
+                if obj is None:
+                    DATA[s_class].pop(obj_id, None)
+                else:
+                    DATA[s_class][obj_id] = obj
+            cls.reindex()
+            SEEN[s_class] = cls.version().read()
 
     @classmethod
     def save_to_file(cls):
-        """ Save all objects to file
+        """ Save all objects to file, in the STORAGE_FORMAT format
+
+        The journal is emptied, as the snapshot holds all its changes,
+        and the other processes reload the snapshot. The snapshot is
+        fsynced first, whatever JOURNAL_FSYNC, so that a crash never
+        loses the records it replaces.
+        """
+        with cls.lock():
+            cls.write_snapshot(True)
+            PENDING.pop(cls.__name__, None)
+            cls.journal().truncate()
+            SEEN[cls.__name__] = cls.version().bump(generation=True)
+
+    @classmethod
+    def write_snapshot(cls, fsync: bool = False):
+        """ Write all objects to the snapshot file
+        """
+        s_class = cls.__name__
+        with cls.lock():
+            objs_json = {}
+            for obj_id, obj in list(DATA[s_class].items()):
+                objs_json[obj_id] = obj.to_json(True)
+
+            snapshot = serializer()
+            snapshot.dump(objs_json, cls.snapshot_path(snapshot.extension),
+                          fsync)
+
+    @classmethod
+    def lock(cls) -> FileLock:
+        """ Lock on the files of the class, to hold while writing them
+        """
+        s_class = cls.__name__
+        if LOCKS.get(s_class) is None:
+            LOCKS[s_class] = FileLock(".db_{}.lock".format(s_class))
+        return LOCKS[s_class]
+
+    @classmethod
+    def version(cls) -> SharedVersion:
+        """ Version counter of the class files, shared by processes
+        """
+        s_class = cls.__name__
+        if VERSIONS.get(s_class) is None:
+            VERSIONS[s_class] = SharedVersion(".db_{}.version".format(s_class))
+        return VERSIONS[s_class]
+
+    @classmethod
+    def refresh(cls):
+        """ Catch up with the changes written by other processes
+
+        Compares the shared version with the last one seen, which
+        costs no system call: on a new version, the journal records
+        appended meanwhile are applied one by one, on a new generation
+        the files are loaded again. Either way, the deferred saves and
+        removes of this process win over the changes to the same
+        objects. Only for classes loaded from file.
+        """
+        s_class = cls.__name__
+        if s_class not in SEEN or cls.version().read() == SEEN[s_class]:
+            return
+        with cls.lock():
+            seen = cls.version().read()
+            journal = cls.journal()
+            if seen[0] != SEEN[s_class][0] or journal.size() < journal.offset:
+                cls.load_from_file()
+                return
+            now = time.time()
+            deferred = PENDING.get(s_class, {})
+            for record in journal.replay(journal.offset):
+                if record['id'] in deferred:
+                    continue
+                previous = DATA[s_class].get(record['id'])
+                cls.apply(record)
+                obj = DATA[s_class].get(record['id'])
+                for index in cls.indexes():
+                    if obj is None:
+                        index.discard(record['id'])
+                    else:
+                        index.add(obj)
+                if obj is not None:
+                    cls.notify('save', obj)
+                elif previous is not None:
+                    cls.notify('remove', previous)
+                if record.get('pid') != os.getpid() and 'at' in record:
+                    cls.record_lag(now - record['at'])
+            SEEN[s_class] = seen
+
+    @classmethod
+    def record_lag(cls, seconds: float):
+        """ Account the propagation lag of a change from another process
+        """
+        lag = LAGS.setdefault(cls.__name__,
+                              {"changes": 0, "total": 0.0, "max": 0.0})
+        lag["changes"] += 1
+        lag["total"] += seconds
+        lag["max"] = max(lag["max"], seconds)
+
+    @classmethod
+    def lag_stats(cls) -> dict:
+        """ Number of changes received from other processes, with their
+        average and maximum propagation lag in seconds
+        """
+        lag = LAGS.get(cls.__name__, {"changes": 0, "total": 0.0, "max": 0.0})
+        return {"changes": lag["changes"],
+                "avg": lag["total"] / lag["changes"] if lag["changes"] else 0,
+                "max": lag["max"]}
+
+    @classmethod
+    def journal(cls) -> Journal:
+        """ Journal of the class mutations
+        """
+        s_class = cls.__name__
+        if JOURNALS.get(s_class) is None:
+            file_path = ".db_{}.journal".format(s_class)
+            JOURNALS[s_class] = Journal(file_path, JOURNAL_FSYNC)
+        return JOURNALS[s_class]
+
+    @classmethod
+    def apply(cls, record: dict):
+        """ Apply one journal record to DATA
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        if record.get('op') == 'save':
+            DATA[s_class][record['id']] = cls(**record['obj'])
+        elif record.get('op') == 'remove':
+            DATA[s_class].pop(record['id'], None)
+
+    @classmethod
+    def persist(cls, records: List[dict], fsync: bool = False):
+        """ Persist mutations already applied to DATA
+
+        The records are appended to the journal, tagged with the pid
+        and the time, so that other processes can apply them. The
+        journal is compacted into the snapshot instead once it would
+        hold JOURNAL_MAX_RECORDS records. The journal alone makes the
+        records durable: with `fsync` or JOURNAL_FSYNC, a persist costs
+        one fsync of the appended lines.
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        In `snapshot` storage mode, for tools reading the snapshot file,
+        the whole snapshot is also rewritten and fsynced each time,
+        which costs O(objects) per persist.
+
+        The files are locked meanwhile, and the changes written by
+        other processes are merged first, so that none is lost.
+        Save records without an `obj` are completed from DATA, only
+        when they go to the journal.
+
+        Saved objects breaking a unique index against the merged
+        changes aren't written: the class is loaded again from file,
+        once the other records are, and ValueError is raised.
+        """
+        s_class = cls.__name__
+        with cls.lock():
+            pending = {record['id']: DATA[s_class].get(record['id'])
+                       for record in records}
+            deferred = PENDING.get(s_class, {})
+            for obj_id in pending:
+                deferred.pop(obj_id, None)
+            cls.refresh()
+            for obj_id, obj in pending.items():
+                indexes = cls.indexes()
+                if obj is None:
+                    DATA[s_class].pop(obj_id, None)
+                    for index in indexes:
+                        index.discard(obj_id)
+                elif DATA[s_class].get(obj_id) is not obj:
+                    DATA[s_class][obj_id] = obj
+                    for index in indexes:
+                        index.add(obj)
+            used = cls.unique_conflicts(pending.values())
+            if len(used) > 0:
+                for obj_id in used:
+                    DATA[s_class].pop(obj_id, None)
+                    for index in cls.indexes():
+                        index.discard(obj_id)
+                records = [record for record in records
+                           if record['id'] not in used]
+            journal = cls.journal()
+            if journal.count + len(records) >= JOURNAL_MAX_RECORDS:
+                cls.compact()
+            elif len(records) > 0:
+                pid, now = os.getpid(), time.time()
+                entries = []
+                for record in records:
+                    if record['op'] == 'save' and 'obj' not in record:
+                        obj = pending[record['id']]
+                        if obj is None:
+                            continue
+                        record = dict(record, obj=obj.to_json(True))
+                    entries.append(dict(record, pid=pid, at=now))
+                journal.append(entries, fsync)
+                if STORAGE_MODE != 'journal':
+                    cls.write_snapshot(fsync)
+                SEEN[s_class] = cls.version().bump()
+            if len(used) > 0:
+                cls.load_from_file()
+                raise ValueError("{} already used".format(
+                    ", ".join(sorted(set(used.values())))))
 
-    def save(self):
+    @classmethod
+    def unique_conflicts(cls, objs: Iterable[TypeVar('Base')]) -> dict:
+        """ Map the ids of the `objs` breaking a unique index to the
+        attributes of that index
+        """
+        unique = [index for index in cls.indexes() if index.unique]
+        used = {}
+        for obj in objs:
+            for index in unique:
+                if obj is not None and index.conflict(obj):
+                    used[obj.id] = ", ".join(index.attributes)
+                    break
+        return used
+
+    @classmethod
+    def compact(cls):
+        """ Write the snapshot and empty the journal
+        """
+        cls.save_to_file()
+
+    @classmethod
+    def observe(cls, callback: Callable):
+        """ Call `callback(event, obj)` after each `save` or `remove`
+        of an object of the class
+        """
+        OBSERVERS.setdefault(cls.__name__, []).append(callback)
+
+    @classmethod
+    def notify(cls, event: str, obj: TypeVar('Base')):
+        """ Call the observers of the class
+        """
+        for callback in OBSERVERS.get(cls.__name__, []):
+            callback(event, obj)
+
+    @classmethod
+    def indexes(cls) -> List[Index]:
+        """ Secondary indexes of the class, built on first use
+        """
+        s_class = cls.__name__
+        if INDEXES.get(s_class) is None:
+            INDEXES[s_class] = [index.copy() for index in cls.__indexes__]
+            for index in INDEXES[s_class]:
+                index.build(DATA.get(s_class, {}).values())
+        return INDEXES[s_class]
+
+    @classmethod
+    def reindex(cls):
+        """ Rebuild all secondary indexes from DATA
+        """
+        INDEXES[cls.__name__] = None
+        cls.indexes()
+
+    def save(self, deferred: bool = False):
         """ Save current object
+
+        A deferred save only updates DATA and the indexes, and is kept
+        across reloads from file: the caller is then responsible for
+        calling `persist`. Otherwise the files
+        stay locked from the unique index checks to the write, so that
+        no other process saves a conflicting object meanwhile.
         """
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with nullcontext() if deferred else self.__class__.lock():
+            self.__class__.refresh()
+            indexes = self.__class__.indexes()
+            for index in indexes:
+                if index.conflict(self):
+                    raise ValueError("{} already used".format(
+                        ", ".join(index.attributes)))
+            self.updated_at = datetime.utcnow()
+            DATA[s_class][self.id] = self
+            IDENTITY_MAP.put((s_class, self.id), self)
+            for index in indexes:
+                index.add(self)
+            if deferred:
+                PENDING.setdefault(s_class, {})[self.id] = None
+            else:
+                self.__class__.persist([{"op": "save", "id": self.id,
+                                         "obj": self.to_json(True)}])
+        self.__class__.notify('save', self)
+
+    @classmethod
+    def save_all(cls, objs: Iterable[TypeVar('Base')],
+                 deferred: bool = False) -> List[Tuple[int, str]]:
+        """ Save many objects with a single persistence flush
+
+        Objects breaking a unique index, against the stored objects or
+        the objects before them in `objs`, are skipped: the position
+        and the error of each one are returned. A batch large next to
+        the stored objects rebuilds the indexes once rather than
+        updating them object by object. Unless `deferred`, the files
+        stay locked from the checks to the write, as in `save`.
+        """
+        s_class = cls.__name__
+        with nullcontext() if deferred else cls.lock():
+            cls.refresh()
+            indexes = cls.indexes()
+            unique = [(index, set()) for index in indexes if index.unique]
+            saved, errors = [], []
+            now = datetime.utcnow()
+            for position, obj in enumerate(objs):
+                used = None
+                for index, keys in unique:
+                    key = index.key(obj)
+                    if index.conflict(obj) or \
+                            (index.complete(key) and key in keys):
+                        used = index
+                        break
+                if used is not None:
+                    errors.append((position, "{} already used".format(
+                        ", ".join(used.attributes))))
+                    continue
+                for index, keys in unique:
+                    keys.add(index.key(obj))
+                obj.updated_at = now
+                DATA[s_class][obj.id] = obj
+                IDENTITY_MAP.put((s_class, obj.id), obj)
+                saved.append(obj)
+            if len(saved) * 16 > len(DATA[s_class]):
+                cls.reindex()
+            else:
+                for obj in saved:
+                    for index in indexes:
+                        index.add(obj)
+            if deferred:
+                PENDING.setdefault(s_class, {}).update(
+                    (obj.id, None) for obj in saved)
+            elif len(saved) > 0:
+                cls.persist([{"op": "save", "id": obj.id} for obj in saved])
+        for obj in saved:
+            cls.notify('save', obj)
+        return errors
 
-    def remove(self):
+    def remove(self, deferred: bool = False):
         """ Remove object
+
+        A deferred remove only updates DATA and the indexes, and is
+        kept across reloads from file: the caller is then responsible
+        for calling `persist`.
         """
         s_class = self.__class__.__name__
         if DATA[s_class].get(self.id) is not None:
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            IDENTITY_MAP.put((s_class, self.id), None)
+            for index in self.__class__.indexes():
+                index.discard(self.id)
+            if deferred:
+                PENDING.setdefault(s_class, {})[self.id] = None
+            else:
+                self.__class__.persist([{"op": "remove", "id": self.id}])
+            self.__class__.notify('remove', self)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
         s_class = cls.__name__
+        cls.refresh()
         return len(DATA[s_class].keys())
 
     @classmethod
@@ -114,24 +548,76 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def page(cls, limit: int, after: str = None) -> List[TypeVar('Base')]:
+        """ Return up to `limit` objects ordered by ID,
+        starting after the ID `after`
+        """
+        s_class = cls.__name__
+        cls.refresh()
+        objs = DATA[s_class]
+        index = [index for index in cls.indexes()
+                 if isinstance(index, IdIndex)][0]
+        cursor = None if after is None else (after, after)
+        return [objs[obj_id] for obj_id in index.slice(cursor, limit)
+                if obj_id in objs]
+
+    @classmethod
+    def iterate(cls, chunk_size: int = 1000) -> Iterator[TypeVar('Base')]:
+        """ Yield all objects ordered by ID, one page at a time,
+        so that objects saved or removed meanwhile don't break the loop
+        """
+        after = None
+        while True:
+            objs = cls.page(chunk_size, after)
+            for obj in objs:
+                yield obj
+            if len(objs) < chunk_size:
+                return
+            after = objs[-1].id
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
+
+        Within a unit of work of IDENTITY_MAP, each ID is looked up
+        once, the later calls return the same object.
         """
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+
+        def fetch():
+            cls.refresh()
+            return DATA[s_class].get(id)
+        return IDENTITY_MAP.lookup((s_class, id), fetch)
+
+    @classmethod
+    def index_for(cls, attributes: dict) -> Index:
+        """ Best index covering the searched attributes, if any
+
+        Unique indexes are preferred, then the ones covering
+        the most attributes.
+        """
+        best = None
+        for index in cls.indexes():
+            if not index.covers(attributes.keys()):
+                continue
+            if best is None or (index.unique, len(index.attributes)) > \
+                    (best.unique, len(best.attributes)):
+                best = index
+        return best
+
+    @classmethod
+    def query(cls) -> Query:
+        """ Lazy query over all objects, to refine with predicates,
+        ordering and limits
+        """
+        return Query(cls)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+
+        Uses a secondary index when one covers the searched attributes,
+        otherwise scans all objects.
         """
-        s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        return cls.query().filter(attributes).all()
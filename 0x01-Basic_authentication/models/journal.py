@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+""" Journal module
+"""
+from typing import Iterator, List
+from os import path
+import json
+import os
+
+
+class Journal():
+    """ Append-only log of the mutations of one model class
+
+    Each line is one JSON record:
+      - {"op": "save", "id": ..., "obj": {...}}
+      - {"op": "remove", "id": ...}
+    `Base` adds the pid of the writer and the time, as "pid" and "at".
+
+    `offset` is the size of the part of the file already read or
+    written by this process: records past it come from another one.
+    """
+
+    def __init__(self, file_path: str, fsync: bool = False):
+        """ Initialize a Journal stored in `file_path`
+        """
+        self.file_path = file_path
+        self.fsync = fsync
+        self.count = 0
+        self.offset = 0
+        self.__file = None
+
+    def append(self, records: List[dict], fsync: bool = False):
+        """ Append records and flush them to the OS in one write
+
+        The write is also fsynced if `fsync` or the journal `fsync`
+        setting is true.
+        """
+        if len(records) == 0:
+            return
+        if self.__file is None:
+            self.__file = open(self.file_path, 'ab')
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        data = data.encode()
+        self.__file.write(data)
+        self.__file.flush()
+        if fsync or self.fsync:
+            os.fsync(self.__file.fileno())
+        self.count += len(records)
+        self.offset += len(data)
+
+    def replay(self, offset: int = 0) -> Iterator[dict]:
+        """ Yield all complete records, starting at `offset`
+
+        A torn last line, left by a crash during an append,
+        is cut off the file so that new records start clean.
+        """
+        if offset == 0:
+            self.count = 0
+        self.offset = offset
+        if not path.exists(self.file_path):
+            return
+        valid = offset
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid += len(line)
+                self.count += 1
+                self.offset = valid
+                yield record
+        if valid < path.getsize(self.file_path):
+            self.close()
+            with open(self.file_path, 'r+b') as f:
+                f.truncate(valid)
+
+    def truncate(self):
+        """ Drop all records, once they are part of a snapshot
+        """
+        self.close()
+        open(self.file_path, 'w').close()
+        self.count = 0
+        self.offset = 0
+
+    def size(self) -> int:
+        """ Size of the journal file
+        """
+        try:
+            return os.stat(self.file_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def close(self):
+        """ Close the append handle
+        """
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
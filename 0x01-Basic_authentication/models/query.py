@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+""" Query module
+"""
+from itertools import islice
+from models.index import SortedIndex
+from typing import Any, Iterator, List, Tuple, TypeVar
+
+
+class Query():
+    """ Lazy query over the objects of a model class
+
+    Built by `Base.query()` and chained:
+
+        User.query().filter(email="bob@hbtn.io").first()
+        User.query().prefix("email", "bob").order_by("email").limit(10)
+        User.query().between("id", "a", "b").all()
+
+    Iterating runs the query one object at a time, so `first` or a
+    limit stop as soon as enough objects matched. The candidates come
+    from the best index for the predicates: an index covering the
+    equalities, else a SortedIndex on a range or prefix attribute,
+    else a SortedIndex on the `order_by` attribute, else all objects.
+    Each candidate is then checked against every predicate.
+    """
+
+    def __init__(self, model: type):
+        """ Initialize a Query matching all objects of `model`
+        """
+        self.model = model
+        self.equals = {}
+        self.ranges = []
+        self.prefixes = []
+        self.order = None
+        self.descending = False
+        self.skip = 0
+        self.count_max = None
+
+    def filter(self, attributes: dict = None, **kwargs) -> 'Query':
+        """ Match objects whose attributes equal the given values
+        """
+        self.equals.update(attributes or {}, **kwargs)
+        return self
+
+    def prefix(self, attribute: str, value: str) -> 'Query':
+        """ Match objects whose `attribute` is a string starting
+        with `value`
+        """
+        self.prefixes.append((attribute, value))
+        return self
+
+    def between(self, attribute: str, low: Any = None,
+                high: Any = None) -> 'Query':
+        """ Match objects with `low <= attribute < high`, a None bound
+        being open; None values never match
+        """
+        self.ranges.append((attribute, low, high))
+        return self
+
+    def order_by(self, attribute: str, descending: bool = False) -> 'Query':
+        """ Sort the results by `attribute`, None values last
+        (first when `descending`)
+        """
+        self.order = attribute
+        self.descending = descending
+        return self
+
+    def limit(self, count: int) -> 'Query':
+        """ Return at most `count` objects
+        """
+        self.count_max = count
+        return self
+
+    def offset(self, count: int) -> 'Query':
+        """ Skip the first `count` matching objects
+        """
+        self.skip = count
+        return self
+
+    def first(self) -> TypeVar('Base'):
+        """ First matching object, None if there is none
+        """
+        return next(iter(self), None)
+
+    def all(self) -> List[TypeVar('Base')]:
+        """ All matching objects
+        """
+        return list(self)
+
+    def count(self) -> int:
+        """ Number of matching objects
+        """
+        return sum(1 for _ in self)
+
+    def __iter__(self) -> Iterator[TypeVar('Base')]:
+        """ Matching objects, computed as they are consumed
+        """
+        from models.base import DATA
+        self.model.refresh()
+        objs = DATA[self.model.__name__]
+        ids, ordered = self.candidates()
+        if ids is None:
+            candidates = list(objs.values())
+        else:
+            candidates = (objs.get(obj_id) for obj_id in ids)
+        results = (obj for obj in candidates
+                   if obj is not None and self.matches(obj))
+        if self.order is not None and not ordered:
+            results = iter(sorted(results, key=self.sort_key,
+                                  reverse=self.descending))
+        stop = None if self.count_max is None else self.skip + self.count_max
+        return islice(results, self.skip, stop)
+
+    def matches(self, obj: TypeVar('Base')) -> bool:
+        """ Does `obj` match all the predicates
+        """
+        for attribute, value in self.equals.items():
+            if getattr(obj, attribute, None) != value:
+                return False
+        for attribute, value in self.prefixes:
+            current = getattr(obj, attribute, None)
+            if type(current) is not str or not current.startswith(value):
+                return False
+        for attribute, low, high in self.ranges:
+            current = getattr(obj, attribute, None)
+            try:
+                if current is None or (low is not None and current < low) \
+                        or (high is not None and current >= high):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def sort_key(self, obj: TypeVar('Base')) -> Tuple:
+        """ Sort key of an object, None values last
+        """
+        value = getattr(obj, self.order, None)
+        return (value is None, value)
+
+    def candidates(self) -> Tuple[Iterator[str], bool]:
+        """ Ids to check from the best index, None to check all objects,
+        and whether they come in the requested order
+        """
+        if len(self.equals) > 0:
+            index = self.model.index_for(self.equals)
+            if index is not None:
+                try:
+                    return index.lookup(self.equals), False
+                except TypeError:
+                    pass
+        sorted_indexes = {index.attributes[0]: index
+                          for index in self.model.indexes()
+                          if isinstance(index, SortedIndex) and
+                          len(index.attributes) == 1}
+        bounds = [(attribute, low, high)
+                  for attribute, low, high in self.ranges]
+        for attribute, value in self.prefixes:
+            if len(value) > 0 and ord(value[-1]) < 0x10ffff:
+                bounds.append((attribute, value,
+                               value[:-1] + chr(ord(value[-1]) + 1)))
+        for attribute, low, high in bounds:
+            index = sorted_indexes.get(attribute)
+            if index is None:
+                continue
+            try:
+                ids = index.scan(low, high)
+            except TypeError:
+                continue
+            if self.order != attribute:
+                return ids, False
+            return (reversed(ids) if self.descending else ids), True
+        index = sorted_indexes.get(self.order)
+        if index is not None:
+            return index.ordered(self.descending), True
+        return None, False
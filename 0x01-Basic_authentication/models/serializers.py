@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+""" Serializers module
+"""
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict
+import json
+import mmap
+import os
+import struct
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+EPOCH = datetime(1970, 1, 1)
+TIMESTAMP_FIELDS = ('created_at', 'updated_at')
+
+
+def to_epoch(value) -> int:
+    """ Seconds since the epoch of a naive UTC datetime,
+    or of a TIMESTAMP_FORMAT string
+    """
+    if value is None or type(value) is int:
+        return value
+    if type(value) is str:
+        value = datetime.fromisoformat(value)
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+def from_epoch(value: int) -> datetime:
+    """ Naive UTC datetime of seconds since the epoch
+    """
+    return EPOCH + timedelta(seconds=value)
+
+
+class Serializer():
+    """ Reads and writes the snapshot of one model class
+
+    A snapshot maps object ids to the `to_json(True)` dictionary
+    of the objects. Serializers with `epoch` set store the timestamps
+    as seconds since the epoch, `Base` accepts both forms.
+    """
+    name = None
+    extension = None
+    epoch = False
+
+    def dump(self, objs: Dict[str, dict], file_path: str,
+             fsync: bool = False):
+        """ Write `objs` to `file_path` atomically
+
+        The snapshot is written and fsynced to a temporary file, then
+        renamed over `file_path`: readers and crashes see either the
+        old or the new snapshot, never a partial one. With `fsync`,
+        the directory is fsynced too, making the rename durable. `Base`
+        only writes snapshots on compaction, except in `snapshot`
+        storage mode.
+        """
+        if self.epoch:
+            for obj in objs.values():
+                for field in TIMESTAMP_FIELDS:
+                    if field in obj:
+                        obj[field] = to_epoch(obj[field])
+        tmp_path = "{}.{}.tmp".format(file_path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self.dumps(objs))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if fsync:
+            directory = os.open(os.path.dirname(file_path) or '.',
+                                os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+    def load(self, file_path: str) -> Dict[str, dict]:
+        """ Read the snapshot in `file_path`
+        """
+        with open(file_path, 'rb') as f:
+            return self.loads(f.read())
+
+    def dumps(self, objs: Dict[str, dict]) -> bytes:
+        """ Encode a snapshot
+        """
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Dict[str, dict]:
+        """ Decode a snapshot
+        """
+        raise NotImplementedError
+
+
+class JSONSerializer(Serializer):
+    """ Standard library JSON, the historical `.db_<Class>.json` format
+    """
+    name = 'json'
+    extension = 'json'
+
+    def dumps(self, objs: Dict[str, dict]) -> bytes:
+        """ Encode a snapshot
+        """
+        return json.dumps(objs).encode()
+
+    def loads(self, data: bytes) -> Dict[str, dict]:
+        """ Decode a snapshot
+        """
+        return json.loads(data)
+
+
+class ORJSONSerializer(JSONSerializer):
+    """ Same files as JSONSerializer, encoded and decoded by orjson
+    """
+    name = 'orjson'
+
+    def dumps(self, objs: Dict[str, dict]) -> bytes:
+        """ Encode a snapshot
+        """
+        return orjson.dumps(objs)
+
+    def loads(self, data: bytes) -> Dict[str, dict]:
+        """ Decode a snapshot
+        """
+        return orjson.loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    """ MessagePack snapshot with epoch timestamps
+    """
+    name = 'msgpack'
+    extension = 'msgpack'
+    epoch = True
+
+    def dumps(self, objs: Dict[str, dict]) -> bytes:
+        """ Encode a snapshot
+        """
+        return msgpack.packb(objs)
+
+    def loads(self, data: bytes) -> Dict[str, dict]:
+        """ Decode a snapshot
+        """
+        return msgpack.unpackb(data)
+
+
+class BinarySerializer(Serializer):
+    """ Column-oriented binary snapshot with epoch timestamps,
+    read through mmap
+
+    Layout, little endian:
+      - header: magic `BSN1`, number of columns, number of objects
+      - each column: name length (uint16), UTF-8 name, kind (uint8),
+        payload length (uint64), payload
+
+    Every payload starts with one byte per object, 1 for None. Then:
+      - `INTEGERS`: one int64 per object
+      - `STRINGS`: n + 1 uint64 offsets, then the UTF-8 values
+      - `OTHERS`: the same, with JSON-encoded values
+
+    Each column being contiguous, the i-th value of a mapped file is
+    found in O(1), and whole columns decode with few Python calls.
+    """
+    name = 'binary'
+    extension = 'bin'
+    epoch = True
+    MAGIC = b'BSN1'
+    HEADER = struct.Struct('<4sII')
+    COLUMN = struct.Struct('<BQ')
+    NAME = struct.Struct('<H')
+    INTEGERS, STRINGS, OTHERS = range(3)
+
+    def dumps(self, objs: Dict[str, dict]) -> bytes:
+        """ Encode a snapshot
+        """
+        fields = []
+        for obj in objs.values():
+            for field in obj:
+                if field not in fields:
+                    fields.append(field)
+        parts = [self.HEADER.pack(self.MAGIC, len(fields), len(objs))]
+        for field in fields:
+            values = [obj.get(field) for obj in objs.values()]
+            kind, payload = self.pack(values)
+            name = field.encode()
+            parts.append(self.NAME.pack(len(name)) + name +
+                         self.COLUMN.pack(kind, len(payload)))
+            parts.append(payload)
+        return b''.join(parts)
+
+    def pack(self, values: list):
+        """ Encode one column, return its kind and payload
+        """
+        nulls = bytes(value is None for value in values)
+        present = [value for value in values if value is not None]
+        if all(type(value) is int and -2 ** 63 <= value < 2 ** 63
+               for value in present):
+            numbers = array('q', (0 if value is None else value
+                                  for value in values))
+            return self.INTEGERS, nulls + numbers.tobytes()
+        kind = self.STRINGS
+        if not all(type(value) is str for value in present):
+            kind = self.OTHERS
+            values = [None if value is None else json.dumps(value)
+                      for value in values]
+        encoded = [b'' if value is None else value.encode()
+                   for value in values]
+        offsets = array('Q', [0])
+        offsets.extend(accumulate(len(value) for value in encoded))
+        return kind, nulls + offsets.tobytes() + b''.join(encoded)
+
+    def load(self, file_path: str) -> Dict[str, dict]:
+        """ Read the snapshot in `file_path`
+        """
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return {}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self.loads(data)
+
+    def loads(self, data) -> Dict[str, dict]:
+        """ Decode a snapshot
+        """
+        if len(data) == 0:
+            return {}
+        magic, n_fields, n_objs = self.HEADER.unpack_from(data, 0)
+        if magic != self.MAGIC:
+            raise ValueError("Not a binary snapshot")
+        position = self.HEADER.size
+        fields, columns = [], []
+        for _ in range(n_fields):
+            length, = self.NAME.unpack_from(data, position)
+            position += self.NAME.size
+            fields.append(str(data[position:position + length], 'utf-8'))
+            position += length
+            kind, size = self.COLUMN.unpack_from(data, position)
+            position += self.COLUMN.size
+            columns.append(self.unpack(kind, data[position:position + size],
+                                       n_objs))
+            position += size
+        objs = {}
+        for row in zip(*columns):
+            obj = dict(zip(fields, row))
+            objs[obj.get('id')] = obj
+        return objs
+
+    def unpack(self, kind: int, payload: bytes, count: int) -> list:
+        """ Decode one column of `count` values
+        """
+        nulls, payload = payload[:count], payload[count:]
+        if kind == self.INTEGERS:
+            numbers = array('q')
+            numbers.frombytes(payload)
+            values = numbers.tolist()
+        else:
+            offsets = array('Q')
+            offsets.frombytes(payload[:8 * (count + 1)])
+            blob = payload[8 * (count + 1):]
+            text = str(blob, 'utf-8')
+            if len(text) != len(blob):
+                text = blob
+            values = [text[offsets[i]:offsets[i + 1]] for i in range(count)]
+            if text is blob:
+                values = [str(value, 'utf-8') for value in values]
+            if kind == self.OTHERS:
+                values = [None if null else json.loads(value)
+                          for null, value in zip(nulls, values)]
+        if any(nulls):
+            values = [None if null else value
+                      for null, value in zip(nulls, values)]
+        return values
+
+
+SERIALIZERS = {
+    'json': JSONSerializer(),
+    'orjson': ORJSONSerializer(),
+    'msgpack': MsgpackSerializer(),
+    'binary': BinarySerializer(),
+}
+
+
+def serializer(name: str = None) -> Serializer:
+    """ Serializer selected by `name`, or by STORAGE_FORMAT
+
+    `auto` (the default) picks orjson when installed. Missing
+    optional backends fall back to the standard library json.
+    """
+    if name is None:
+        name = os.getenv('STORAGE_FORMAT', 'auto')
+    if name == 'auto':
+        name = 'orjson'
+    if name == 'orjson' and orjson is None:
+        name = 'json'
+    if name == 'msgpack' and msgpack is None:
+        name = 'json'
+    if name not in SERIALIZERS:
+        raise ValueError("Unknown STORAGE_FORMAT: {}".format(name))
+    return SERIALIZERS[name]
+
+
+def snapshot_serializers() -> list:
+    """ Every serializer able to read snapshots in this environment,
+    one per file extension, stdlib json last among the .json ones
+    """
+    found = {}
+    for name in ('orjson', 'json', 'msgpack', 'binary'):
+        candidate = serializer(name)
+        found.setdefault(candidate.extension, candidate)
+    return list(found.values())
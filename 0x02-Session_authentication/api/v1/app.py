@@ -3,10 +3,14 @@
 Route module for the API
 """
 from os import getenv
+from api.v1.auth.auth import PathMatcher
+from api.v1.metrics import METRICS
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
+from models.identity import IDENTITY_MAP
 import os
+import time
 
 
 app = Flask(__name__)
@@ -14,6 +18,7 @@ app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
 auth_type = os.getenv('AUTH_TYPE')
+server_timing_enabled = os.getenv('AUTH_SERVER_TIMING') == '1'
 
 if auth_type == 'auth':
     from api.v1.auth.auth import Auth
@@ -27,6 +32,39 @@ elif auth_type == 'session_auth':
 elif auth_type == 'session_exp_auth':
     from api.v1.auth.session_exp_auth import SessionExpAuth
     auth = SessionExpAuth()
+elif auth_type == 'session_db_auth':
+    from api.v1.auth.session_db_auth import SessionDBAuth
+    auth = SessionDBAuth()
+elif auth_type == 'session_token_auth':
+    from api.v1.auth.session_token_auth import SessionTokenAuth
+    auth = SessionTokenAuth()
+
+excluded_paths = PathMatcher(['/api/v1/status/',
+                              '/api/v1/unauthorized/',
+                              '/api/v1/forbidden/',
+                              '/api/v1/metrics/',
+                              '/api/v1/auth_session/login/'])
+
+
+@app.before_request
+def start_timer():
+    """ Note when the request started, for the metrics
+    """
+    setattr(request, 'started_at', time.perf_counter())
+
+
+@app.before_request
+def begin_identity_map():
+    """ Look up each object at most once per request
+    """
+    IDENTITY_MAP.begin()
+
+
+@app.teardown_request
+def end_identity_map(exception=None):
+    """ Forget the objects looked up by the request
+    """
+    IDENTITY_MAP.end()
 
 
 @app.before_request
@@ -37,19 +75,48 @@ def checker():
         _type_: _description_
     """
     if auth is not None:
-        if auth.require_auth(request.path,
-                             ['/api/v1/status/',
-                              '/api/v1/unauthorized/',
-                              '/api/v1/forbidden/',
-                              '/api/v1/auth_session/login/']) is True:
+        if auth.require_auth(request.path, excluded_paths) is True:
             pass
             cookie = auth.session_cookie(request)
             if auth.authorization_header(
                                         request) is None and cookie is None:
                 abort(401)
-            if auth.current_user(request) is None:
+            if auth.resolve(request).user is None:
                 abort(403)
-        setattr(request, 'current_user', auth.current_user(request))
+        setattr(request, 'current_user', auth.resolve(request).user)
+
+
+@app.after_request
+def server_timing(response):
+    """ Report the authentication stage timings in a Server-Timing header,
+    for debugging only: set AUTH_SERVER_TIMING=1 to enable it
+
+    The stages run tell unauthenticated clients whether an email
+    exists, so the header is off by default; the metrics endpoint
+    aggregates the same timings.
+    """
+    if not server_timing_enabled:
+        return response
+    context = getattr(request, 'auth_context', None)
+    if context is not None and len(context.timings) > 0:
+        response.headers['Server-Timing'] = ", ".join(
+            "auth-{};dur={:.3f}".format(stage, seconds * 1000)
+            for stage, seconds in context.timings.items())
+    return response
+
+
+@app.after_request
+def record_metrics(response):
+    """ Account the request latency and authentication in the metrics
+    """
+    started_at = getattr(request, 'started_at', None)
+    if started_at is not None:
+        rule = request.url_rule
+        METRICS.observe_request(
+            request.method, rule.rule if rule is not None else 'unmatched',
+            response.status_code, time.perf_counter() - started_at,
+            getattr(request, 'auth_context', None))
+    return response
 
 
 @app.errorhandler(404)
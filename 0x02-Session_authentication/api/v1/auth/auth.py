@@ -1,27 +1,106 @@
 #!/usr/bin/env python3
 """ to manage the API authentication.
 """
+from contextlib import contextmanager, nullcontext
 from flask import request
-from typing import List, TypeVar
+from typing import ContextManager, List, TypeVar, Union
 import os
+import time
+
+
+class PathMatcher:
+    """
+    Excluded paths compiled once: exact paths go in a set, paths ending
+    with `*` in a trie of prefixes, so that matching a path costs
+    O(len(path)) whatever the number of rules.
+    """
+    END = None
+
+    def __init__(self, excluded_paths: List[str]):
+        """
+        Compile `excluded_paths`, trailing slashes are ignored
+        """
+        self.exact = set()
+        self.prefixes = {}
+        self.rules = 0
+        for excluded_path in excluded_paths or []:
+            excluded_path = excluded_path.rstrip('/')
+            self.rules += 1
+            if excluded_path.endswith('*'):
+                node = self.prefixes
+                for char in excluded_path[:-1]:
+                    node = node.setdefault(char, {})
+                node[self.END] = True
+            else:
+                self.exact.add(excluded_path)
+
+    def match(self, path: str) -> bool:
+        """
+        Tell if `path` is excluded
+        """
+        path = path.rstrip('/')
+        if path in self.exact:
+            return True
+        node = self.prefixes
+        for char in path:
+            if self.END in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+        return self.END in node
+
+    def __len__(self) -> int:
+        """
+        Number of compiled rules
+        """
+        return self.rules
+
+
+class AuthContext:
+    """
+    Authentication result of one request, with the time spent in each
+    stage (header parse, lookup, verify), in seconds.
+    """
+
+    def __init__(self, method: str):
+        """
+        Start an empty context for the authentication `method`
+        """
+        self.method = method
+        self.user = None
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Add the time spent in the block to the stage `name`
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + \
+                time.perf_counter() - start
 
 
 class Auth:
     """
     Template for all authentication system you will implement.
     """
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], PathMatcher]) -> bool:
         """
         Check if authentication is required for the given path.
+
+        `excluded_paths` is best compiled once into a PathMatcher;
+        a path ending with `*` excludes every path starting with it.
         """
         if path is None or excluded_paths is None or len(excluded_paths) == 0:
             return True
-        path = path.rstrip('/')
-        for execlude_path in excluded_paths:
-            execlude_path = execlude_path.rstrip('/')
-            if execlude_path == path:
-                return False
-        return True
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = PathMatcher(excluded_paths)
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """
@@ -40,6 +119,30 @@ class Auth:
         """
         return None
 
+    def resolve(self, request=None) -> AuthContext:
+        """
+        Authenticate a request once: the AuthContext is stored on the
+        request as `auth_context` and reused by later calls.
+        """
+        context = getattr(request, 'auth_context', None)
+        if context is not None:
+            return context
+        context = AuthContext(self.__class__.__name__)
+        if request is not None:
+            setattr(request, 'auth_context', context)
+        context.user = self.current_user(request)
+        return context
+
+    def stage(self, request, name: str) -> ContextManager:
+        """
+        Time a stage of the authentication of `request`,
+        when it is being resolved
+        """
+        context = getattr(request, 'auth_context', None)
+        if context is None:
+            return nullcontext()
+        return context.stage(name)
+
     def session_cookie(self, request=None):
         """returns a cookie value from a request
         """
@@ -2,14 +2,40 @@
 """ to manage the Basic API authentication.
 """
 from api.v1.auth.auth import Auth
+from models.cache import TTLCache
 from models.user import User
 import base64
+import hashlib
+import hmac
+import os
 from typing import TypeVar
 
 
+CACHE_KEY = os.urandom(32)
+
+
+def _forget_digest(digest: bytes, entry: tuple):
+    """ Drop an evicted header digest from BasicAuth.cached_digests
+    """
+    digests = BasicAuth.cached_digests.get(entry[0])
+    if digests is not None:
+        digests.discard(digest)
+        if len(digests) == 0:
+            del BasicAuth.cached_digests[entry[0]]
+
+
 class BasicAuth(Auth):
     """Class for basic authentication.
+
+    Verified Authorization headers are cached, keyed by their HMAC,
+    so that repeated requests skip decoding, searching and hashing.
     """
+    cached_digests = {}
+    credentials_cache = TTLCache(
+        int(os.getenv('BASIC_AUTH_CACHE_SIZE', '1024')),
+        int(os.getenv('BASIC_AUTH_CACHE_TTL', '60')),
+        _forget_digest)
+
     def extract_base64_authorization_header(self,
                                             authorization_header: str) -> str:
         '''
@@ -61,7 +87,7 @@ class BasicAuth(Auth):
 
     def user_object_from_credentials(self,
                                      user_email: str, user_pwd:
-                                     str) -> TypeVar('User'):
+                                     str, request=None) -> TypeVar('User'):
         '''
         a method that returns
         the User instance based on his email and password.
@@ -71,10 +97,11 @@ class BasicAuth(Auth):
         if user_pwd is None or type(user_pwd) is not str:
             return None
         try:
-            users = User.search({"email": user_email})
-            if users is None:
+            with self.stage(request, 'lookup'):
+                user = User.query().filter(email=user_email).first()
+            if user is None:
                 return None
-            for user in users:
+            with self.stage(request, 'verify'):
                 if user.is_valid_password(user_pwd):
                     return user
             return None
@@ -86,15 +113,54 @@ class BasicAuth(Auth):
         a method that overloads Auth
         and retrieves the User instance for a request
         '''
-        auth_header = self.authorization_header(request)
-        if auth_header is not None:
+        with self.stage(request, 'header'):
+            auth_header = self.authorization_header(request)
+            if auth_header is None:
+                return None
+            digest = self.header_digest(auth_header)
+        with self.stage(request, 'lookup'):
+            cached = self.credentials_cache.get(digest)
+            if cached is not None:
+                user = User.get(cached[0])
+                if user is not None and user.password == cached[1]:
+                    return user
+                self.credentials_cache.pop(digest)
+        with self.stage(request, 'header'):
             code = self.extract_base64_authorization_header(auth_header)
-            if code is not None:
-                decoded_token = self.decode_base64_authorization_header(code)
-                if decoded_token is not None:
-                    credentials = self.extract_user_credentials(decoded_token)
-                    if credentials is not None:
-                        user = self.user_object_from_credentials(
-                            credentials[0], credentials[1])
-                        return user
-        return
+            decoded_token = self.decode_base64_authorization_header(code)
+            credentials = self.extract_user_credentials(decoded_token)
+        user = self.user_object_from_credentials(
+            credentials[0], credentials[1], request)
+        if user is not None:
+            self.cache_credentials(digest, user)
+        return user
+
+    def header_digest(self, authorization_header: str) -> bytes:
+        '''
+        a method that returns the keyed digest
+        used to cache an Authorization header
+        '''
+        return hmac.new(CACHE_KEY, authorization_header.encode(),
+                        hashlib.sha256).digest()
+
+    def cache_credentials(self, digest: bytes, user: TypeVar('User')):
+        '''
+        a method that remembers the user verified for a header digest
+        '''
+        __class__.credentials_cache.set(digest, (user.id, user.password))
+        __class__.cached_digests.setdefault(user.id, set()).add(digest)
+
+    @classmethod
+    def invalidate(cls, event: str, user: TypeVar('User')):
+        '''
+        a method that drops the cached headers of a user
+        removed or saved with a new password
+        '''
+        for digest in list(cls.cached_digests.get(user.id, ())):
+            cached = cls.credentials_cache.peek(digest)
+            if event == 'remove' or cached is None or \
+                    cached[1] != user.password:
+                cls.credentials_cache.pop(digest)
+
+
+User.observe(BasicAuth.invalidate)
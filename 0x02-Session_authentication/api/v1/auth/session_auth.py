@@ -3,30 +3,52 @@
 Definition of class SessionAuth
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import (SessionStore, SessionStoreFull,
+                                       session_store)
+from datetime import datetime
 from models.user import User
 import uuid
 
 
 class SessionAuth(Auth):
     """ Implement Session Authorization protocol methods
+
+    Sessions live in the store selected by SESSION_STORE, by default
+    the in-process dict `user_id_by_session_id`.
     """
     user_id_by_session_id = {}
+    session_timestamps = False
+    session_duration = 0
 
     def __init__(self) -> None:
         """
         inialization
         """
         super().__init__()
+        self.store = self.new_store()
+
+    def new_store(self) -> SessionStore:
+        """
+        Build the session store, expiring its sessions when they
+        have a duration
+        """
+        return session_store(__class__.user_id_by_session_id,
+                             self.session_duration > 0)
 
     def create_session(self, user_id: str = None) -> str:
         """
-        Creates a Session ID for a user with id user_id
+        Creates a Session ID for a user with id user_id,
+        None when the session store is full
         """
         if user_id is None or type(user_id) is not str:
             return None
         else:
             session_id = str(uuid.uuid4())
-            SessionAuth.user_id_by_session_id[session_id] = user_id
+            created_at = datetime.now() if self.session_timestamps else None
+            try:
+                self.store.set(session_id, user_id, created_at)
+            except SessionStoreFull:
+                return None
             return session_id
 
     def user_id_for_session_id(self, session_id: str = None) -> str:
@@ -35,15 +57,21 @@ class SessionAuth(Auth):
         """
         if session_id is None or type(session_id) is not str:
             return None
-        return __class__.user_id_by_session_id.get(session_id)
+        session_dictionary = self.store.get(session_id)
+        if session_dictionary is None:
+            return None
+        return session_dictionary['user_id']
 
     def current_user(self, request=None):
         """
         Return a user instance based on a cookie value
         """
-        session_id = self.session_cookie(request)
-        user_id = self.user_id_for_session_id(session_id)
-        return User.get(user_id)
+        with self.stage(request, 'header'):
+            session_id = self.session_cookie(request)
+        with self.stage(request, 'lookup'):
+            user_id = self.user_id_for_session_id(session_id)
+        with self.stage(request, 'verify'):
+            return User.get(user_id)
 
     def destroy_session(self, request=None):
         """
@@ -57,5 +85,4 @@ class SessionAuth(Auth):
         user_id = self.user_id_for_session_id(session_id)
         if user_id is None:
             return False
-        del self.user_id_by_session_id[session_id]
-        return True
+        return self.store.delete(session_id)
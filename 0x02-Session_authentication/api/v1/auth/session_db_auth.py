@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Definition of class SessionDBAuth
+"""
+from api.v1.auth.session_exp_auth import SessionExpAuth
+from models.batch import WriteBatch
+from models.user_session import UserSession
+import os
+import uuid
+from datetime import datetime, timedelta
+
+
+class SessionDBAuth(SessionExpAuth):
+    """Session authentication class with expiration,
+    storing sessions as UserSession objects.
+
+    Session creates and deletes are persisted in batches of
+    SESSION_DB_BATCH_SIZE records, or SESSION_DB_BATCH_INTERVAL
+    seconds after the first pending one; SESSION_DB_FSYNC=1 fsyncs
+    every batch.
+    """
+
+    def __init__(self) -> None:
+        ''' initialization'''
+        super().__init__()
+        UserSession.load_from_file()
+        try:
+            batch_size = int(os.getenv('SESSION_DB_BATCH_SIZE'))
+        except Exception:
+            batch_size = 100
+        try:
+            batch_interval = float(os.getenv('SESSION_DB_BATCH_INTERVAL'))
+        except Exception:
+            batch_interval = 0.05
+        self.batch = WriteBatch(UserSession, batch_size, batch_interval,
+                                os.getenv('SESSION_DB_FSYNC') == '1')
+
+    def new_store(self):
+        """Sessions live in UserSession objects, without a session store.
+        """
+        return None
+
+    def create_session(self, user_id=None):
+        """Creates and stores a UserSession for the user.
+        """
+        self.sweep_if_due()
+        if user_id is None or type(user_id) is not str:
+            return None
+        session_id = str(uuid.uuid4())
+        user_session = UserSession(user_id=user_id, session_id=session_id)
+        self.batch.save(user_session)
+        return session_id
+
+    def user_session(self, session_id=None):
+        """Retrieves the UserSession of a session id.
+        """
+        if session_id is None or type(session_id) is not str:
+            return None
+        return UserSession.query().filter(session_id=session_id).first()
+
+    def expired(self, user_session) -> bool:
+        """Tells if a UserSession is older than the session duration.
+        """
+        if self.session_duration <= 0:
+            return False
+        exp_time = user_session.created_at + timedelta(
+            seconds=self.session_duration)
+        return exp_time < datetime.utcnow()
+
+    def user_id_for_session_id(self, session_id=None):
+        """Retrieves the user id of the user associated with
+        a given session id, from the stored UserSession.
+        """
+        self.sweep_if_due()
+        user_session = self.user_session(session_id)
+        if user_session is None:
+            return None
+        if self.expired(user_session):
+            self.batch.remove(user_session)
+            self.evicted += 1
+            return None
+        return user_session.user_id
+
+    def destroy_session(self, request=None):
+        """Deletes the UserSession of the request session cookie.
+        """
+        if request is None:
+            return False
+        session_id = self.session_cookie(request)
+        user_session = self.user_session(session_id)
+        if user_session is None:
+            return False
+        self.batch.remove(user_session)
+        return True
+
+    def sweep(self) -> int:
+        """Evicts the expired UserSession objects, found through the
+        created_at index.
+        """
+        if self.session_duration <= 0:
+            return 0
+        created_before = datetime.utcnow() - timedelta(
+            seconds=self.session_duration)
+        expired = UserSession.query().between(
+            'created_at', None, created_before).all()
+        for user_session in expired:
+            self.batch.remove(user_session)
+        self.evicted += len(expired)
+        return len(expired)
+
+    def session_count(self) -> int:
+        """Returns the number of stored UserSession objects.
+        """
+        return UserSession.count()
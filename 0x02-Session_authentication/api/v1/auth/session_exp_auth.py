@@ -4,42 +4,55 @@ Definition of class SessionExpAuth
 """
 from api.v1.auth.session_auth import SessionAuth
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 
 
 class SessionExpAuth(SessionAuth):
     """Session authentication class with expiration.
+
+    Expired sessions are evicted from the store by `sweep`, run at most
+    every SESSION_SWEEP_INTERVAL seconds while handling requests, or by
+    a background thread when SESSION_SWEEP_THREAD is 1.
     """
+    session_timestamps = True
+
     def __init__(self) -> None:
         ''' initialization'''
-        super().__init__()
         try:
             self.session_duration = int(os.getenv('SESSION_DURATION'))
         except Exception:
             self.session_duration = 0
+        super().__init__()
+        try:
+            self.sweep_interval = int(os.getenv('SESSION_SWEEP_INTERVAL'))
+        except Exception:
+            self.sweep_interval = 60
+        self.evicted = 0
+        self.next_sweep = time.monotonic() + self.sweep_interval
+        if os.getenv('SESSION_SWEEP_THREAD') == '1':
+            self.start_sweeper()
 
     def create_session(self, user_id=None):
         """Creates a session id for the user.
         """
-        session_id = super().create_session(user_id)
-        if session_id is None:
-            return None
-        session_dictionary = {"user_id": user_id, "created_at": datetime.now()}
-        self.user_id_by_session_id[session_id] = session_dictionary
-        return session_id
+        self.sweep_if_due()
+        return super().create_session(user_id)
 
     def user_id_for_session_id(self, session_id=None):
         """Retrieves the user id of the user associated with
         a given session id.
         """
-        if session_id is None:
+        self.sweep_if_due()
+        if session_id is None or type(session_id) is not str:
             return None
-        if session_id not in self.user_id_by_session_id.keys():
+        session_dictionary = self.store.get(session_id)
+        if session_dictionary is None:
             return None
-        session_dictionary = self.user_id_by_session_id.get(session_id)
         if self.session_duration <= 0:
             return session_dictionary.get('user_id')
-        if 'created_at' not in session_dictionary.keys():
+        if session_dictionary.get('created_at') is None:
             return None
         current_date = datetime.now()
         session_duration = timedelta(seconds=self.session_duration)
@@ -48,3 +61,40 @@ class SessionExpAuth(SessionAuth):
             return None
         else:
             return session_dictionary['user_id']
+
+    def sweep(self) -> int:
+        """Evicts the expired sessions from the store.
+        """
+        if self.session_duration <= 0:
+            return 0
+        created_before = datetime.now() - timedelta(
+            seconds=self.session_duration)
+        evicted = self.store.expire(created_before)
+        self.evicted += evicted
+        return evicted
+
+    def sweep_if_due(self) -> int:
+        """Sweeps when the last sweep is older than the sweep interval.
+        """
+        now = time.monotonic()
+        if now < self.next_sweep:
+            return 0
+        self.next_sweep = now + self.sweep_interval
+        return self.sweep()
+
+    def start_sweeper(self) -> threading.Thread:
+        """Starts a daemon thread sweeping every sweep interval.
+        """
+        def run():
+            while True:
+                time.sleep(max(self.sweep_interval, 1))
+                self.sweep()
+        thread = threading.Thread(target=run, name='session-sweeper',
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def session_count(self) -> int:
+        """Returns the number of stored sessions.
+        """
+        return len(self.store)
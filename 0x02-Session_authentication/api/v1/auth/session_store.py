@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Session stores used by SessionAuth
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict
+import fcntl
+import heapq
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import zlib
+
+
+class SessionStore:
+    """ Interface of a session store
+
+    A session maps a session ID to a user ID and,
+    optionally, to its creation date.
+    """
+
+    def set(self, session_id: str, user_id: str,
+            created_at: datetime = None) -> None:
+        """
+        Store the session `session_id` of user `user_id`
+        """
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Dict:
+        """
+        Return {"user_id": ..., "created_at": ...} for a session ID,
+        None if unknown
+        """
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Delete a session, return False if it doesn't exist
+        """
+        raise NotImplementedError
+
+    def expire(self, created_before: datetime) -> int:
+        """
+        Delete the sessions created before `created_before`,
+        return how many were deleted
+        """
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        """
+        Number of stored sessions
+        """
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """ Sessions kept in a dict of the current process
+
+    Values are the user ID, or a session dictionary
+    {"user_id": ..., "created_at": ...} when the creation date is known.
+    When sessions expire, dated sessions are also pushed on a min-heap
+    ordered by creation date, so that expired ones are found without
+    scanning the dict. Deleted sessions leave stale heap entries, which
+    are dropped once they make up half of the heap.
+    """
+
+    def __init__(self, sessions: dict = None, expiring: bool = True) -> None:
+        """
+        inialization
+        """
+        self.sessions = sessions if sessions is not None else {}
+        self.expiring = expiring
+        self.__expiry = []
+        self.__stale = 0
+        self.__lock = threading.Lock()
+
+    def set(self, session_id, user_id, created_at=None):
+        """
+        Store a session in the dict
+        """
+        if created_at is None:
+            self.sessions[session_id] = user_id
+            return
+        value = {"user_id": user_id, "created_at": created_at}
+        if not self.expiring:
+            self.sessions[session_id] = value
+            return
+        with self.__lock:
+            previous = self.sessions.get(session_id)
+            self.sessions[session_id] = value
+            heapq.heappush(self.__expiry, (created_at, session_id))
+            if type(previous) is dict:
+                self.__forget()
+
+    def get(self, session_id):
+        """
+        Read a session from the dict
+        """
+        value = self.sessions.get(session_id)
+        if value is None:
+            return None
+        if type(value) is dict:
+            return value
+        return {"user_id": value, "created_at": None}
+
+    def delete(self, session_id):
+        """
+        Delete a session from the dict
+        """
+        with self.__lock:
+            value = self.sessions.pop(session_id, None)
+            if value is None:
+                return False
+            if type(value) is dict and self.expiring:
+                self.__forget()
+        return True
+
+    def __forget(self):
+        """
+        Count a stale heap entry, rebuilding the heap from the live
+        sessions once they make up half of it; the caller holds the lock
+        """
+        self.__stale += 1
+        if self.__stale < 64 or self.__stale * 2 < len(self.__expiry):
+            return
+        self.__expiry = [(created_at, session_id)
+                         for created_at, session_id in self.__expiry
+                         if self.__holds(session_id, created_at)]
+        heapq.heapify(self.__expiry)
+        self.__stale = 0
+
+    def __holds(self, session_id: str, created_at: datetime) -> bool:
+        """
+        Is `session_id` stored with the creation date `created_at`
+        """
+        value = self.sessions.get(session_id)
+        return type(value) is dict and value.get('created_at') == created_at
+
+    def expire(self, created_before):
+        """
+        Pop the heap up to `created_before`, deleting the sessions
+        still holding the popped creation date
+        """
+        deleted = 0
+        with self.__lock:
+            while len(self.__expiry) > 0 and \
+                    self.__expiry[0][0] < created_before:
+                created_at, session_id = heapq.heappop(self.__expiry)
+                if self.__holds(session_id, created_at):
+                    self.sessions.pop(session_id, None)
+                    deleted += 1
+                elif self.__stale > 0:
+                    self.__stale -= 1
+        return deleted
+
+    def heap_size(self) -> int:
+        """
+        Number of entries on the expiry heap, stale ones included
+        """
+        return len(self.__expiry)
+
+    def __len__(self):
+        """
+        Number of sessions in the dict
+        """
+        return len(self.sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """ Sessions kept in a SQLite database in WAL mode,
+    shared by every process opening the same file
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        inialization
+        """
+        self.file_path = file_path
+        self.__local = threading.local()
+        self.connection().execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, "
+            "user_id TEXT NOT NULL, "
+            "created_at REAL)")
+        self.connection().execute(
+            "CREATE INDEX IF NOT EXISTS sessions_created_at "
+            "ON sessions (created_at)")
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Connection of the current thread, reopened after a fork
+        """
+        local = self.__local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(
+                self.file_path, timeout=5, isolation_level=None)
+            local.connection.execute("PRAGMA journal_mode=WAL")
+            local.connection.execute("PRAGMA synchronous=NORMAL")
+            local.pid = os.getpid()
+        return local.connection
+
+    def set(self, session_id, user_id, created_at=None):
+        """
+        Insert or replace a session row
+        """
+        timestamp = None if created_at is None else created_at.timestamp()
+        self.connection().execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+            (session_id, user_id, timestamp))
+
+    def get(self, session_id):
+        """
+        Read a session row
+        """
+        row = self.connection().execute(
+            "SELECT user_id, created_at FROM sessions WHERE session_id = ?",
+            (session_id,)).fetchone()
+        if row is None:
+            return None
+        created_at = None
+        if row[1] is not None:
+            created_at = datetime.fromtimestamp(row[1])
+        return {"user_id": row[0], "created_at": created_at}
+
+    def delete(self, session_id):
+        """
+        Delete a session row
+        """
+        cursor = self.connection().execute(
+            "DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def expire(self, created_before):
+        """
+        Delete the old rows through the created_at index
+        """
+        cursor = self.connection().execute(
+            "DELETE FROM sessions WHERE created_at < ?",
+            (created_before.timestamp(),))
+        return cursor.rowcount
+
+    def __len__(self):
+        """
+        Number of session rows
+        """
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class SessionStoreFull(Exception):
+    """ Raised when a session store has no room for a new session
+    """
+
+
+class MmapSessionStore(SessionStore):
+    """ Sessions kept in a fixed-size hash table in a memory-mapped file,
+    shared by every process mapping the same file (e.g. under /dev/shm)
+
+    The table uses open addressing with linear probing. Writers take an
+    exclusive `flock` on the file, readers a shared one. Deleted slots
+    are left as tombstones, counted in the header next to the used
+    slots; once they outnumber the empty slots or an eighth of the
+    table, the table is rebuilt in place so that probes stay short.
+    """
+
+    HEADER = struct.Struct("<4sIII")
+    SLOT = struct.Struct("<B36s64sd3x")
+    MAGIC = b"SES2"
+    EMPTY, USED, DELETED = 0, 1, 2
+
+    def __init__(self, file_path: str, slots: int = 65536) -> None:
+        """
+        inialization
+        """
+        self.file_path = file_path
+        self.rebuilds = 0
+        self.__lock = threading.Lock()
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.__file = os.fdopen(fd, 'r+b')
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            header = self.__file.read(self.HEADER.size)
+            if len(header) == self.HEADER.size and \
+                    header[:4] == self.MAGIC:
+                slots = self.HEADER.unpack(header)[1]
+            else:
+                self.__file.seek(0)
+                self.__file.truncate(0)
+                self.__file.truncate(
+                    self.HEADER.size + slots * self.SLOT.size)
+                self.__file.write(self.HEADER.pack(self.MAGIC, slots, 0, 0))
+                self.__file.flush()
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self.slots = slots
+        self.__map = mmap.mmap(fd, self.HEADER.size + slots * self.SLOT.size)
+
+    @contextmanager
+    def __locked(self, operation: int):
+        """
+        Hold the thread lock and the file lock
+        """
+        with self.__lock:
+            fcntl.flock(self.__file.fileno(), operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.__file.fileno(), fcntl.LOCK_UN)
+
+    def __offset(self, slot: int) -> int:
+        """
+        Byte offset of a slot
+        """
+        return self.HEADER.size + slot * self.SLOT.size
+
+    def __find(self, key: bytes):
+        """
+        Return (slot of `key` or None, first free slot or None)
+        """
+        free = None
+        start = zlib.crc32(key) % self.slots
+        for i in range(self.slots):
+            slot = (start + i) % self.slots
+            state, sid = struct.unpack_from("<B36s", self.__map,
+                                            self.__offset(slot))
+            if state == self.EMPTY:
+                return None, free if free is not None else slot
+            if state == self.DELETED:
+                if free is None:
+                    free = slot
+            elif sid.rstrip(b"\0") == key:
+                return slot, free
+        return None, free
+
+    def __counts(self):
+        """
+        Return (used slots, deleted slots) from the header
+        """
+        return struct.unpack_from("<II", self.__map, 8)
+
+    def __count(self, used: int = 0, deleted: int = 0):
+        """
+        Update the numbers of used and deleted slots in the header,
+        rebuilding the table when tombstones passed the threshold
+        """
+        current_used, current_deleted = self.__counts()
+        used += current_used
+        deleted += current_deleted
+        struct.pack_into("<II", self.__map, 8, used, deleted)
+        empty = self.slots - used - deleted
+        if deleted > 0 and (deleted >= empty or deleted >= self.slots // 8):
+            self.__rebuild()
+
+    def __rebuild(self):
+        """
+        Reinsert the used slots in an emptied table, dropping the
+        tombstones; the caller holds the exclusive lock
+        """
+        entries = []
+        for slot in range(self.slots):
+            offset = self.__offset(slot)
+            if self.__map[offset] == self.USED:
+                entries.append(self.__map[offset:offset + self.SLOT.size])
+        self.__map[self.HEADER.size:] = bytes(self.slots * self.SLOT.size)
+        for entry in entries:
+            key = entry[1:37].rstrip(b"\0")
+            _, slot = self.__find(key)
+            offset = self.__offset(slot)
+            self.__map[offset:offset + self.SLOT.size] = entry
+        struct.pack_into("<II", self.__map, 8, len(entries), 0)
+        self.rebuilds += 1
+
+    def set(self, session_id, user_id, created_at=None):
+        """
+        Write a session in its slot, raise SessionStoreFull when
+        every slot holds a session
+        """
+        key = session_id.encode()
+        value = user_id.encode()
+        if len(key) > 36 or len(value) > 64:
+            raise ValueError("session or user ID too long")
+        timestamp = math.nan if created_at is None else created_at.timestamp()
+        with self.__locked(fcntl.LOCK_EX):
+            slot, free = self.__find(key)
+            if slot is not None:
+                self.SLOT.pack_into(self.__map, self.__offset(slot),
+                                    self.USED, key, value, timestamp)
+                return
+            if free is None:
+                raise SessionStoreFull("session store is full")
+            tombstone = self.__map[self.__offset(free)] == self.DELETED
+            self.SLOT.pack_into(self.__map, self.__offset(free), self.USED,
+                                key, value, timestamp)
+            self.__count(used=1, deleted=-1 if tombstone else 0)
+
+    def get(self, session_id):
+        """
+        Read a session from its slot
+        """
+        key = session_id.encode()
+        if len(key) > 36:
+            return None
+        with self.__locked(fcntl.LOCK_SH):
+            slot, _ = self.__find(key)
+            if slot is None:
+                return None
+            _, _, value, timestamp = self.SLOT.unpack_from(
+                self.__map, self.__offset(slot))
+        created_at = None
+        if not math.isnan(timestamp):
+            created_at = datetime.fromtimestamp(timestamp)
+        return {"user_id": value.rstrip(b"\0").decode(),
+                "created_at": created_at}
+
+    def delete(self, session_id):
+        """
+        Mark the slot of a session as deleted
+        """
+        key = session_id.encode()
+        if len(key) > 36:
+            return False
+        with self.__locked(fcntl.LOCK_EX):
+            slot, _ = self.__find(key)
+            if slot is None:
+                return False
+            struct.pack_into("<B", self.__map, self.__offset(slot),
+                             self.DELETED)
+            self.__count(used=-1, deleted=1)
+        return True
+
+    def expire(self, created_before):
+        """
+        Scan the table for old sessions
+
+        The table is bounded by its number of slots, so a sweep has a
+        fixed cost however many sessions are stored.
+        """
+        limit = created_before.timestamp()
+        deleted = 0
+        with self.__locked(fcntl.LOCK_EX):
+            for slot in range(self.slots):
+                offset = self.__offset(slot)
+                state, _, _, timestamp = self.SLOT.unpack_from(self.__map,
+                                                               offset)
+                if state == self.USED and timestamp < limit:
+                    struct.pack_into("<B", self.__map, offset, self.DELETED)
+                    deleted += 1
+            if deleted > 0:
+                self.__count(used=-deleted, deleted=deleted)
+        return deleted
+
+    def tombstones(self) -> int:
+        """
+        Number of deleted slots not yet reclaimed
+        """
+        return self.__counts()[1]
+
+    def __len__(self):
+        """
+        Number of used slots
+        """
+        return self.__counts()[0]
+
+
+def session_store(sessions: dict = None, expiring: bool = True,
+                  name: str = 'sessions') -> SessionStore:
+    """
+    Build the session store selected by SESSION_STORE
+    (memory, sqlite or mmap); `expiring` tells whether its sessions
+    will be expired, `name` names its file unless SESSION_STORE_PATH
+    is set
+    """
+    kind = os.getenv('SESSION_STORE', 'memory')
+    file_path = os.getenv('SESSION_STORE_PATH')
+    if kind == 'sqlite':
+        return SQLiteSessionStore(file_path or '.db_{}.sqlite'.format(name))
+    if kind == 'mmap':
+        if file_path is None:
+            directory = '/dev/shm'
+            if not os.path.isdir(directory):
+                directory = tempfile.gettempdir()
+            file_path = os.path.join(directory, 'api_{}'.format(name))
+        slots = int(os.getenv('SESSION_STORE_SLOTS', '65536'))
+        return MmapSessionStore(file_path, slots)
+    return MemorySessionStore(sessions, expiring)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Definition of class SessionTokenAuth
+"""
+from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import SessionStoreFull, session_store
+from base64 import urlsafe_b64encode
+from datetime import datetime
+from models.user import User
+import hashlib
+import hmac
+import os
+import time
+
+
+class SessionTokenAuth(Auth):
+    """ Session authentication with stateless signed tokens.
+
+    The session cookie carries the user id and the issue time, signed
+    with HMAC-SHA256:
+
+        <key id>.<user id>.<issued at>.<nonce>.<signature>
+
+    so that any API node holding the keys can authenticate it without
+    a session store.
+
+    Environment:
+        SESSION_TOKEN_KEYS: `id:secret` pairs separated by commas; the
+            first key signs new tokens, all of them verify tokens, so
+            a key can be rotated out after SESSION_DURATION. Required,
+            so that every node shares the keys.
+        SESSION_DURATION: lifetime of a token in seconds. Required,
+            so that revocations can be forgotten once their token
+            expired.
+        SESSION_STORE: store of the revocations filled by logouts,
+            `memory` by default, private to the process, so that other
+            processes accept a revoked token until it expires; `sqlite`
+            or `mmap` share them between the processes of a host.
+        SESSION_SWEEP_INTERVAL: seconds between two evictions of the
+            revocations of expired tokens, 60 by default.
+
+    Revocations are only forgotten once their token expired: a logout
+    fails, and the token stays valid, when a `mmap` store has no room
+    left for its revocation, even after a sweep.
+    """
+
+    def __init__(self) -> None:
+        """ Load the keys and the settings from the environment
+        """
+        super().__init__()
+        self.keys = self.parse_keys(os.getenv('SESSION_TOKEN_KEYS'))
+        self.key_id = next(iter(self.keys))
+        try:
+            self.session_duration = int(os.getenv('SESSION_DURATION'))
+        except Exception:
+            self.session_duration = 0
+        if self.session_duration <= 0:
+            raise ValueError("SESSION_DURATION must be positive")
+        try:
+            self.sweep_interval = int(os.getenv('SESSION_SWEEP_INTERVAL'))
+        except Exception:
+            self.sweep_interval = 60
+        self.next_sweep = time.monotonic() + self.sweep_interval
+        self.revoked = session_store({}, name='revoked_tokens')
+
+    @staticmethod
+    def parse_keys(keys: str = None) -> dict:
+        """ Map key ids to secrets from `id:secret,id:secret`
+        """
+        if keys is None or keys.strip() == '':
+            raise ValueError("SESSION_TOKEN_KEYS is not set")
+        parsed = {}
+        for pair in keys.split(','):
+            key_id, sep, secret = pair.strip().partition(':')
+            if sep == '' or key_id == '' or secret == '' or '.' in key_id:
+                raise ValueError("Wrong SESSION_TOKEN_KEYS entry")
+            parsed[key_id] = secret.encode()
+        return parsed
+
+    def sign(self, key_id: str, payload: str) -> str:
+        """ Signature of `payload` with the key `key_id`
+        """
+        digest = hmac.new(self.keys[key_id], payload.encode(),
+                          hashlib.sha256).digest()
+        return urlsafe_b64encode(digest).decode().rstrip('=')
+
+    def create_session(self, user_id: str = None) -> str:
+        """ Issue a signed token for the user `user_id`
+        """
+        if user_id is None or type(user_id) is not str or '.' in user_id:
+            return None
+        payload = "{}.{}.{}.{}".format(self.key_id, user_id,
+                                       int(time.time()),
+                                       os.urandom(8).hex())
+        return "{}.{}".format(payload, self.sign(self.key_id, payload))
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """ User id of a valid, unexpired and unrevoked token
+        """
+        if session_id is None or type(session_id) is not str:
+            return None
+        parts = session_id.split('.')
+        if len(parts) != 5 or parts[0] not in self.keys:
+            return None
+        key_id, user_id, issued_at, _, signature = parts
+        payload = session_id[:-len(signature) - 1]
+        if not hmac.compare_digest(signature, self.sign(key_id, payload)):
+            return None
+        try:
+            issued_at = int(issued_at)
+        except ValueError:
+            return None
+        if issued_at + self.session_duration < time.time():
+            return None
+        if self.revoked.get(self.revocation_key(signature)) is not None:
+            return None
+        return user_id
+
+    def current_user(self, request=None):
+        """ Return a user instance based on the session token
+        """
+        with self.stage(request, 'header'):
+            session_id = self.session_cookie(request)
+        with self.stage(request, 'lookup'):
+            user_id = self.user_id_for_session_id(session_id)
+        with self.stage(request, 'verify'):
+            return User.get(user_id)
+
+    def destroy_session(self, request=None) -> bool:
+        """ Revoke the session token of the request
+        """
+        if request is None:
+            return False
+        session_id = self.session_cookie(request)
+        if self.user_id_for_session_id(session_id) is None:
+            return False
+        _, user_id, issued_at, _, signature = session_id.split('.')
+        self.sweep_if_due()
+        key = self.revocation_key(signature)
+        issued_at = datetime.fromtimestamp(int(issued_at))
+        try:
+            self.revoked.set(key, user_id, issued_at)
+        except SessionStoreFull:
+            if self.sweep() == 0:
+                return False
+            try:
+                self.revoked.set(key, user_id, issued_at)
+            except SessionStoreFull:
+                return False
+        return True
+
+    @staticmethod
+    def revocation_key(signature: str) -> str:
+        """ Key of the revocation of a token: a prefix of its signature,
+        short enough for any session store and still unique
+        """
+        return signature[:32]
+
+    def sweep(self) -> int:
+        """ Forget the revocations of the expired tokens
+        """
+        return self.revoked.expire(datetime.fromtimestamp(
+            time.time() - self.session_duration))
+
+    def sweep_if_due(self) -> int:
+        """ Sweep when the last sweep is older than the sweep interval
+        """
+        now = time.monotonic()
+        if now < self.next_sweep:
+            return 0
+        self.next_sweep = now + self.sweep_interval
+        return self.sweep()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+""" Request metrics of the API, rendered in the Prometheus text format
+"""
+from bisect import bisect_left
+from models.cache import TTLCache
+from typing import Dict, Iterable, List, Tuple
+import threading
+
+Gauge = Tuple[str, str, dict, float]
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram():
+    """ Counts of observed values per bucket, with their sum
+    """
+
+    def __init__(self, buckets: Tuple[float] = BUCKETS):
+        """ Initialize an empty Histogram on sorted `buckets` bounds
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """ Count one value
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: dict) -> List[str]:
+        """ Prometheus samples of the histogram
+        """
+        lines = []
+        cumulative = 0
+        bounds = [repr(bound) for bound in self.buckets] + ['+Inf']
+        for bound, count in zip(bounds, self.counts):
+            cumulative += count
+            lines.append(sample(name + '_bucket',
+                                dict(labels, le=bound), cumulative))
+        lines.append(sample(name + '_sum', labels, self.sum))
+        lines.append(sample(name + '_count', labels, self.count))
+        return lines
+
+
+def sample(name: str, labels: dict, value) -> str:
+    """ One Prometheus sample line
+    """
+    if len(labels) == 0:
+        return "{} {}".format(name, value)
+    return "{}{{{}}} {}".format(name, ",".join(
+        '{}="{}"'.format(key, str(label).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for key, label in labels.items()), value)
+
+
+class Metrics():
+    """ Request latencies, statuses and authentication stage timings
+
+    Observing a request costs a lock and a few dict updates.
+    """
+
+    def __init__(self):
+        """ Initialize empty metrics
+        """
+        self.__lock = threading.Lock()
+        self.requests = {}
+        self.latencies = {}
+        self.auth_requests = {}
+        self.auth_stages = {}
+
+    def observe_request(self, method: str, route: str, status: int,
+                        seconds: float, context=None):
+        """ Account a request, and its AuthContext when authenticated
+        """
+        with self.__lock:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            key = (method, route)
+            if key not in self.latencies:
+                self.latencies[key] = Histogram()
+            self.latencies[key].observe(seconds)
+            if context is None:
+                return
+            key = (context.method, context.user is not None)
+            self.auth_requests[key] = self.auth_requests.get(key, 0) + 1
+            for stage, stage_seconds in context.timings.items():
+                key = (context.method, stage)
+                if key not in self.auth_stages:
+                    self.auth_stages[key] = Histogram()
+                self.auth_stages[key].observe(stage_seconds)
+
+    def render(self, gauges: Iterable[Gauge] = ()) -> str:
+        """ All metrics in the Prometheus text format, followed by
+        the (name, help, labels, value) `gauges`
+        """
+        lines = []
+        with self.__lock:
+            lines += header('http_requests_total', 'counter',
+                            'Requests by method, route and status')
+            for (method, route, status), count in self.requests.items():
+                lines.append(sample('http_requests_total', {
+                    'method': method, 'route': route, 'status': status},
+                    count))
+            lines += header('http_request_duration_seconds', 'histogram',
+                            'Request latency by method and route')
+            for (method, route), histogram in self.latencies.items():
+                lines += histogram.lines('http_request_duration_seconds',
+                                         {'method': method, 'route': route})
+            lines += header('auth_requests_total', 'counter',
+                            'Authenticated requests by auth method')
+            for (method, found), count in self.auth_requests.items():
+                lines.append(sample('auth_requests_total', {
+                    'method': method,
+                    'result': 'user' if found else 'none'}, count))
+            lines += header('auth_stage_duration_seconds', 'histogram',
+                            'Authentication time by method and stage')
+            for (method, stage), histogram in self.auth_stages.items():
+                lines += histogram.lines('auth_stage_duration_seconds',
+                                         {'method': method, 'stage': stage})
+        described = set()
+        for name, help, labels, value in sorted(gauges,
+                                                key=lambda gauge: gauge[0]):
+            if name not in described:
+                described.add(name)
+                lines += header(name, 'gauge', help)
+            lines.append(sample(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def header(name: str, kind: str, help: str) -> List[str]:
+    """ HELP and TYPE lines of a metric
+    """
+    return ["# HELP {} {}".format(name, help),
+            "# TYPE {} {}".format(name, kind)]
+
+
+def auth_gauges(auth) -> List[Gauge]:
+    """ Cache and session store gauges of an authentication instance
+    """
+    gauges = []
+    if auth is None:
+        return gauges
+    for name in dir(auth):
+        cache = getattr(auth, name, None)
+        if not isinstance(cache, TTLCache):
+            continue
+        lookups = cache.hits + cache.misses
+        gauges += [
+            ('cache_hits', 'Cache hits', {'cache': name}, cache.hits),
+            ('cache_misses', 'Cache misses', {'cache': name}, cache.misses),
+            ('cache_hit_ratio', 'Cache hits per lookup', {'cache': name},
+             cache.hits / lookups if lookups else 0),
+            ('cache_entries', 'Cached entries', {'cache': name}, len(cache)),
+        ]
+    if hasattr(auth, 'session_count'):
+        sessions = auth.session_count()
+    elif hasattr(auth, 'store'):
+        sessions = len(auth.store)
+    elif hasattr(auth, 'revoked'):
+        gauges.append(('store_objects', 'Objects in the stores',
+                       {'store': 'revoked_tokens'}, len(auth.revoked)))
+        return gauges
+    else:
+        return gauges
+    gauges.append(('store_objects', 'Objects in the stores',
+                   {'store': 'sessions'}, sessions))
+    return gauges
+
+
+def model_gauges(models: Dict[str, type]) -> List[Gauge]:
+    """ Size and change propagation gauges of the loaded models,
+    by store name
+    """
+    gauges = []
+    for store, model in models.items():
+        gauges.append(('store_objects', 'Objects in the stores',
+                       {'store': store}, model.count()))
+        lag = model.lag_stats()
+        gauges += [
+            ('store_changes_received', 'Changes applied from other '
+             'processes', {'store': store}, lag['changes']),
+            ('store_propagation_lag_seconds_avg', 'Average lag of the '
+             'changes from other processes', {'store': store}, lag['avg']),
+            ('store_propagation_lag_seconds_max', 'Maximum lag of the '
+             'changes from other processes', {'store': store}, lag['max']),
+        ]
+    return gauges
+
+
+def identity_gauges(identity_map) -> List[Gauge]:
+    """ Hit and miss gauges of an IdentityMap
+    """
+    return [
+        ('identity_map_hits', 'Lookups served by the identity map of '
+         'the request', {}, identity_map.hits),
+        ('identity_map_misses', 'Lookups missing from the identity map '
+         'of the request', {}, identity_map.misses),
+    ]
+
+
+METRICS = Metrics()
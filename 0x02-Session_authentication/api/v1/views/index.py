@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """ Module of Index views
 """
-from flask import jsonify, abort
+from flask import jsonify, abort, Response
 from api.v1.views import app_views
 
 
@@ -26,6 +26,24 @@ def stats() -> str:
     return jsonify(stats)
 
 
+@app_views.route('/metrics', methods=['GET'], strict_slashes=False)
+def metrics() -> Response:
+    """ GET /api/v1/metrics
+    Return:
+      - request, authentication and store metrics,
+        in the Prometheus text format
+    """
+    from api.v1.app import auth
+    from api.v1.metrics import (METRICS, auth_gauges, identity_gauges,
+                                model_gauges)
+    from models.identity import IDENTITY_MAP
+    from models.user import User
+    gauges = auth_gauges(auth) + model_gauges({'users': User}) + \
+        identity_gauges(IDENTITY_MAP)
+    return Response(METRICS.render(gauges),
+                    mimetype='text/plain; version=0.0.4')
+
+
 @app_views.route('/unauthorized', methods=['GET'], strict_slashes=False)
 def unauthorized():
     """ GET /api/v1/unauthorized
@@ -26,6 +26,8 @@ def login():
             return jsonify({"error": "wrong password"}), 401
         from api.v1.app import auth
         session_id = auth.create_session(user.id)
+        if session_id is None:
+            return jsonify({"error": "can't create a session"}), 503
         user_dict = jsonify(user.to_json())
         session_name = os.getenv('SESSION_NAME')
         user_dict.set_cookie(session_name, session_id)
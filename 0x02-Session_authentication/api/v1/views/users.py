@@ -2,18 +2,95 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import abort, jsonify, request, Response
 from models.user import User
+import base64
+import binascii
+import json
+import time
+
+
+PAGE_LIMIT = 100
+PAGE_LIMIT_MAX = 1000
+BULK_LIMIT = 10000
+
+
+def encode_cursor(user_id: str) -> str:
+    """ Opaque cursor pointing after the User `user_id`
+    """
+    return base64.urlsafe_b64encode(user_id.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """ User ID of a cursor, None if it isn't valid
+    """
+    try:
+        return base64.b64decode(cursor.encode(), altchars=b"-_",
+                                validate=True).decode()
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def stream_users(ndjson: bool):
+    """ Generate all users JSON represented, one page of User at a time:
+    one per line with `ndjson`, as a JSON list otherwise
+    """
+    if not ndjson:
+        yield "["
+    first = True
+    for user in User.iterate():
+        line = json.dumps(user.to_json())
+        if ndjson:
+            yield line + "\n"
+        else:
+            yield line if first else "," + line
+        first = False
+    if not ndjson:
+        yield "]"
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: number of users per page (100 by default, 1000 max)
+      - cursor: `next_cursor` of the previous page
+      - format: `ndjson` to stream one user per line,
+        `stream` to stream the JSON list
     Return:
       - list of all User objects JSON represented
+      - with limit or cursor: one page of users ordered by ID
+        and the cursor of the next page (null on the last one)
+      - 400 if limit or cursor isn't valid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    output_format = request.args.get('format')
+    if output_format in ('ndjson', 'stream'):
+        mimetype = 'application/json'
+        if output_format == 'ndjson':
+            mimetype = 'application/x-ndjson'
+        return Response(stream_users(output_format == 'ndjson'),
+                        mimetype=mimetype)
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        all_users = [user.to_json() for user in User.all()]
+        return jsonify(all_users)
+
+    try:
+        limit = int(request.args.get('limit', PAGE_LIMIT))
+    except ValueError:
+        limit = 0
+    if limit < 1 or limit > PAGE_LIMIT_MAX:
+        return jsonify({'error': "Wrong limit"}), 400
+    after = None
+    if request.args.get('cursor'):
+        after = decode_cursor(request.args.get('cursor'))
+        if after is None:
+            return jsonify({'error': "Wrong cursor"}), 400
+    users = User.page(limit, after)
+    next_cursor = None
+    if len(users) == limit:
+        next_cursor = encode_cursor(users[-1].id)
+    return jsonify({"users": [user.to_json() for user in users],
+                    "next_cursor": next_cursor})
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -93,6 +170,63 @@ def create_user() -> str:
     return jsonify({'error': error_msg}), 400
 
 
+def read_records() -> list:
+    """ Records of a bulk request body: a JSON list, or one JSON
+    object per line with the application/x-ndjson content type;
+    None if the body isn't valid
+    """
+    try:
+        if request.mimetype == 'application/x-ndjson':
+            return [json.loads(line) for line in
+                    request.get_data(as_text=True).splitlines()
+                    if line.strip() != ""]
+        records = request.get_json()
+    except Exception as e:
+        return None
+    return records if type(records) is list else None
+
+
+@app_views.route('/users/bulk', methods=['POST'], strict_slashes=False)
+def create_users() -> str:
+    """ POST /api/v1/users/bulk
+    Body: JSON list of users, or one user per line (NDJSON) with
+    the application/x-ndjson content type, each with:
+      - email
+      - password
+      - last_name (optional)
+      - first_name (optional)
+    Return:
+      - number of users created with a single write of the store,
+        errors by position in the body, and rows per second
+      - 400 if the body isn't valid, holds more than BULK_LIMIT users
+        or no user could be created
+    """
+    start = time.perf_counter()
+    records = read_records()
+    if records is None:
+        return jsonify({'error': "Wrong format"}), 400
+    if len(records) > BULK_LIMIT:
+        return jsonify({'error': "Too many users, {} max".format(
+            BULK_LIMIT)}), 400
+    users, positions, errors = [], [], []
+    for position, record in enumerate(records):
+        try:
+            users.append(User.from_record(record))
+            positions.append(position)
+        except ValueError as e:
+            errors.append({"index": position, "error": str(e)})
+    for position, error in User.save_all(users):
+        errors.append({"index": positions[position],
+                       "error": "Can't create User: {}".format(error)})
+    errors.sort(key=lambda error: error["index"])
+    created = len(records) - len(errors)
+    seconds = time.perf_counter() - start
+    return jsonify({"created": created, "errors": errors,
+                    "seconds": seconds,
+                    "rows_per_second": created / seconds if seconds else 0}
+                   ), 201 if created > 0 else 400
+
+
 @app_views.route('/users/<user_id>', methods=['PUT'], strict_slashes=False)
 def update_user(user_id: str = None) -> str:
     """ PUT /api/v1/users/:id
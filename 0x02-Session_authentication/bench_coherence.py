@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Benchmark of the propagation of changes between processes:
+a writer process saves users while reader processes serve reads,
+each reader reports the lag of the changes it applied
+"""
+from models.user import User
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+readers = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+read_interval = float(sys.argv[3]) if len(sys.argv) > 3 else 0.001
+
+
+def writer(ready):
+    """ Save `users` users, one every millisecond
+    """
+    User.load_from_file()
+    ready.wait()
+    for i in range(users):
+        user = User()
+        user.email = "user{}@bench.io".format(i)
+        user.save()
+        time.sleep(0.001)
+
+
+def reader(ready, results):
+    """ Read the users count until all users are seen
+    """
+    User.load_from_file()
+    ready.wait()
+    while User.count() < users:
+        time.sleep(read_interval)
+    results.put(User.lag_stats())
+
+
+if __name__ == "__main__":
+    os.chdir(tempfile.mkdtemp())
+    User.load_from_file()
+    get = timeit.timeit(lambda: User.get("missing"), number=100000) * 10
+    print("User.get with the version check: {:.2f} us".format(get))
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(readers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=reader, args=(ready, results))
+                 for _ in range(readers)]
+    processes.append(context.Process(target=writer, args=(ready,)))
+    for process in processes:
+        process.start()
+    for _ in range(readers):
+        stats = results.get()
+        print("reader: {} changes, lag avg {:.2f} ms, max {:.2f} ms".format(
+            stats["changes"], stats["avg"] * 1e3, stats["max"] * 1e3))
+    for process in processes:
+        process.join()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+""" Benchmark of User.load_from_file: startup time and memory per user
+"""
+from datetime import datetime
+from models.base import DATA, TIMESTAMP_FORMAT
+from models.serializers import serializer
+from models.user import User
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+import sys
+
+users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+os.chdir(tempfile.mkdtemp())
+now = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+with open(".db_User.json", "w") as f:
+    objs = {}
+    for i in range(users):
+        obj_id = str(uuid.uuid4())
+        objs[obj_id] = {"id": obj_id, "created_at": now, "updated_at": now,
+                        "email": "user{}@bench.io".format(i),
+                        "_password": "0" * 64,
+                        "first_name": "First", "last_name": "Last"}
+    json.dump(objs, f)
+    del objs
+print("{} users, {:.1f} MB file".format(
+    users, os.path.getsize(".db_User.json") / 1e6))
+
+start = time.perf_counter()
+User.load_from_file()
+print("load:             {:7.3f} s".format(time.perf_counter() - start))
+start = time.perf_counter()
+for user in DATA["User"].values():
+    user.created_at
+    user.updated_at
+print("parse timestamps: {:7.3f} s".format(time.perf_counter() - start))
+
+DATA.clear()
+gc.collect()
+tracemalloc.start()
+User.load_from_file()
+gc.collect()
+current, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+print("memory:           {:7.0f} bytes/user, peak {:.0f} MB".format(
+    current / users, peak / 1e6))
+
+print("snapshot formats:")
+for name in ("json", "orjson", "msgpack", "binary"):
+    snapshot = serializer(name)
+    if snapshot.name != name:
+        print("  {:8} not installed".format(name))
+        continue
+    os.environ["STORAGE_FORMAT"] = name
+    start = time.perf_counter()
+    User.save_to_file()
+    saved = time.perf_counter() - start
+    start = time.perf_counter()
+    User.load_from_file()
+    loaded = time.perf_counter() - start
+    print("  {:8} save {:6.3f} s  load {:6.3f} s  {:6.1f} MB".format(
+        name, saved, loaded,
+        os.path.getsize(User.snapshot_path(snapshot.extension)) / 1e6))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+""" Benchmark of the session stores: lookup latency per backend
+"""
+from api.v1.auth.session_store import (MemorySessionStore,
+                                       MmapSessionStore,
+                                       SQLiteSessionStore)
+from datetime import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+directory = tempfile.mkdtemp()
+stores = {
+    "memory": MemorySessionStore(),
+    "sqlite": SQLiteSessionStore(os.path.join(directory, "sessions.db")),
+    "mmap": MmapSessionStore(os.path.join(directory, "sessions.map"),
+                             sessions * 2),
+}
+
+session_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+queries = [random.choice(session_ids) for _ in range(lookups)]
+
+print("{} sessions, {} lookups".format(sessions, lookups))
+for name, store in stores.items():
+    start = time.perf_counter()
+    for session_id in session_ids:
+        store.set(session_id, str(uuid.uuid4()), datetime.now())
+    insert = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for session_id in queries:
+        store.get(session_id)
+    lookup = time.perf_counter() - start
+
+    print("{:>6}: insert {:8.2f} us/op, lookup {:8.2f} us/op".format(
+        name, insert / sessions * 1e6, lookup / lookups * 1e6))
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+""" Load test of the API with each authentication method
+
+Users are seeded through the models in a temporary directory, then
+worker threads send requests for a fixed time, through the Flask test
+client or, with --server, to a local threaded server. Throughput and
+p50/p95/p99 latencies of each scenario are printed and written as JSON
+with --output; --compare reports the changes against an earlier file
+and exits with status 1 when a scenario regressed.
+
+Usage: ./bench_suite.py [--users N] [--threads N] [--seconds S]
+                        [--server] [--output FILE] [--compare FILE]
+"""
+from functools import partial
+from urllib.parse import urlencode
+import argparse
+import base64
+import http.client
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('SESSION_NAME', '_my_session_id')
+CWD = os.getcwd()
+os.chdir(tempfile.mkdtemp())
+
+import api.v1.app as api  # noqa: E402
+from api.v1.auth.basic_auth import BasicAuth  # noqa: E402
+from api.v1.auth.session_auth import SessionAuth  # noqa: E402
+from api.v1.auth.session_exp_auth import SessionExpAuth  # noqa: E402
+from models.user import User  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+PASSWORD = "bench pwd"
+SCENARIOS = (
+    ("basic_auth", "GET /api/v1/users/me", BasicAuth),
+    ("session_auth", "POST /api/v1/auth_session/login", SessionAuth),
+    ("session_auth", "GET /api/v1/users/me", SessionAuth),
+    ("session_exp_auth", "POST /api/v1/auth_session/login", SessionExpAuth),
+    ("session_exp_auth", "GET /api/v1/users/me", SessionExpAuth),
+)
+
+
+class TestClient():
+    """ Sends requests through the Flask test client
+    """
+
+    def __init__(self):
+        """ Initialize a client without cookie jar
+        """
+        self.client = api.app.test_client(use_cookies=False)
+
+    def request(self, method: str, path: str, headers: dict = {},
+                data: dict = None):
+        """ Status and headers of the response
+        """
+        response = self.client.open(path, method=method, headers=headers,
+                                    data=data)
+        return response.status_code, response.headers
+
+
+class ServerClient():
+    """ Sends requests to a local server, on a kept-alive connection
+    """
+
+    def __init__(self, port: int):
+        """ Initialize a client of the server listening on `port`
+        """
+        self.port = port
+        self.connection = None
+
+    def request(self, method: str, path: str, headers: dict = {},
+                data: dict = None):
+        """ Status and headers of the response
+        """
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection('127.0.0.1',
+                                                         self.port)
+        body = None
+        headers = dict(headers)
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        response.read()
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response.status, response.headers
+
+
+def seed(users: int) -> list:
+    """ Save `users` users with one write of the store, return their emails
+    """
+    User.load_from_file()
+    emails = []
+    for i in range(users):
+        user = User(email="user{}@bench.io".format(i))
+        user.password = PASSWORD
+        user.save(deferred=True)
+        emails.append(user.email)
+    User.save_to_file()
+    return emails
+
+
+def percentile(latencies: list, q: float) -> float:
+    """ Nearest-rank percentile `q` of sorted `latencies`, in ms
+    """
+    if len(latencies) == 0:
+        return None
+    rank = max(int(len(latencies) * q / 100 + 0.5), 1)
+    return latencies[min(rank, len(latencies)) - 1] * 1e3
+
+
+def worker(client, route: str, email: str, deadline: float, results: list):
+    """ Send requests on `route` as `email` until `deadline`
+    """
+    method, path = route.split(" ")
+    credentials = {"email": email, "password": PASSWORD}
+    headers, data = {}, None
+    if isinstance(api.auth, BasicAuth):
+        headers['Authorization'] = "Basic " + base64.b64encode(
+            "{}:{}".format(email, PASSWORD).encode()).decode()
+    elif method == 'POST':
+        data = credentials
+    else:
+        _, login = client.request('POST', '/api/v1/auth_session/login',
+                                  data=credentials)
+        cookie = login.get('Set-Cookie').split(";")[0]
+        headers['Cookie'] = cookie
+    latencies, errors = [], 0
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        status, _ = client.request(method, path, headers, data)
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors += 1
+    results.append((latencies, errors))
+
+
+def run(auth: str, route: str, emails: list, threads: int, seconds: float,
+        new_client) -> dict:
+    """ Load test `route` with `threads` workers during `seconds`
+    """
+    results = []
+    deadline = time.perf_counter() + seconds
+    workers = [threading.Thread(target=worker, args=(
+        new_client(), route, emails[i % len(emails)], deadline, results))
+        for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    latencies = sorted(latency for worker_latencies, _ in results
+                       for latency in worker_latencies)
+    return {
+        "name": "{} {}".format(auth, route),
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "throughput": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] * 1e3 if latencies else None,
+    }
+
+
+def commit() -> str:
+    """ Git commit of the benchmarked code, None outside of a checkout
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, file_path: str, tolerance: float) -> bool:
+    """ Print the changes against the report in `file_path`,
+    return True when a scenario lost more than `tolerance` of its
+    throughput or p99
+    """
+    with open(file_path) as f:
+        earlier = json.load(f)
+    for setting in ("mode", "users", "threads"):
+        if earlier.get(setting) != report[setting]:
+            print("warning: {} differs, {} before".format(
+                setting, earlier.get(setting)))
+    previous = {result["name"]: result for result in earlier["results"]}
+    regressed = False
+    for result in report["results"]:
+        before = previous.get(result["name"])
+        if before is None or not before["throughput"] or \
+                not before["p99_ms"] or not result["p99_ms"]:
+            continue
+        throughput = result["throughput"] / before["throughput"] - 1
+        p99 = result["p99_ms"] / before["p99_ms"] - 1
+        worse = throughput < -tolerance or p99 > tolerance
+        regressed = regressed or worse
+        print("{:<50} throughput {:+7.1%}, p99 {:+7.1%}{}".format(
+            result["name"], throughput, p99, "  REGRESSION" if worse else ""))
+    return regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--server', action='store_true',
+                        help="drive a local server instead of the test client")
+    parser.add_argument('--output', help="write the results to this file")
+    parser.add_argument('--compare', help="earlier results to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="allowed throughput or p99 loss, default 0.1")
+    args = parser.parse_args()
+
+    emails = seed(args.users)
+    new_client = TestClient
+    if args.server:
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, api.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        new_client = partial(ServerClient, server.server_port)
+
+    results = []
+    for auth, route, auth_class in SCENARIOS:
+        api.auth = auth_class()
+        result = run(auth, route, emails, args.threads, args.seconds,
+                     new_client)
+        results.append(result)
+        print("{:<50} {:8.1f} req/s  p50 {:7.2f}  p95 {:7.2f}  p99 {:7.2f} ms"
+              "  errors {}".format(result["name"], result["throughput"],
+                                   result["p50_ms"] or 0,
+                                   result["p95_ms"] or 0,
+                                   result["p99_ms"] or 0, result["errors"]))
+
+    report = {
+        "suite": "0x02-Session_authentication",
+        "commit": commit(),
+        "python": platform.python_version(),
+        "mode": "server" if args.server else "client",
+        "users": args.users,
+        "threads": args.threads,
+        "seconds": args.seconds,
+        "results": results,
+    }
+    if args.output:
+        with open(os.path.join(CWD, args.output), 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare is not None:
+        if compare(report, os.path.join(CWD, args.compare), args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+""" Bulk import and export of the users stored in the current directory
+
+Import reads users as NDJSON, one JSON object per line, or as a JSON
+list, with an email, a password and optionally a first_name and a
+last_name. They are validated and hashed one batch at a time, then
+saved with a single write of the store. Export streams all users as
+NDJSON. `-`, the default, stands for stdin or stdout; the number of
+rows per second is reported on stderr.
+
+Usage: ./bulk_users.py import [FILE] [--batch-size N]
+       ./bulk_users.py export [FILE]
+"""
+from itertools import islice
+from models.user import User
+from typing import Iterator, TextIO, Tuple
+import argparse
+import json
+import sys
+import time
+
+
+def read_records(f: TextIO) -> Iterator[Tuple[int, object]]:
+    """ Yield the (line or position, record) pairs of an NDJSON file
+    or of a JSON list, None for the lines that aren't valid JSON
+    """
+    first = True
+    for number, line in enumerate(f, 1):
+        if line.strip() == "":
+            continue
+        if first and line.lstrip().startswith('['):
+            for position, record in enumerate(json.loads(line + f.read())):
+                yield position, record
+            return
+        first = False
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def import_users(f: TextIO, batch_size: int) -> int:
+    """ Save the users of `f`, return the number of errors
+    """
+    start = time.perf_counter()
+    records = read_records(f)
+    users, numbers, errors = [], [], []
+    while True:
+        batch = list(islice(records, batch_size))
+        if len(batch) == 0:
+            break
+        for number, record in batch:
+            try:
+                users.append(User.from_record(record))
+                numbers.append(number)
+            except ValueError as e:
+                errors.append((number, str(e)))
+        print("{} users read".format(len(users) + len(errors)),
+              file=sys.stderr)
+    rejected = User.save_all(users)
+    for position, error in rejected:
+        errors.append((numbers[position], error))
+    for number, error in sorted(errors):
+        print("{}: {}".format(number, error), file=sys.stderr)
+    created = len(users) - len(rejected)
+    seconds = time.perf_counter() - start
+    print("{} users created, {} errors in {:.2f} s: {:.0f} rows/s".format(
+        created, len(errors), seconds, created / seconds if seconds else 0),
+        file=sys.stderr)
+    return len(errors)
+
+
+def export_users(f: TextIO) -> int:
+    """ Write all users to `f`, one JSON object per line,
+    return the number of users
+    """
+    start = time.perf_counter()
+    exported = 0
+    for user in User.iterate():
+        f.write(json.dumps(user.to_json()) + "\n")
+        exported += 1
+    f.flush()
+    seconds = time.perf_counter() - start
+    print("{} users exported in {:.2f} s: {:.0f} rows/s".format(
+        exported, seconds, exported / seconds if seconds else 0),
+        file=sys.stderr)
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('command', choices=('import', 'export'))
+    parser.add_argument('file', nargs='?', default='-')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    User.load_from_file()
+    if args.command == 'import':
+        f = sys.stdin if args.file == '-' else open(args.file)
+        with f:
+            sys.exit(1 if import_users(f, args.batch_size) > 0 else 0)
+    f = sys.stdout if args.file == '-' else open(args.file, 'w')
+    with f:
+        export_users(f)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+""" Batch module
+"""
+from models.base import DATA
+from typing import TypeVar
+import atexit
+import threading
+
+
+class WriteBatch():
+    """ Groups the persistence of saves and removes of one model class
+
+    Objects are saved or removed in DATA right away, while their
+    records are persisted together, either once `max_records` are
+    pending or `interval` seconds after the first pending one.
+    """
+
+    def __init__(self, model: type, max_records: int = 100,
+                 interval: float = 0.05, fsync: bool = False):
+        """ Initialize a WriteBatch for `model`
+        """
+        self.model = model
+        self.max_records = max_records
+        self.interval = interval
+        self.fsync = fsync
+        self.flushes = 0
+        self.__pending = {}
+        self.__timer = None
+        self.__lock = threading.Lock()
+        self.__flush_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def save(self, obj: TypeVar('Base')):
+        """ Save `obj` now, persist it with the next flush
+        """
+        obj.save(deferred=True)
+        self.__add(obj.id)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Remove `obj` now, persist it with the next flush
+        """
+        obj.remove(deferred=True)
+        self.__add(obj.id)
+
+    def flush(self):
+        """ Persist all pending records in one write
+        """
+        with self.__flush_lock:
+            with self.__lock:
+                pending = self.__pending
+                self.__pending = {}
+                if self.__timer is not None:
+                    self.__timer.cancel()
+                    self.__timer = None
+            if len(pending) == 0:
+                return
+            objs = DATA.get(self.model.__name__, {})
+            records = []
+            for obj_id in pending:
+                obj = objs.get(obj_id)
+                if obj is None:
+                    records.append({"op": "remove", "id": obj_id})
+                else:
+                    records.append({"op": "save", "id": obj_id,
+                                    "obj": obj.to_json(True)})
+            self.model.persist(records, self.fsync)
+            self.flushes += 1
+
+    def __len__(self) -> int:
+        """ Number of pending records
+        """
+        return len(self.__pending)
+
+    def __add(self, obj_id: str):
+        """ Mark an object id as pending, flush if needed
+        """
+        with self.__lock:
+            self.__pending[obj_id] = None
+            full = len(self.__pending) >= self.max_records
+            if not full and self.__timer is None:
+                self.__timer = threading.Timer(self.interval, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+        if full:
+            self.flush()
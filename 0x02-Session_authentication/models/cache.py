@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+""" Cache module
+"""
+from collections import OrderedDict
+from typing import Any, Callable
+import threading
+import time
+
+
+class TTLCache():
+    """ Bounded LRU cache whose entries expire after `ttl` seconds
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60,
+                 on_evict: Callable = None):
+        """ Initialize a TTLCache
+
+        `on_evict(key, value)` is called for every entry leaving
+        the cache, whatever the reason.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """ Value cached for `key`, None if missing or expired
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                self.__evict(key)
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Any) -> Any:
+        """ Value cached for `key`, without touching recency or counters
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            return entry[0]
+
+    def set(self, key: Any, value: Any):
+        """ Cache `value` for `key`, evicting the least recently used
+        entry when full
+        """
+        with self.__lock:
+            if key in self.__entries:
+                self.__evict(key)
+            self.__entries[key] = (value, time.monotonic() + self.ttl)
+            while len(self.__entries) > self.max_size:
+                self.__evict(next(iter(self.__entries)))
+
+    def pop(self, key: Any) -> Any:
+        """ Remove `key` from the cache and return its value
+        """
+        with self.__lock:
+            if key not in self.__entries:
+                return None
+            return self.__evict(key)
+
+    def clear(self):
+        """ Remove all entries
+        """
+        with self.__lock:
+            for key in list(self.__entries):
+                self.__evict(key)
+
+    def __len__(self) -> int:
+        """ Number of cached entries
+        """
+        return len(self.__entries)
+
+    def __evict(self, key: Any) -> Any:
+        """ Remove an entry, lock held
+        """
+        value, _ = self.__entries.pop(key)
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+        return value
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+""" Identity map module
+"""
+from contextvars import ContextVar
+from typing import Any, Callable, Hashable
+import threading
+
+
+class IdentityMap():
+    """ Objects already fetched during the current unit of work,
+    usually a request, so that each is looked up at most once
+
+    A unit of work runs between `begin` and `end`; outside of one,
+    nothing is kept. The map lives in a ContextVar, private to its
+    thread or asyncio task. Its hits and misses are counted locally,
+    then added to the totals at `end` under a lock, once per unit.
+    """
+
+    def __init__(self):
+        """ Initialize an IdentityMap, outside of any unit of work
+        """
+        self.__unit = ContextVar('identity_map', default=None)
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def begin(self):
+        """ Start a unit of work with an empty map
+        """
+        self.__unit.set(({}, [0, 0]))
+
+    def end(self):
+        """ End the unit of work, forgetting its objects
+        """
+        unit = self.__unit.get()
+        if unit is None:
+            return
+        self.__unit.set(None)
+        hits, misses = unit[1]
+        with self.__lock:
+            self.hits += hits
+            self.misses += misses
+
+    def lookup(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """ Object of `key`, from the map or else from `fetch()`,
+        None results included
+        """
+        unit = self.__unit.get()
+        if unit is None:
+            return fetch()
+        objs, counts = unit
+        if key in objs:
+            counts[0] += 1
+            return objs[key]
+        counts[1] += 1
+        obj = objs[key] = fetch()
+        return obj
+
+    def put(self, key: Hashable, obj: Any):
+        """ Record `obj`, None once removed, as the object of `key`
+        in the current unit of work, if any
+        """
+        unit = self.__unit.get()
+        if unit is not None:
+            unit[0][key] = obj
+
+
+IDENTITY_MAP = IdentityMap()
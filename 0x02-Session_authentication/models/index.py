@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+""" Index module
+"""
+from itertools import chain
+from typing import Any, Iterable, Iterator, List, Tuple
+import bisect
+
+
+class Index():
+    """ Hash index on one or more attributes of a model
+
+    Maps the key of an object, its indexed value when the index has
+    a single attribute and the tuple of its values otherwise, to the
+    ids of the objects holding it: a bare id while a key has a single
+    object, which is the usual case, a dict of ids otherwise. Declared
+    on a model class through `__indexes__` and maintained by `Base`.
+    """
+
+    def __init__(self, *attributes: str, unique: bool = False):
+        """ Initialize an Index on `attributes`
+        """
+        self.attributes = tuple(attributes)
+        self.unique = unique
+        self.entries = {}
+        self.keys = {}
+
+    def copy(self) -> 'Index':
+        """ Return an empty index with the same definition
+        """
+        return self.__class__(*self.attributes, unique=self.unique)
+
+    def key(self, obj) -> Any:
+        """ Indexed value of an object, or tuple of its indexed values
+        """
+        if len(self.attributes) == 1:
+            return getattr(obj, self.attributes[0], None)
+        return tuple(getattr(obj, attr, None) for attr in self.attributes)
+
+    def complete(self, key: Any) -> bool:
+        """ Does `key` have no None value
+        """
+        if len(self.attributes) == 1:
+            return key is not None
+        return None not in key
+
+    def covers(self, attributes: Iterable[str]) -> bool:
+        """ Is every indexed attribute part of `attributes`
+        """
+        return set(self.attributes).issubset(attributes)
+
+    def add(self, obj):
+        """ Index an object, replacing its previous entry if any
+        """
+        key = self.key(obj)
+        if obj.id in self.keys and self.keys[obj.id] == key:
+            return
+        self.discard(obj.id)
+        self.keys[obj.id] = key
+        ids = self.entries.get(key)
+        if ids is None:
+            self.entries[key] = obj.id
+        elif type(ids) is dict:
+            ids[obj.id] = None
+        else:
+            self.entries[key] = {ids: None, obj.id: None}
+
+    def discard(self, obj_id: str):
+        """ Drop the entry of an object id
+        """
+        if obj_id not in self.keys:
+            return
+        key = self.keys.pop(obj_id)
+        ids = self.entries.get(key)
+        if type(ids) is dict:
+            ids.pop(obj_id, None)
+            if len(ids) == 0:
+                del self.entries[key]
+        elif ids == obj_id:
+            del self.entries[key]
+
+    def ids(self, key: Any) -> Iterable[str]:
+        """ Ids of the objects indexed under `key`
+        """
+        ids = self.entries.get(key)
+        if ids is None:
+            return ()
+        if type(ids) is dict:
+            return ids
+        return (ids,)
+
+    def clear(self):
+        """ Drop all entries
+        """
+        self.entries = {}
+        self.keys = {}
+
+    def build(self, objs: Iterable):
+        """ Index all `objs` from scratch
+        """
+        self.clear()
+        for obj in objs:
+            self.add(obj)
+
+    def conflict(self, obj) -> bool:
+        """ Would indexing `obj` break the uniqueness of the index
+
+        Objects with a None indexed value never conflict.
+        """
+        if not self.unique:
+            return False
+        key = self.key(obj)
+        if not self.complete(key):
+            return False
+        for obj_id in self.ids(key):
+            if obj_id != obj.id:
+                return True
+        return False
+
+    def lookup(self, attributes: dict) -> List[str]:
+        """ Ids of the objects matching the indexed part of `attributes`
+        """
+        if len(self.attributes) == 1:
+            return list(self.ids(attributes[self.attributes[0]]))
+        return list(self.ids(tuple(attributes[attr]
+                                   for attr in self.attributes)))
+
+
+class SortedIndex(Index):
+    """ Index also keeping its entries ordered by key
+
+    Entries are (key, id) pairs in a sorted list, so ordered scans
+    and pagination cost O(log n) to locate and O(1) per object.
+    None values sort last: on a single attribute, the ids holding
+    None are kept apart in `missing`, so that keys stay bare values.
+    """
+
+    def __init__(self, *attributes: str, unique: bool = False):
+        """ Initialize a SortedIndex on `attributes`
+        """
+        super().__init__(*attributes, unique=unique)
+        self.order = []
+        self.missing = []
+
+    def sortable(self, key: Any) -> Any:
+        """ Comparable form of a key: the key itself on a single
+        attribute, None values marked to sort last otherwise
+        """
+        if len(self.attributes) == 1:
+            return key
+        return tuple((value is None, value) for value in key)
+
+    def add(self, obj):
+        """ Index an object, replacing its previous entry if any
+        """
+        key = self.key(obj)
+        if obj.id in self.keys and self.keys[obj.id] == key:
+            return
+        super().add(obj)
+        if len(self.attributes) == 1 and key is None:
+            bisect.insort(self.missing, obj.id)
+        else:
+            bisect.insort(self.order, (self.sortable(key), obj.id))
+
+    def discard(self, obj_id: str):
+        """ Drop the entry of an object id
+        """
+        if obj_id in self.keys:
+            key = self.keys[obj_id]
+            if len(self.attributes) == 1 and key is None:
+                entries, entry = self.missing, obj_id
+            else:
+                entries, entry = self.order, (self.sortable(key), obj_id)
+            i = bisect.bisect_left(entries, entry)
+            if i < len(entries) and entries[i] == entry:
+                del entries[i]
+        super().discard(obj_id)
+
+    def clear(self):
+        """ Drop all entries
+        """
+        super().clear()
+        self.order = []
+        self.missing = []
+
+    def build(self, objs: Iterable):
+        """ Index all `objs` from scratch, sorting once
+        """
+        self.clear()
+        for obj in objs:
+            Index.add(self, obj)
+        if len(self.attributes) == 1:
+            self.order = sorted((key, obj_id)
+                                for obj_id, key in self.keys.items()
+                                if key is not None)
+            self.missing = sorted(obj_id for obj_id, key in self.keys.items()
+                                  if key is None)
+        else:
+            self.order = sorted((self.sortable(key), obj_id)
+                                for obj_id, key in self.keys.items())
+
+    def ordered(self, descending: bool = False) -> Iterator[str]:
+        """ All ids in key order
+        """
+        if descending:
+            return chain(reversed(self.missing),
+                         (obj_id for _, obj_id in reversed(self.order)))
+        return chain((obj_id for _, obj_id in self.order), self.missing)
+
+    def scan(self, low: Any, high: Any) -> List[str]:
+        """ Ids of an index on one attribute with `low <= value < high`,
+        in order
+        """
+        start, stop = 0, len(self.order)
+        if low is not None:
+            start = bisect.bisect_left(self.order, (low,))
+        if high is not None:
+            stop = bisect.bisect_left(self.order, (high,))
+        return [obj_id for _, obj_id in self.order[start:stop]]
+
+    def slice(self, after: Tuple = None, limit: int = None) -> List[str]:
+        """ Ids in key order, starting after the entry `after`,
+        a (key, id) pair
+        """
+        start = 0
+        if after is not None:
+            if len(self.attributes) == 1 and after[0] is None:
+                start = len(self.order) + bisect.bisect_right(self.missing,
+                                                              after[1])
+            else:
+                start = bisect.bisect_right(
+                    self.order, (self.sortable(after[0]), after[1]))
+        stop = None if limit is None else start + limit
+        ids = [obj_id for _, obj_id in self.order[start:stop]]
+        if stop is None or stop > len(self.order):
+            ids += self.missing[max(start - len(self.order), 0):
+                                None if stop is None
+                                else stop - len(self.order)]
+        return ids
+
+
+class IdIndex(SortedIndex):
+    """ Unique index of the ids, kept as a plain sorted list
+
+    Ids are the keys of DATA already, so the list is all that ordered
+    scans and pagination by id need.
+    """
+
+    def __init__(self, *attributes: str, unique: bool = True):
+        """ Initialize the IdIndex
+        """
+        super().__init__('id', unique=True)
+
+    def copy(self) -> 'IdIndex':
+        """ Return an empty IdIndex
+        """
+        return IdIndex()
+
+    def key(self, obj) -> str:
+        """ Id of an object
+        """
+        return obj.id
+
+    def contains(self, obj_id: str) -> bool:
+        """ Is `obj_id` indexed
+        """
+        i = bisect.bisect_left(self.order, obj_id)
+        return i < len(self.order) and self.order[i] == obj_id
+
+    def add(self, obj):
+        """ Index an object once
+        """
+        if not self.contains(obj.id):
+            bisect.insort(self.order, obj.id)
+
+    def discard(self, obj_id: str):
+        """ Drop an object id
+        """
+        i = bisect.bisect_left(self.order, obj_id)
+        if i < len(self.order) and self.order[i] == obj_id:
+            del self.order[i]
+
+    def ids(self, key: str) -> Iterable[str]:
+        """ The id `key` if indexed
+        """
+        return (key,) if self.contains(key) else ()
+
+    def clear(self):
+        """ Drop all ids
+        """
+        self.order = []
+
+    def build(self, objs: Iterable):
+        """ Index all `objs` from scratch, sorting once
+        """
+        self.order = sorted(obj.id for obj in objs)
+
+    def conflict(self, obj) -> bool:
+        """ Ids never conflict: saving an object with a stored id
+        replaces it
+        """
+        return False
+
+    def ordered(self, descending: bool = False) -> Iterator[str]:
+        """ All ids in order
+        """
+        return reversed(self.order) if descending else iter(self.order)
+
+    def scan(self, low: Any, high: Any) -> List[str]:
+        """ Ids with `low <= id < high`, in order
+        """
+        start, stop = 0, len(self.order)
+        if low is not None:
+            start = bisect.bisect_left(self.order, low)
+        if high is not None:
+            stop = bisect.bisect_left(self.order, high)
+        return self.order[start:stop]
+
+    def slice(self, after: Tuple = None, limit: int = None) -> List[str]:
+        """ Ids in order, starting after the entry `after`,
+        an (id, id) pair
+        """
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right(self.order, after[1])
+        stop = None if limit is None else start + limit
+        return self.order[start:stop]
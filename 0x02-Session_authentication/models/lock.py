@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+""" Lock module
+"""
+import fcntl
+import os
+import threading
+
+
+class FileLock():
+    """ Exclusive advisory lock on a file
+
+    Held across processes through flock, and reentrant across the
+    threads of a process: nested `with` blocks only lock once.
+    """
+
+    def __init__(self, file_path: str):
+        """ Initialize a FileLock on `file_path`, created if missing
+        """
+        self.file_path = file_path
+        self.__lock = threading.RLock()
+        self.__depth = 0
+        self.__file = None
+        self.__pid = None
+
+    def __enter__(self) -> 'FileLock':
+        """ Wait for the lock
+        """
+        self.__lock.acquire()
+        if self.__depth == 0:
+            if self.__file is None or self.__pid != os.getpid():
+                self.__file = open(self.file_path, 'ab')
+                self.__pid = os.getpid()
+            fcntl.flock(self.__file.fileno(), fcntl.LOCK_EX)
+        self.__depth += 1
+        return self
+
+    def __exit__(self, *args):
+        """ Release the lock
+        """
+        self.__depth -= 1
+        if self.__depth == 0:
+            fcntl.flock(self.__file.fileno(), fcntl.LOCK_UN)
+        self.__lock.release()
@@ -3,12 +3,16 @@
 """
 import hashlib
 from models.base import Base
+from models.index import Index
 
 
 class User(Base):
     """ User class
     """
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    __indexes__ = Base.__indexes__ + (Index('email', unique=True),)
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
@@ -18,6 +22,26 @@ class User(Base):
         self.first_name = kwargs.get('first_name')
         self.last_name = kwargs.get('last_name')
 
+    @classmethod
+    def from_record(cls, record: dict) -> 'User':
+        """ New User of a record with an email, a password and
+        optionally a first_name and a last_name
+
+        Raises a ValueError describing the first missing field.
+        """
+        if type(record) is not dict:
+            raise ValueError("Wrong format")
+        if record.get("email", "") == "":
+            raise ValueError("email missing")
+        if record.get("password", "") == "":
+            raise ValueError("password missing")
+        user = cls()
+        user.email = record.get("email")
+        user.password = record.get("password")
+        user.first_name = record.get("first_name")
+        user.last_name = record.get("last_name")
+        return user
+
     @property
     def password(self) -> str:
         """ Getter of the password
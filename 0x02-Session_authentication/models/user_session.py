@@ -2,11 +2,20 @@
 """ User  session module
 """
 from models.base import Base
+from models.index import Index, SortedIndex
+import sys
 
 
 class UserSession(Base):
     ''' user session class'''
+
+    __slots__ = ('user_id', 'session_id')
+    __indexes__ = Base.__indexes__ + (Index('session_id', unique=True),
+                                      SortedIndex('created_at'))
+
     def __init__(self, *args: list, **kwargs: dict):
         super().__init__(*args, **kwargs)
-        self.user_id = kwargs.get('user_id')
-        self.session_id = kwargs.get('session_id')
\ No newline at end of file
+        user_id = kwargs.get('user_id')
+        self.user_id = sys.intern(user_id) if type(user_id) is str \
+            else user_id
+        self.session_id = kwargs.get('session_id')
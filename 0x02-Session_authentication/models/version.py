@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+""" Version module
+"""
+from typing import Tuple
+import mmap
+import os
+import struct
+import time
+
+
+class SharedVersion():
+    """ Version counter of a model class, shared by processes
+
+    A small file mapped in memory holds a generation, bumped whenever
+    the journal is reset, a version, bumped by every write, and the
+    time of the last write. Reading it costs no system call, so it
+    can be checked on every read of the data.
+
+    Writers must hold the lock of the class files.
+    """
+    LAYOUT = struct.Struct('<QQd')
+
+    def __init__(self, file_path: str):
+        """ Map the counter stored in `file_path`, created if missing
+        """
+        self.file_path = file_path
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < self.LAYOUT.size:
+                os.ftruncate(fd, self.LAYOUT.size)
+            self.__map = mmap.mmap(fd, self.LAYOUT.size)
+        finally:
+            os.close(fd)
+
+    def read(self) -> Tuple[int, int]:
+        """ Current (generation, version)
+        """
+        generation, version, _ = self.LAYOUT.unpack_from(self.__map, 0)
+        return generation, version
+
+    @property
+    def written_at(self) -> float:
+        """ Time of the last write
+        """
+        return self.LAYOUT.unpack_from(self.__map, 0)[2]
+
+    def bump(self, generation: bool = False) -> Tuple[int, int]:
+        """ Count a write, and a new generation if `generation`;
+        return the new (generation, version)
+        """
+        current, version, _ = self.LAYOUT.unpack_from(self.__map, 0)
+        if generation:
+            current += 1
+        self.LAYOUT.pack_into(self.__map, 0, current, version + 1,
+                              time.time())
+        return current, version + 1
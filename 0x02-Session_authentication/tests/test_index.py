@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+""" Indexes of the model store: lookups, ordering and pagination
+
+Run from the 0x02-Session_authentication directory:
+
+    python3 -m unittest discover tests
+"""
+from models import base
+from models.index import IdIndex, Index, SortedIndex
+from models.user import User
+from types import SimpleNamespace
+import os
+import tempfile
+import unittest
+
+
+def obj(obj_id: str, **attributes) -> SimpleNamespace:
+    """ Object with an id and `attributes`
+    """
+    return SimpleNamespace(id=obj_id, **attributes)
+
+
+class TestIndex(unittest.TestCase):
+    """ Hash indexes on one or more attributes
+    """
+
+    def test_lookup(self):
+        """ Keys of one attribute are bare values, of several tuples
+        """
+        index = Index('email')
+        index.build([obj("1", email="a"), obj("2", email="b"),
+                     obj("3", email="a")])
+        self.assertEqual(index.keys["1"], "a")
+        self.assertEqual(sorted(index.lookup({'email': "a"})), ["1", "3"])
+        pair = Index('first_name', 'last_name')
+        pair.add(obj("1", first_name="Bob", last_name="Dylan"))
+        self.assertEqual(pair.lookup({'first_name': "Bob",
+                                      'last_name': "Dylan"}), ["1"])
+
+    def test_update(self):
+        """ Adding an object again moves it to its new key
+        """
+        index = Index('email')
+        user = obj("1", email="a")
+        index.add(user)
+        user.email = "b"
+        index.add(user)
+        self.assertEqual(index.lookup({'email': "a"}), [])
+        self.assertEqual(index.lookup({'email': "b"}), ["1"])
+        index.discard("1")
+        self.assertEqual(index.lookup({'email': "b"}), [])
+
+    def test_conflict(self):
+        """ Unique keys conflict with other ids, never on None
+        """
+        index = Index('email', unique=True)
+        index.build([obj("1", email="a"), obj("2", email=None)])
+        self.assertTrue(index.conflict(obj("3", email="a")))
+        self.assertFalse(index.conflict(obj("1", email="a")))
+        self.assertFalse(index.conflict(obj("3", email=None)))
+        self.assertFalse(Index('email').conflict(obj("3", email="a")))
+
+
+class TestSortedIndex(unittest.TestCase):
+    """ Ordered indexes
+    """
+
+    def setUp(self):
+        """ Index created_at values, some of them None
+        """
+        self.index = SortedIndex('created_at')
+        self.index.build([obj("a", created_at=3), obj("b", created_at=None),
+                          obj("c", created_at=1), obj("d", created_at=2),
+                          obj("e", created_at=None)])
+
+    def test_ordered(self):
+        """ Ids come in key order, None last
+        """
+        self.assertEqual(list(self.index.ordered()),
+                         ["c", "d", "a", "b", "e"])
+        self.assertEqual(list(self.index.ordered(True)),
+                         ["e", "b", "a", "d", "c"])
+        self.assertEqual(self.index.order[0], (1, "c"))
+
+    def test_add_discard(self):
+        """ Updates keep the order, moving ids from and to None
+        """
+        moved = obj("b", created_at=0)
+        self.index.add(moved)
+        self.index.add(obj("f", created_at=2))
+        self.index.discard("a")
+        moved.created_at = None
+        self.index.add(moved)
+        self.assertEqual(list(self.index.ordered()),
+                         ["c", "d", "f", "b", "e"])
+
+    def test_scan(self):
+        """ Ranges are half open, and skip None
+        """
+        self.assertEqual(self.index.scan(1, 3), ["c", "d"])
+        self.assertEqual(self.index.scan(2, None), ["d", "a"])
+        self.assertEqual(self.index.scan(None, 2), ["c"])
+
+    def test_slice(self):
+        """ Pages continue after a (key, id) cursor, into the None values
+        """
+        self.assertEqual(self.index.slice(None, 2), ["c", "d"])
+        self.assertEqual(self.index.slice((2, "d"), 2), ["a", "b"])
+        self.assertEqual(self.index.slice((3, "a"), 5), ["b", "e"])
+        self.assertEqual(self.index.slice((None, "b")), ["e"])
+
+    def test_several_attributes(self):
+        """ Tuples of several attributes sort None values last
+        """
+        index = SortedIndex('last_name', 'first_name')
+        index.build([obj("1", last_name="B", first_name=None),
+                     obj("2", last_name="B", first_name="A"),
+                     obj("3", last_name=None, first_name="A")])
+        self.assertEqual(list(index.ordered()), ["2", "1", "3"])
+        self.assertEqual(index.slice((("B", "A"), "2")), ["1", "3"])
+
+
+class TestIdIndex(unittest.TestCase):
+    """ Index of the ids
+    """
+
+    def test_ids(self):
+        """ Ids are kept once, in a plain sorted list
+        """
+        index = IdIndex()
+        index.build([obj("b"), obj("a")])
+        index.add(obj("c"))
+        index.add(obj("a"))
+        self.assertEqual(index.order, ["a", "b", "c"])
+        self.assertEqual(index.lookup({'id': "b"}), ["b"])
+        self.assertEqual(index.lookup({'id': "z"}), [])
+        self.assertFalse(index.conflict(obj("a")))
+        index.discard("b")
+        index.discard("z")
+        self.assertEqual(index.slice(("a", "a")), ["c"])
+        self.assertEqual(index.scan("b", None), ["c"])
+        self.assertEqual(list(index.ordered(True)), ["c", "a"])
+        self.assertIsInstance(index.copy(), IdIndex)
+
+
+class TestPagination(unittest.TestCase):
+    """ Pages of the stored objects, in id order
+    """
+
+    def setUp(self):
+        """ Store users in a temporary directory
+        """
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        for state in (base.DATA, base.INDEXES, base.JOURNALS, base.LOCKS,
+                      base.VERSIONS, base.SEEN, base.PENDING):
+            state.clear()
+        User.load_from_file()
+        self.ids = ["{:03}".format(i) for i in range(25)]
+        for obj_id in self.ids:
+            User(id=obj_id, email="{}@test.io".format(obj_id)).save()
+
+    def tearDown(self):
+        """ Leave the temporary directory
+        """
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def test_page(self):
+        """ Pages follow each other without gaps or repeats
+        """
+        first = User.page(10)
+        self.assertEqual([user.id for user in first], self.ids[:10])
+        self.assertEqual([user.id for user in User.page(10, first[-1].id)],
+                         self.ids[10:20])
+        self.assertEqual([user.id for user in User.iterate(7)], self.ids)
+
+    def test_page_after_remove(self):
+        """ A removed cursor still locates the next page
+        """
+        User.get(self.ids[4]).remove()
+        self.assertEqual([user.id for user in User.page(3, self.ids[4])],
+                         self.ids[5:8])
+
+    def test_query(self):
+        """ Queries use the sorted indexes for ranges and ordering
+        """
+        self.assertEqual([user.id for user in
+                          User.query().prefix("id", "01").all()],
+                         self.ids[10:20])
+        self.assertEqual([user.id for user in
+                          User.query().order_by("id", True).limit(3)],
+                         self.ids[:-4:-1])
+        self.assertEqual(User.query().filter(email="007@test.io")
+                         .first().id, "007")
+
+
+class TestUniqueness(unittest.TestCase):
+    """ Unique indexes enforced by the saves of a model
+    """
+
+    def setUp(self):
+        """ Store a user in a temporary directory
+        """
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        for state in (base.DATA, base.INDEXES, base.JOURNALS, base.LOCKS,
+                      base.VERSIONS, base.SEEN, base.PENDING):
+            state.clear()
+        User.load_from_file()
+        self.user = User(email="bob@test.io")
+        self.user.save()
+
+    def tearDown(self):
+        """ Leave the temporary directory
+        """
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def test_save(self):
+        """ A used email is refused, the stored user is left alone
+        """
+        other = User(email="bob@test.io")
+        with self.assertRaises(ValueError):
+            other.save()
+        self.assertIsNone(User.get(other.id))
+        self.assertEqual(User.search({"email": "bob@test.io"}), [self.user])
+        self.user.first_name = "Bob"
+        self.user.save()
+
+    def test_change(self):
+        """ A changed email frees the previous one
+        """
+        self.user.email = "robert@test.io"
+        self.user.save()
+        self.assertEqual(User.search({"email": "bob@test.io"}), [])
+        User(email="bob@test.io").save()
+        self.assertEqual(User.search({"email": "robert@test.io"}),
+                         [self.user])
+
+    def test_none(self):
+        """ Users without an email never conflict
+        """
+        User(email=None).save()
+        User(email=None).save()
+        self.assertEqual(len(User.search({"email": None})), 2)
+
+    def test_save_all(self):
+        """ Duplicates, against the store or earlier in the batch, are
+        skipped and reported by position
+        """
+        users = [User(email="a@test.io"), User(email="bob@test.io"),
+                 User(email="a@test.io"), User(email=None),
+                 User(email=None)]
+        errors = User.save_all(users)
+        self.assertEqual([position for position, _ in errors], [1, 2])
+        self.assertEqual(User.count(), 4)
+        self.assertEqual(User.search({"email": "a@test.io"}), [users[0]])
+        self.assertIsNone(User.get(users[2].id))
+
+
+if __name__ == "__main__":
+    unittest.main()
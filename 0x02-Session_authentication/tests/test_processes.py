@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+""" Changes of the model store shared by several processes
+
+Each test runs in a temporary directory, with other processes started
+from there. Run from the 0x02-Session_authentication directory:
+
+    python3 -m unittest discover tests
+"""
+from models import base
+from models.batch import WriteBatch
+from models.user_session import UserSession
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestProcesses(unittest.TestCase):
+    """ Store files written by another process meanwhile
+    """
+
+    def setUp(self):
+        """ Start from empty stores in a temporary directory
+        """
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        for state in (base.DATA, base.INDEXES, base.JOURNALS, base.LOCKS,
+                      base.VERSIONS, base.SEEN, base.PENDING):
+            state.clear()
+        UserSession.load_from_file()
+
+    def tearDown(self):
+        """ Leave the temporary directory
+        """
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def other_process(self, code: str):
+        """ Run `code` in another process, return what it printed
+        """
+        env = dict(os.environ, PYTHONPATH=SERVICE_DIR)
+        return subprocess.run(
+            [sys.executable, "-c", "from models.user_session import "
+             "UserSession\nUserSession.load_from_file()\n" + code],
+            env=env, capture_output=True, text=True, check=True).stdout
+
+    def stored_session_ids(self) -> list:
+        """ Session ids stored on file, as loaded by another process
+        """
+        return json.loads(self.other_process(
+            "import json\nprint(json.dumps(sorted("
+            "s.session_id for s in UserSession.all())))"))
+
+    def test_compaction_keeps_deferred_changes(self):
+        """ A new generation written by another process doesn't drop
+        the saves and removes still pending in a WriteBatch
+        """
+        batch = WriteBatch(UserSession, interval=60)
+        batch.save(UserSession(user_id="u1", session_id="kept"))
+        batch.flush()
+        removed = UserSession.query().filter(session_id="kept").first()
+        batch.save(UserSession(user_id="u1", session_id="pending"))
+        batch.remove(removed)
+
+        self.other_process(
+            "UserSession(user_id='u2', session_id='other').save()\n"
+            "UserSession.compact()")
+
+        session_ids = sorted(s.session_id for s in UserSession.all())
+        self.assertEqual(session_ids, ["other", "pending"])
+        self.assertIsNotNone(
+            UserSession.query().filter(session_id="pending").first())
+        batch.flush()
+        self.assertEqual(self.stored_session_ids(), ["other", "pending"])
+
+    def test_journal_records_keep_deferred_changes(self):
+        """ Records appended by another process for an object with
+        a pending change don't replace it
+        """
+        batch = WriteBatch(UserSession, interval=60)
+        user_session = UserSession(user_id="u1", session_id="mine")
+        batch.save(user_session)
+
+        self.other_process(
+            "UserSession(id='{}', user_id='u2', session_id='theirs')"
+            ".save()".format(user_session.id))
+
+        self.assertEqual(UserSession.get(user_session.id).session_id, "mine")
+        batch.flush()
+        self.assertEqual(self.stored_session_ids(), ["mine"])
+
+    def test_unique_conflict_rolls_back(self):
+        """ A deferred save taking a session id stored meanwhile by
+        another process is refused and dropped, the other one kept
+        """
+        mine = UserSession(user_id="u1", session_id="taken")
+        mine.save(deferred=True)
+
+        self.other_process(
+            "UserSession(user_id='u2', session_id='taken').save()")
+
+        with self.assertRaises(ValueError):
+            UserSession.persist([{"op": "save", "id": mine.id}])
+        self.assertIsNone(UserSession.get(mine.id))
+        stored = UserSession.query().filter(session_id="taken").first()
+        self.assertEqual(stored.user_id, "u2")
+        self.assertEqual(self.stored_session_ids(), ["taken"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+""" Snapshot serializers: round-trips of every available format
+
+Run from the 0x02-Session_authentication directory:
+
+    python3 -m unittest discover tests
+"""
+from datetime import datetime
+from models import base
+from models.serializers import (BinarySerializer, from_epoch, serializer,
+                                snapshot_serializers, to_epoch, SERIALIZERS)
+from models.user import User
+from unittest import mock
+import os
+import tempfile
+import unittest
+
+OBJS = {
+    "1": {"id": "1", "email": "andré@test.io", "count": 3,
+          "created_at": "2024-01-02T03:04:05", "flags": [1, "a"]},
+    "2": {"id": "2", "email": None, "count": None,
+          "created_at": "2024-01-02T03:04:06", "flags": {"admin": True}},
+    "3": {"id": "3", "email": "", "count": -2 ** 63,
+          "created_at": None, "flags": None, "extra": 1.5},
+}
+
+
+def available() -> list:
+    """ Serializers whose backend is installed
+    """
+    return [s for name, s in SERIALIZERS.items()
+            if serializer(name) is s]
+
+
+class TestSerializers(unittest.TestCase):
+    """ Snapshots written and read back
+    """
+
+    def setUp(self):
+        """ Work in a temporary directory
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def round_trip(self, snapshot, objs: dict) -> dict:
+        """ `objs` dumped to a file and loaded back by `snapshot`
+        """
+        file_path = os.path.join(self.directory.name,
+                                 "snapshot." + snapshot.extension)
+        snapshot.dump({obj_id: dict(obj) for obj_id, obj in objs.items()},
+                      file_path)
+        self.assertEqual([name for name in os.listdir(self.directory.name)
+                          if name.endswith(".tmp")], [])
+        return snapshot.load(file_path)
+
+    def test_round_trip(self):
+        """ Every value comes back, timestamps as epochs in the epoch
+        formats; the columns of the binary format give None to the
+        fields an object lacks
+        """
+        for snapshot in available():
+            with self.subTest(snapshot=snapshot.name):
+                loaded = self.round_trip(snapshot, OBJS)
+                expected = OBJS
+                if snapshot.epoch:
+                    expected = {obj_id: dict(obj, created_at=to_epoch(
+                        obj["created_at"])) for obj_id, obj in OBJS.items()}
+                if snapshot.name == 'binary':
+                    expected = {obj_id: dict({"extra": None}, **obj)
+                                for obj_id, obj in expected.items()}
+                self.assertEqual(loaded, expected)
+
+    def test_empty(self):
+        """ Empty snapshots round-trip too
+        """
+        for snapshot in available():
+            with self.subTest(snapshot=snapshot.name):
+                self.assertEqual(self.round_trip(snapshot, {}), {})
+
+    def test_binary_columns(self):
+        """ Columns are encoded as integers, strings or JSON values
+        """
+        binary = BinarySerializer()
+        self.assertEqual(binary.pack([1, None, -5])[0], binary.INTEGERS)
+        self.assertEqual(binary.pack(["é", None, ""])[0], binary.STRINGS)
+        for values in ([True, 1], [1.5], [2 ** 64], [["a"]], [{"a": 1}]):
+            kind, payload = binary.pack(values)
+            self.assertEqual(kind, binary.OTHERS)
+            self.assertEqual(binary.unpack(kind, payload, len(values)),
+                             values)
+
+    def test_binary_magic(self):
+        """ Other files are refused
+        """
+        with self.assertRaises(ValueError):
+            BinarySerializer().loads(b"{}" + bytes(10))
+
+    def test_epoch(self):
+        """ Epoch conversions are exact, to the second
+        """
+        date = datetime(2024, 1, 2, 3, 4, 5)
+        self.assertEqual(from_epoch(to_epoch(date)), date)
+        self.assertEqual(to_epoch("2024-01-02T03:04:05"), to_epoch(date))
+        self.assertIsNone(to_epoch(None))
+
+    def test_unknown_format(self):
+        """ Unknown formats are refused, missing backends fall back
+        """
+        with self.assertRaises(ValueError):
+            serializer("yaml")
+        self.assertIn(serializer("msgpack").name, ("msgpack", "json"))
+        extensions = [s.extension for s in snapshot_serializers()]
+        self.assertEqual(len(extensions), len(set(extensions)))
+
+
+class TestModelSnapshots(unittest.TestCase):
+    """ Users saved to and loaded from each snapshot format
+    """
+
+    def setUp(self):
+        """ Start from empty stores in a temporary directory
+        """
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        self.reset()
+        User.load_from_file()
+
+    def tearDown(self):
+        """ Leave the temporary directory
+        """
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    @staticmethod
+    def reset():
+        """ Forget the loaded objects, as a new process would
+        """
+        for journal in base.JOURNALS.values():
+            journal.close()
+        for state in (base.DATA, base.INDEXES, base.JOURNALS, base.LOCKS,
+                      base.VERSIONS, base.SEEN, base.PENDING):
+            state.clear()
+
+    def test_formats(self):
+        """ The latest snapshot is loaded whatever its format
+        """
+        user = User(email="bob@test.io", first_name="Bob")
+        user.password = "secret"
+        user.save()
+        for snapshot in available():
+            with self.subTest(snapshot=snapshot.name), \
+                    mock.patch.dict(os.environ,
+                                    {"STORAGE_FORMAT": snapshot.name}):
+                User.save_to_file()
+                self.reset()
+                User.load_from_file()
+                loaded = User.get(user.id)
+                self.assertEqual(loaded.email, "bob@test.io")
+                self.assertEqual(loaded.first_name, "Bob")
+                self.assertTrue(loaded.is_valid_password("secret"))
+                self.assertEqual(loaded.created_at,
+                                 user.created_at.replace(microsecond=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
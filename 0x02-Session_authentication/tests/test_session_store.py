@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+""" Session stores: memory, SQLite and memory-mapped file
+
+Run from the 0x02-Session_authentication directory:
+
+    python3 -m unittest discover tests
+"""
+from api.v1.auth.session_store import (MemorySessionStore, MmapSessionStore,
+                                       SQLiteSessionStore, SessionStoreFull)
+from datetime import datetime, timedelta
+import os
+import tempfile
+import unittest
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+class StoreTests():
+    """ Behaviour shared by every SessionStore, on `self.store`
+    """
+
+    def test_set_get_delete(self):
+        """ Sessions are read back with their creation date, once deleted
+        they are gone
+        """
+        self.store.set("s1", "u1", NOW)
+        self.store.set("s2", "u2")
+        self.assertEqual(self.store.get("s1"),
+                         {"user_id": "u1", "created_at": NOW})
+        self.assertEqual(self.store.get("s2"),
+                         {"user_id": "u2", "created_at": None})
+        self.assertEqual(len(self.store), 2)
+        self.assertTrue(self.store.delete("s1"))
+        self.assertFalse(self.store.delete("s1"))
+        self.assertIsNone(self.store.get("s1"))
+        self.assertIsNone(self.store.get("unknown"))
+        self.assertEqual(len(self.store), 1)
+
+    def test_expire(self):
+        """ Only the sessions created before the limit expire, undated
+        ones never do
+        """
+        for i in range(10):
+            self.store.set("s{}".format(i), "u", NOW + timedelta(minutes=i))
+        self.store.set("undated", "u")
+        self.assertEqual(self.store.expire(NOW + timedelta(minutes=4)), 4)
+        self.assertIsNone(self.store.get("s3"))
+        self.assertIsNotNone(self.store.get("s4"))
+        self.assertEqual(self.store.expire(NOW + timedelta(minutes=4)), 0)
+        self.assertEqual(self.store.expire(NOW + timedelta(days=1)), 6)
+        self.assertIsNotNone(self.store.get("undated"))
+
+    def test_replace(self):
+        """ Setting a session again replaces its user and date
+        """
+        self.store.set("s1", "u1", NOW)
+        self.store.set("s1", "u2", NOW + timedelta(hours=1))
+        self.assertEqual(self.store.expire(NOW + timedelta(minutes=1)), 0)
+        self.assertEqual(self.store.get("s1")["user_id"], "u2")
+        self.assertEqual(len(self.store), 1)
+
+
+class TestMemorySessionStore(StoreTests, unittest.TestCase):
+    """ Sessions in a dict, expired through a heap
+    """
+
+    def setUp(self):
+        """ Empty store
+        """
+        self.store = MemorySessionStore()
+
+    def test_stale_entries_dropped(self):
+        """ Deleted sessions don't grow the heap for ever
+        """
+        for i in range(1000):
+            self.store.set("s{}".format(i), "u", NOW)
+            self.store.delete("s{}".format(i))
+        self.assertLess(self.store.heap_size(), 200)
+        self.assertEqual(len(self.store), 0)
+
+    def test_session_gone_during_expire(self):
+        """ A session deleted between the check of a sweep and its
+        delete doesn't fail the sweep
+        """
+        class Sessions(dict):
+            """ Dict losing a session right after it is read """
+
+            def get(self, key, default=None):
+                value = super().get(key, default)
+                self.pop(key, None)
+                return value
+
+        store = MemorySessionStore(Sessions())
+        store.set("s1", "u1", NOW)
+        store.set("s2", "u2", NOW)
+        self.assertEqual(store.expire(NOW + timedelta(hours=1)), 2)
+        self.assertEqual(len(store), 0)
+
+    def test_not_expiring(self):
+        """ A store whose sessions never expire keeps no heap
+        """
+        store = MemorySessionStore(expiring=False)
+        store.set("s1", "u1", NOW)
+        self.assertEqual(store.heap_size(), 0)
+        self.assertEqual(store.get("s1")["created_at"], NOW)
+
+
+class TestSQLiteSessionStore(StoreTests, unittest.TestCase):
+    """ Sessions in a SQLite file
+    """
+
+    def setUp(self):
+        """ Empty store in a temporary directory
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = SQLiteSessionStore(
+            os.path.join(self.directory.name, "sessions.sqlite"))
+
+    def test_shared(self):
+        """ Stores opening the same file share their sessions
+        """
+        self.store.set("s1", "u1", NOW)
+        other = SQLiteSessionStore(self.store.file_path)
+        self.assertEqual(other.get("s1")["user_id"], "u1")
+
+
+class TestMmapSessionStore(StoreTests, unittest.TestCase):
+    """ Sessions in a memory-mapped hash table
+    """
+
+    def setUp(self):
+        """ Empty store in a temporary directory
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.store = MmapSessionStore(
+            os.path.join(self.directory.name, "sessions"), 64)
+
+    def test_shared(self):
+        """ Stores mapping the same file share their sessions and size
+        """
+        self.store.set("s1", "u1", NOW)
+        other = MmapSessionStore(self.store.file_path, 1024)
+        self.assertEqual(other.slots, 64)
+        self.assertEqual(other.get("s1")["user_id"], "u1")
+
+    def test_full(self):
+        """ A full table refuses new sessions, until some are deleted
+        """
+        for i in range(64):
+            self.store.set("s{}".format(i), "u", NOW)
+        with self.assertRaises(SessionStoreFull):
+            self.store.set("one more", "u", NOW)
+        self.store.set("s0", "other", NOW)
+        self.assertEqual(self.store.expire(NOW + timedelta(seconds=1)), 64)
+        self.store.set("one more", "u", NOW)
+        self.assertEqual(len(self.store), 1)
+
+    def test_tombstones_reclaimed(self):
+        """ Deleted slots are reused, so churn never fills the table
+        """
+        for i in range(1000):
+            self.store.set("s{}".format(i), "u", NOW)
+            self.store.delete("s{}".format(i))
+        self.assertEqual(len(self.store), 0)
+        self.assertLess(self.store.tombstones(), 64)
+
+    def test_long_ids(self):
+        """ IDs longer than the slots are refused
+        """
+        with self.assertRaises(ValueError):
+            self.store.set("s" * 37, "u")
+        self.assertIsNone(self.store.get("s" * 37))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+""" Signed session tokens: validation and revocation
+
+Run from the 0x02-Session_authentication directory:
+
+    python3 -m unittest discover tests
+"""
+from api.v1.auth.session_token_auth import SessionTokenAuth
+from unittest import mock
+import os
+import tempfile
+import time
+import unittest
+
+ENVIRON = {'SESSION_NAME': '_my_session_id',
+           'SESSION_TOKEN_KEYS': 'k1:secret one,k0:secret zero',
+           'SESSION_DURATION': '60',
+           'SESSION_STORE': 'memory'}
+
+
+class Request:
+    """ Request carrying a session cookie
+    """
+
+    def __init__(self, session_id: str) -> None:
+        """ Set the session cookie to `session_id`
+        """
+        self.cookies = {'_my_session_id': session_id}
+
+
+class TestSessionTokenAuth(unittest.TestCase):
+    """ Tokens issued, checked and revoked by SessionTokenAuth
+    """
+
+    def setUp(self):
+        """ Build an auth from the test settings
+        """
+        patcher = mock.patch.dict(os.environ, ENVIRON)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.auth = SessionTokenAuth()
+
+    def test_settings_required(self):
+        """ Keys and a positive duration are required
+        """
+        for name, value in (('SESSION_TOKEN_KEYS', ''),
+                            ('SESSION_TOKEN_KEYS', 'k1'),
+                            ('SESSION_DURATION', '0'),
+                            ('SESSION_DURATION', 'none')):
+            with mock.patch.dict(os.environ, {name: value}):
+                with self.assertRaises(ValueError):
+                    SessionTokenAuth()
+
+    def test_valid_token(self):
+        """ A token issued by any node sharing the keys is valid
+        """
+        token = self.auth.create_session("user-1")
+        self.assertEqual(self.auth.user_id_for_session_id(token), "user-1")
+        self.assertEqual(SessionTokenAuth().user_id_for_session_id(token),
+                         "user-1")
+        self.assertIsNone(self.auth.create_session("user.1"))
+        self.assertIsNone(self.auth.create_session(None))
+
+    def test_tampered_token(self):
+        """ Any change to a token invalidates it
+        """
+        token = self.auth.create_session("user-1")
+        key_id, user_id, issued_at, nonce, signature = token.split('.')
+        for parts in (("k0", user_id, issued_at, nonce, signature),
+                      (key_id, "user-2", issued_at, nonce, signature),
+                      (key_id, user_id, str(int(issued_at) + 1), nonce,
+                       signature),
+                      (key_id, user_id, issued_at, nonce, signature[1:]),
+                      ("k9", user_id, issued_at, nonce, signature)):
+            self.assertIsNone(
+                self.auth.user_id_for_session_id('.'.join(parts)))
+        self.assertIsNone(self.auth.user_id_for_session_id(token + ".x"))
+        self.assertIsNone(self.auth.user_id_for_session_id(None))
+
+    def test_rotated_key(self):
+        """ Tokens signed with a key left in the keys stay valid
+        """
+        token = self.auth.create_session("user-1")
+        with mock.patch.dict(os.environ,
+                             {'SESSION_TOKEN_KEYS': 'k2:two,k1:secret one'}):
+            rotated = SessionTokenAuth()
+        self.assertEqual(rotated.user_id_for_session_id(token), "user-1")
+        with mock.patch.dict(os.environ, {'SESSION_TOKEN_KEYS': 'k2:two'}):
+            self.assertIsNone(
+                SessionTokenAuth().user_id_for_session_id(token))
+
+    def test_expired_token(self):
+        """ Tokens older than SESSION_DURATION are rejected
+        """
+        token = self.auth.create_session("user-1")
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertIsNone(self.auth.user_id_for_session_id(token))
+
+    def test_revoked_token(self):
+        """ A logout rejects its token only, for as long as it is valid
+        """
+        token = self.auth.create_session("user-1")
+        other = self.auth.create_session("user-1")
+        self.assertTrue(self.auth.destroy_session(Request(token)))
+        self.assertIsNone(self.auth.user_id_for_session_id(token))
+        self.assertFalse(self.auth.destroy_session(Request(token)))
+        self.assertEqual(self.auth.user_id_for_session_id(other), "user-1")
+        self.assertFalse(self.auth.destroy_session(None))
+
+    def test_many_logouts(self):
+        """ However many tokens are revoked, the others stay valid and
+        the revoked ones stay rejected
+        """
+        revoked = [self.auth.create_session("user-{}".format(i))
+                   for i in range(2000)]
+        for token in revoked:
+            self.assertTrue(self.auth.destroy_session(Request(token)))
+        fresh = self.auth.create_session("user-fresh")
+        self.assertEqual(self.auth.user_id_for_session_id(fresh),
+                         "user-fresh")
+        for token in revoked:
+            self.assertIsNone(self.auth.user_id_for_session_id(token))
+
+    def test_sweep(self):
+        """ Sweeps forget the revocations of expired tokens only
+        """
+        token = self.auth.create_session("user-1")
+        self.auth.destroy_session(Request(token))
+        self.assertEqual(self.auth.sweep(), 0)
+        self.assertEqual(len(self.auth.revoked), 1)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertEqual(self.auth.sweep(), 1)
+        self.assertEqual(len(self.auth.revoked), 0)
+
+    def test_shared_revocations(self):
+        """ With a shared store, a logout on one node rejects the token
+        on the others
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'revoked.sqlite')
+            with mock.patch.dict(os.environ, {'SESSION_STORE': 'sqlite',
+                                              'SESSION_STORE_PATH': path}):
+                node, other_node = SessionTokenAuth(), SessionTokenAuth()
+            token = node.create_session("user-1")
+            self.assertTrue(other_node.destroy_session(Request(token)))
+            self.assertIsNone(node.user_id_for_session_id(token))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+""" Snapshots and journal of the model store
+
+Each test runs in a temporary directory. Run from the
+0x02-Session_authentication directory:
+
+    python3 -m unittest discover tests
+"""
+from models import base
+from models.user import User
+from unittest import mock
+import os
+import tempfile
+import unittest
+
+
+class TestStorage(unittest.TestCase):
+    """ Saves journaled, replayed and compacted
+    """
+
+    def setUp(self):
+        """ Start from empty stores in a temporary directory
+        """
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        self.reset()
+        User.load_from_file()
+
+    def tearDown(self):
+        """ Leave the temporary directory
+        """
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    @staticmethod
+    def reset():
+        """ Forget the loaded objects, as a new process would
+        """
+        for journal in base.JOURNALS.values():
+            journal.close()
+        for state in (base.DATA, base.INDEXES, base.JOURNALS, base.LOCKS,
+                      base.VERSIONS, base.SEEN, base.PENDING):
+            state.clear()
+
+    def reload(self) -> dict:
+        """ Emails by id, as loaded from file by a new process
+        """
+        self.reset()
+        User.load_from_file()
+        return {user.id: user.email for user in User.all()}
+
+    def test_saves_go_to_the_journal(self):
+        """ Saves and removes are replayed from the journal alone
+        """
+        kept = User(email="kept@test.io")
+        kept.save()
+        removed = User(email="removed@test.io")
+        removed.save()
+        removed.remove()
+        self.assertFalse(os.path.exists(User.snapshot_path()))
+        self.assertEqual(self.reload(), {kept.id: "kept@test.io"})
+
+    def test_snapshot_mode(self):
+        """ In snapshot mode, each save also rewrites the snapshot
+        """
+        with mock.patch.object(base, 'STORAGE_MODE', 'snapshot'):
+            user = User(email="snapshot@test.io")
+            user.save()
+        self.assertTrue(os.path.exists(User.snapshot_path()))
+        self.assertEqual(self.reload(), {user.id: "snapshot@test.io"})
+
+    def test_compaction(self):
+        """ JOURNAL_MAX_RECORDS records are compacted into a snapshot,
+        fsynced before the journal is emptied
+        """
+        with mock.patch.object(base, 'JOURNAL_MAX_RECORDS', 3), \
+                mock.patch('os.fsync', wraps=os.fsync) as fsync:
+            users = [User(email="{}@test.io".format(i)) for i in range(4)]
+            for user in users:
+                user.save()
+        self.assertTrue(fsync.called)
+        self.assertEqual(User.journal().count, 1)
+        self.assertEqual(self.reload(), {user.id: user.email
+                                         for user in users})
+
+    def test_torn_record(self):
+        """ A record cut by a crash is dropped, the next ones are kept
+        """
+        first = User(email="first@test.io")
+        first.save()
+        User.journal().close()
+        with open(".db_User.journal", "ab") as f:
+            f.write(b'{"op": "save", "id": "torn", "obj": {"id"')
+        self.assertEqual(self.reload(), {first.id: "first@test.io"})
+        second = User(email="second@test.io")
+        second.save()
+        self.assertEqual(self.reload(), {first.id: "first@test.io",
+                                         second.id: "second@test.io"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+""" Users endpoints of the API: pages, streams and bulk imports
+
+Each test runs in a temporary directory, without authentication.
+Run from the 0x02-Session_authentication directory:
+
+    python3 -m unittest discover tests
+"""
+from io import StringIO
+from models import base
+from models.user import User
+from unittest import mock
+import bulk_users
+import importlib
+import json
+import os
+import tempfile
+import unittest
+
+
+class UsersAPITestCase(unittest.TestCase):
+    """ Test client of the API over an empty store
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """ Import the app, which loads the users of the current
+        directory, from a temporary one
+        """
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict(os.environ, {"AUTH_TYPE": ""}):
+            os.chdir(directory)
+            try:
+                cls.app = importlib.import_module("api.v1.app").app
+            finally:
+                os.chdir(cwd)
+
+    def setUp(self):
+        """ Start from empty stores in a temporary directory
+        """
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        for journal in base.JOURNALS.values():
+            journal.close()
+        for state in (base.DATA, base.INDEXES, base.JOURNALS, base.LOCKS,
+                      base.VERSIONS, base.SEEN, base.PENDING):
+            state.clear()
+        User.load_from_file()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """ Leave the temporary directory
+        """
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+
+class TestUserPages(UsersAPITestCase):
+    """ GET /api/v1/users, paginated and streamed
+    """
+
+    def setUp(self):
+        """ Store 25 users
+        """
+        super().setUp()
+        User.save_all([User(email="{:02}@test.io".format(i))
+                       for i in range(25)])
+        self.ids = sorted(user.id for user in User.all())
+
+    def test_pages(self):
+        """ Cursors walk all users in id order, once each
+        """
+        ids, cursor, pages = [], "", 0
+        while cursor is not None:
+            response = self.client.get("/api/v1/users", query_string={
+                "limit": 10, "cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+            ids += [user["id"] for user in response.json["users"]]
+            cursor = response.json["next_cursor"]
+            pages += 1
+        self.assertEqual(ids, self.ids)
+        self.assertEqual(pages, 3)
+
+    def test_exact_last_page(self):
+        """ A full last page is followed by an empty one
+        """
+        response = self.client.get("/api/v1/users?limit=25")
+        self.assertEqual(len(response.json["users"]), 25)
+        response = self.client.get("/api/v1/users", query_string={
+            "limit": 25, "cursor": response.json["next_cursor"]})
+        self.assertEqual(response.json,
+                         {"users": [], "next_cursor": None})
+
+    def test_wrong_parameters(self):
+        """ Wrong limits and cursors are refused with a 400
+        """
+        for query in ("limit=0", "limit=1001", "limit=ten",
+                      "cursor=%25%25", "cursor=gA"):
+            response = self.client.get("/api/v1/users?" + query)
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_all(self):
+        """ Without parameters, the historical list of all users
+        """
+        response = self.client.get("/api/v1/users")
+        self.assertEqual(sorted(user["id"] for user in response.json),
+                         self.ids)
+
+    def test_ndjson(self):
+        """ format=ndjson streams one user per line
+        """
+        response = self.client.get("/api/v1/users?format=ndjson")
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines],
+                         self.ids)
+
+    def test_stream(self):
+        """ format=stream streams the JSON list, empty or not
+        """
+        response = self.client.get("/api/v1/users?format=stream")
+        self.assertEqual([user["id"] for user in response.json], self.ids)
+        for user in User.all():
+            user.remove()
+        response = self.client.get("/api/v1/users?format=stream")
+        self.assertEqual(response.json, [])
+
+
+class TestBulkUsers(UsersAPITestCase):
+    """ POST /api/v1/users/bulk and the bulk_users.py CLI
+    """
+
+    def test_json_list(self):
+        """ Valid users are created, the others reported by position
+        """
+        User(email="taken@test.io").save()
+        response = self.client.post("/api/v1/users/bulk", json=[
+            {"email": "a@test.io", "password": "pwd", "first_name": "A"},
+            {"email": "b@test.io"},
+            {"email": "taken@test.io", "password": "pwd"},
+            "not a user",
+            {"email": "a@test.io", "password": "pwd"},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json["created"], 1)
+        self.assertEqual([(error["index"], error["error"])
+                          for error in response.json["errors"]],
+                         [(1, "password missing"),
+                          (2, "Can't create User: email already used"),
+                          (3, "Wrong format"),
+                          (4, "Can't create User: email already used")])
+        user = User.search({"email": "a@test.io"})[0]
+        self.assertEqual(user.first_name, "A")
+        self.assertTrue(user.is_valid_password("pwd"))
+
+    def test_ndjson(self):
+        """ NDJSON bodies hold one user per line
+        """
+        body = "\n".join(json.dumps({"email": "{}@test.io".format(i),
+                                     "password": "pwd"})
+                         for i in range(3)) + "\n\n"
+        response = self.client.post(
+            "/api/v1/users/bulk", data=body,
+            content_type="application/x-ndjson")
+        self.assertEqual(response.json["created"], 3)
+        self.assertEqual(User.count(), 3)
+
+    def test_refused(self):
+        """ Wrong bodies, too many users or none created give a 400
+        """
+        for data, content_type in (("{}", "application/json"),
+                                   ("{", "application/x-ndjson"),
+                                   ("[{}]", "application/json")):
+            response = self.client.post("/api/v1/users/bulk", data=data,
+                                        content_type=content_type)
+            self.assertEqual(response.status_code, 400, data)
+        with mock.patch("api.v1.views.users.BULK_LIMIT", 2):
+            response = self.client.post("/api/v1/users/bulk", json=[
+                {"email": "{}@test.io".format(i), "password": "pwd"}
+                for i in range(3)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.count(), 0)
+
+    def test_cli(self):
+        """ Users exported by the CLI import back, lines numbered in
+        the errors
+        """
+        lines = StringIO('{"email": "a@test.io", "password": "pwd"}\n'
+                         'not json\n'
+                         '\n'
+                         '{"email": "b@test.io", "password": "pwd"}\n')
+        with mock.patch("sys.stderr", new_callable=StringIO) as stderr:
+            self.assertEqual(bulk_users.import_users(lines, 1), 1)
+            self.assertIn("2: Wrong format", stderr.getvalue())
+            exported = StringIO()
+            self.assertEqual(bulk_users.export_users(exported), 2)
+        self.assertEqual(sorted(json.loads(line)["email"] for line in
+                                exported.getvalue().splitlines()),
+                         ["a@test.io", "b@test.io"])
+        with mock.patch("sys.stderr", new_callable=StringIO):
+            self.assertEqual(bulk_users.import_users(
+                StringIO('[{"email": "c@test.io", "password": "pwd"}]'),
+                10), 0)
+        self.assertEqual(User.count(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
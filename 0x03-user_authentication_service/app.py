@@ -5,14 +5,39 @@ that provides user AUTHentication services.
 '''
 
 from flask import Flask, jsonify, request, abort, redirect, url_for
-from auth import Auth
+from auth import Auth, HASHER
+from hasher import Overloaded
 from sqlalchemy.exc import NoResultFound
+import os
 
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = int(
+    os.getenv("MAX_CONTENT_LENGTH", str(1024 * 1024)))
 AUTH = Auth()
 
 
+@app.teardown_appcontext
+def close_session(exception=None) -> None:
+    """
+    Release the database session of the request thread.
+    """
+    AUTH.close_session()
+
+
+@app.errorhandler(Overloaded)
+def overloaded(error) -> str:
+    """
+    Shed load when the password hashing queue is full.
+
+    Returns:
+        JSON: A 503 response asking the client to retry later.
+    """
+    response = jsonify({"message": "server overloaded"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @app.route('/', methods=['GET'])
 def home() -> str:
     """
@@ -134,5 +159,18 @@ def update_password():
         abort(403)
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Get the password hashing and session cache metrics.
+
+    Returns:
+        JSON: The hashing queue depth, latency and rejection counters,
+        and the session cache hit and miss counters.
+    """
+    return jsonify({"hasher": HASHER.metrics(),
+                    "user_cache": AUTH.cache_metrics()})
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port="5000")
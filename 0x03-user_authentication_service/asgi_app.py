@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+'''
+This module contains an ASGI application providing the same
+user authentication routes as app.py, without blocking on
+SQLite or bcrypt.
+
+Run it with any ASGI server, e.g.: uvicorn asgi_app:app --port 5000
+
+Request bodies over MAX_CONTENT_LENGTH bytes, 1 MiB by default, are
+refused with a 413, as app.py does. Error responses without a JSON
+payload carry the same HTML bodies as the Flask ones.
+'''
+
+from async_auth import AsyncAuth
+from auth import HASHER
+from hasher import Overloaded
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+from werkzeug.exceptions import default_exceptions
+import json
+import os
+
+
+AUTH = AsyncAuth()
+MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(1024 * 1024)))
+
+
+class Request:
+    """Method, path, form and cookies of an HTTP request."""
+
+    def __init__(self, scope: dict, body: bytes):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.form = {key: values[0] for key, values in parse_qs(
+            body.decode("utf-8", "replace"),
+            keep_blank_values=True).items()}
+        self.cookies = {}
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookie = SimpleCookie(value.decode("latin-1"))
+                self.cookies.update(
+                    {key: morsel.value for key, morsel in cookie.items()})
+
+
+def response(status: int, payload: dict = None, headers: list = None):
+    """Builds a (status, headers, body) response, JSON if `payload`.
+
+    Errors without a payload get the HTML body Flask would send.
+    """
+    headers = list(headers or [])
+    body = b""
+    if payload is not None:
+        body = json.dumps(payload).encode()
+        headers.append((b"content-type", b"application/json"))
+    elif status in default_exceptions:
+        body = default_exceptions[status]().get_body().encode()
+        headers.append((b"content-type", b"text/html; charset=utf-8"))
+    return status, headers, body
+
+
+async def read_body(scope: dict, receive) -> bytes:
+    """Body of a request, None past MAX_CONTENT_LENGTH bytes."""
+    for name, value in scope["headers"]:
+        if name == b"content-length" and value.isdigit() and \
+                int(value) > MAX_CONTENT_LENGTH:
+            return None
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_CONTENT_LENGTH:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def home(request: Request):
+    """GET / : a JSON response with a welcome message."""
+    return response(200, {"message": "Bienvenue"})
+
+
+async def register_user(request: Request):
+    """POST /users : registers a new user."""
+    email = request.form.get("email")
+    password = request.form.get("password")
+    if email is None or password is None:
+        return response(400)
+    try:
+        await AUTH.register_user(email, password)
+        return response(200, {"email": email, "message": "user created"})
+    except ValueError:
+        return response(400, {"message": "email already registered"})
+
+
+async def login(request: Request):
+    """POST /sessions : logs a user in and sets its session cookie."""
+    email = request.form.get("email")
+    password = request.form.get("password")
+    if email is None or password is None:
+        return response(401)
+    if not await AUTH.valid_login(email, password):
+        return response(401)
+    session_id = await AUTH.create_session(email)
+    cookie = "session_id={}; Path=/".format(session_id).encode()
+    return response(200, {"email": email, "message": "logged in"},
+                    [(b"set-cookie", cookie)])
+
+
+async def logout(request: Request):
+    """DELETE /sessions : logs a user out and redirects to /."""
+    session_id = request.cookies.get("session_id")
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user is None:
+        return response(403)
+    await AUTH.destroy_session(user.id)
+    return response(302, None, [(b"location", b"/")])
+
+
+async def profile(request: Request):
+    """GET /profile : the email of the logged in user."""
+    session_id = request.cookies.get("session_id")
+    user = await AUTH.get_user_from_session_id(session_id)
+    if user is None:
+        return response(403)
+    return response(200, {"email": user.email})
+
+
+async def get_reset_password_token(request: Request):
+    """POST /reset_password : a reset password token for a user."""
+    email = request.form.get("email")
+    if email is None:
+        return response(403)
+    try:
+        token = await AUTH.get_reset_password_token(email)
+    except ValueError:
+        return response(403)
+    return response(200, {"email": email, "reset_token": token})
+
+
+async def update_password(request: Request):
+    """PUT /reset_password : updates the password of a user."""
+    email = request.form.get("email")
+    try:
+        await AUTH.update_password(request.form.get("reset_token"),
+                                   request.form.get("new_password"))
+    except ValueError:
+        return response(403)
+    return response(200, {"email": email, "message": "Password updated"})
+
+
+async def metrics(request: Request):
+    """GET /metrics : the password hashing metrics."""
+    return response(200, {"hasher": HASHER.metrics()})
+
+
+ROUTES = {
+    ("GET", "/"): home,
+    ("POST", "/users"): register_user,
+    ("POST", "/sessions"): login,
+    ("DELETE", "/sessions"): logout,
+    ("GET", "/profile"): profile,
+    ("POST", "/reset_password"): get_reset_password_token,
+    ("PUT", "/reset_password"): update_password,
+    ("GET", "/metrics"): metrics,
+}
+
+
+async def dispatch(request: Request):
+    """Runs the handler of the route of `request`."""
+    handler = ROUTES.get((request.method, request.path))
+    if handler is None:
+        known = any(path == request.path for _, path in ROUTES)
+        return response(405 if known else 404)
+    try:
+        return await handler(request)
+    except Overloaded:
+        return response(503, {"message": "server overloaded"},
+                        [(b"retry-after", b"1")])
+
+
+async def lifespan(receive, send) -> None:
+    """Prepares the database on startup and closes it on shutdown."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await AUTH.setup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await AUTH.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    body = await read_body(scope, receive)
+    if body is None:
+        status, headers, body = response(413)
+    else:
+        status, headers, body = await dispatch(Request(scope, body))
+    headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status,
+                "headers": headers})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Async Auth module
+
+This module contains the AsyncAuth class, the asyncio counterpart
+of Auth: database calls are awaited on AsyncDB and bcrypt runs
+on the HASHER pool without blocking the event loop.
+"""
+
+from async_db import AsyncDB
+from auth import HASHER, _generate_uuid
+from sqlalchemy.exc import IntegrityError, NoResultFound
+from typing import Union
+from user import User
+
+
+class AsyncAuth:
+    """AsyncAuth class to interact with the authentication database.
+
+    Methods:
+    - setup
+    - register_user
+    - valid_login
+    - create_session
+    - get_user_from_session_id
+    - destroy_session
+    - get_reset_password_token
+    - update_password
+    - close
+    """
+
+    def __init__(self):
+        self._db = AsyncDB()
+
+    async def setup(self) -> None:
+        """Prepares the database, to await once before serving."""
+        await self._db.setup()
+
+    async def close(self) -> None:
+        """Closes the database connections, to await on shutdown."""
+        await self._db.close()
+
+    async def register_user(self, email: str, password: str) -> User:
+        """Registers a new user.
+
+        Args:
+            email: The email of the user.
+            password: The password of the user.
+
+        Returns:
+            The User object representing the registered user.
+
+        Raises:
+            ValueError: If the user already exists.
+            Overloaded: If the hashing queue is full.
+        """
+        try:
+            await self._db.find_user_by(email=email)
+            raise ValueError(f"User {email} already exists")
+        except NoResultFound:
+            hashed_pasw = await HASHER.hash_async(password)
+            try:
+                return await self._db.add_user(email, hashed_pasw)
+            except IntegrityError:
+                raise ValueError(f"User {email} already exists")
+
+    async def valid_login(self, email: str, password: str) -> bool:
+        """Validates a user's login credentials.
+
+        Args:
+            email: The email of the user.
+            password: The password of the user.
+
+        Returns:
+            True if the login credentials are valid, False otherwise.
+
+        Raises:
+            Overloaded: If the hashing queue is full.
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            return False
+        return await HASHER.check_async(password, user.hashed_password)
+
+    async def create_session(self, email: str) -> str:
+        """Creates a session for a user.
+
+        Args:
+            email: The email of the user.
+
+        Returns:
+            The session ID as a string, None if the user doesn't exist.
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            return None
+        session_id = _generate_uuid()
+        await self._db.update_user(user.id, session_id=session_id)
+        return session_id
+
+    async def get_user_from_session_id(
+            self, session_id: str) -> Union[User, None]:
+        """Retrieves a user based on a session ID.
+
+        Args:
+            session_id: The session ID of the user.
+
+        Returns:
+            The User object representing the user if found, None otherwise.
+        """
+        if session_id is None:
+            return None
+        try:
+            return await self._db.find_user_by(session_id=session_id)
+        except NoResultFound:
+            return None
+
+    async def destroy_session(self, user_id) -> None:
+        """Destroys a user's session.
+
+        Args:
+            user_id: The ID of the user.
+        """
+        try:
+            await self._db.update_user(user_id, session_id=None)
+        except ValueError:
+            return None
+
+    async def get_reset_password_token(self, email: str) -> str:
+        """Generates a reset password token for a user.
+
+        Args:
+            email: The email of the user.
+
+        Returns:
+            The reset password token as a string.
+
+        Raises:
+            ValueError: If the user does not exist.
+        """
+        try:
+            user = await self._db.find_user_by(email=email)
+        except NoResultFound:
+            raise ValueError
+        reset_token = _generate_uuid()
+        await self._db.update_user(user.id, reset_token=reset_token)
+        return reset_token
+
+    async def update_password(self, reset_token: str, password: str):
+        """Updates a user's password.
+
+        Args:
+            reset_token: The reset password token.
+            password: The new password.
+
+        Raises:
+            ValueError: If the reset token is invalid, or if the token
+            or the password is missing.
+            Overloaded: If the hashing queue is full.
+        """
+        if not reset_token or not password:
+            raise ValueError
+        try:
+            user = await self._db.find_user_by(reset_token=reset_token)
+        except NoResultFound:
+            raise ValueError
+        hashed_pasw = await HASHER.hash_async(password)
+        await self._db.update_user(user.id, hashed_password=hashed_pasw,
+                                   reset_token=None)
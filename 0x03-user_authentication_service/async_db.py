@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Async DB module
+
+This module contains the AsyncDB class, the asyncio counterpart
+of DB, built on SQLAlchemy's asyncio extension.
+"""
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError, NoResultFound
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from db import _configure_sqlite, database_url
+from user import Base, User
+import os
+
+
+class AsyncDB:
+    """AsyncDB class
+
+    This class provides coroutines for interacting with the database.
+    Each call runs in its own session, so concurrent requests never
+    share one.
+    """
+
+    def __init__(self, url: str = None) -> None:
+        """Initialize a new AsyncDB instance
+
+        `setup` must be awaited before the first query.
+
+        Args:
+            url (str): The database URL. Defaults to ASYNC_DATABASE_URL,
+            or to `database_url()` with the aiosqlite driver.
+        """
+        if url is None:
+            url = os.getenv("ASYNC_DATABASE_URL")
+        if url is None:
+            url = database_url()
+            if url.startswith("sqlite://"):
+                url = url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+        self._engine = create_async_engine(
+            url, echo=os.getenv("DB_ECHO") == "1")
+        if url.startswith("sqlite"):
+            event.listen(self._engine.sync_engine, "connect",
+                         _configure_sqlite)
+        self._sessionmaker = async_sessionmaker(self._engine,
+                                                expire_on_commit=False)
+
+    async def setup(self) -> None:
+        """Create the missing tables and indexes
+
+        DB_RESET=1 drops all tables first, like DB does.
+        """
+        async with self._engine.begin() as connection:
+            if os.getenv("DB_RESET") == "1":
+                await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(Base.metadata.create_all)
+            for index in User.__table__.indexes:
+                await connection.run_sync(index.create, checkfirst=True)
+
+    async def close(self) -> None:
+        """Close all pooled connections"""
+        await self._engine.dispose()
+
+    async def add_user(self, email: str, hashed_password: str) -> User:
+        """Add a new user to the database
+
+        Args:
+            email (str): The email of the user.
+            hashed_password (str): The hashed password of the user.
+
+        Returns:
+            User: The newly created user object.
+
+        Raises:
+            IntegrityError: If the email is already used.
+        """
+        async with self._sessionmaker() as session:
+            user = User(email=email, hashed_password=hashed_password)
+            session.add(user)
+            try:
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                raise
+            return user
+
+    async def find_user_by(self, **kwargs) -> User:
+        """Find a user by the specified attributes
+
+        Args:
+            **kwargs: Keyword arguments representing
+            the attributes to search for.
+
+        Returns:
+            User: The user object matching the specified attributes.
+
+        Raises:
+            InvalidRequestError: If no attributes are provided.
+            NoResultFound: If no user is found with the specified attributes.
+        """
+        if not kwargs:
+            raise InvalidRequestError
+        async with self._sessionmaker() as session:
+            result = await session.execute(
+                select(User).filter_by(**kwargs).limit(1))
+            user = result.scalars().first()
+        if not user:
+            raise NoResultFound
+        return user
+
+    async def update_user(self, user_id: int, **kwargs) -> None:
+        """Update the attributes of a user with the given user_id.
+
+        Args:
+            user_id (int): The ID of the user to update.
+            **kwargs: Keyword arguments representing the attributes to update.
+
+        Raises:
+            ValueError: If the user with the given
+            user_id is not found or if an invalid attribute is provided.
+
+        Returns:
+            None
+        """
+        async with self._sessionmaker() as session:
+            user = await session.get(User, user_id)
+            if user is None:
+                raise ValueError
+            for k, v in kwargs.items():
+                if hasattr(user, k):
+                    setattr(user, k, v)
+                else:
+                    raise ValueError
+            await session.commit()
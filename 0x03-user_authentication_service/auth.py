@@ -6,27 +6,51 @@ which is responsible for interacting
 with the authentication database.
 """
 
-import bcrypt
 from db import DB
+from hasher import Hasher
 from user import User
-from sqlalchemy.exc import NoResultFound
-from typing import Union
+from cache import TTLCache
+from collections import deque
+from sqlalchemy.exc import IntegrityError, NoResultFound
+from typing import Iterable, List, Tuple, Union
+import os
+import threading
 import uuid
 
 
+HASHER = Hasher()
+
+
 def _hash_password(password: str) -> str:
-    """Hashes a password using bcrypt.
+    """Hashes a password using bcrypt, on the HASHER pool.
 
     Args:
         password: The password to be hashed.
 
     Returns:
         The hashed password as a string.
+
+    Raises:
+        Overloaded: If the hashing queue is full.
     """
-    hashed_pasw = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed_pasw = HASHER.hash(password)
     return hashed_pasw
 
 
+def _detached_copy(user: User) -> User:
+    """Copies a user outside of any database session.
+
+    Args:
+        user: The user to copy.
+
+    Returns:
+        A transient User with the same column values.
+    """
+    return User(id=user.id, email=user.email,
+                hashed_password=user.hashed_password,
+                session_id=user.session_id, reset_token=user.reset_token)
+
+
 def _generate_uuid() -> str:
     """Generates a UUID.
 
@@ -41,16 +65,35 @@ class Auth:
 
     Methods:
     - register_user
+    - register_users
     - valid_login
     - create_session
     - get_user_from_session_id
     - destroy_session
     - get_reset_password_token
     - update_password
+    - cache_metrics
+    - close
+
+    Users found by session ID are cached for USER_CACHE_TTL seconds
+    (5 by default), up to USER_CACHE_SIZE of them (1024, 0 disables
+    the cache). Every `update_user` of the DB drops the cached
+    sessions of its user, so logouts, new logins and password changes
+    are seen at once by the process making them. Changes made by other
+    processes are only seen once the cached user expires: with several
+    workers, USER_CACHE_TTL is how long a logout may go unnoticed by
+    the others, and USER_CACHE_SIZE=0 disables that window.
     """
 
     def __init__(self):
         self._db = DB()
+        self._users = TTLCache(int(os.getenv("USER_CACHE_SIZE", "1024")),
+                               float(os.getenv("USER_CACHE_TTL", "5")),
+                               on_evict=self._evicted)
+        self._session_ids = {}
+        self._updates = 0
+        self._lock = threading.Lock()
+        self._db.observe(self.forget_user)
 
     def register_user(self, email: str, password: str) -> User:
         """Registers a new user.
@@ -71,7 +114,47 @@ class Auth:
             raise ValueError(f"User {email} already exists")
         except NoResultFound:
             hashed_pasw = _hash_password(password)
-            return self._db.add_user(email, hashed_pasw)
+            try:
+                return self._db.add_user(email, hashed_pasw)
+            except IntegrityError:
+                raise ValueError(f"User {email} already exists")
+
+    def register_users(self, users: Iterable[Tuple[str, str]],
+                       batch_size: int = 1000) -> Tuple[int, List[str]]:
+        """Registers many users at once.
+
+        Passwords are hashed in parallel on the HASHER pool, which
+        feeds batches of `batch_size` users to `DB.add_users`, each
+        checked for duplicates and inserted with a single commit.
+
+        Args:
+            users: (email, password) pairs.
+            batch_size: The number of users per commit.
+
+        Returns:
+            The number of users created, and the emails skipped
+            because they were already registered.
+        """
+        emails = deque()
+
+        def passwords():
+            for email, password in users:
+                emails.append(email)
+                yield password
+
+        created, skipped, batch = 0, [], []
+        for hashed_pasw in HASHER.map_hash(passwords()):
+            batch.append((emails.popleft(), hashed_pasw))
+            if len(batch) == batch_size:
+                duplicates = self._db.add_users(batch)
+                created += len(batch) - len(duplicates)
+                skipped += duplicates
+                batch = []
+        if batch:
+            duplicates = self._db.add_users(batch)
+            created += len(batch) - len(duplicates)
+            skipped += duplicates
+        return created, skipped
 
     def valid_login(self, email: str, password: str) -> bool:
         """Validates a user's login credentials.
@@ -82,10 +165,13 @@ class Auth:
 
         Returns:
             True if the login credentials are valid, False otherwise.
+
+        Raises:
+            Overloaded: If the hashing queue is full.
         """
         try:
             user = self._db.find_user_by(email=email)
-            return bcrypt.checkpw(password.encode(), user.hashed_password)
+            return HASHER.check(password, user.hashed_password)
         except NoResultFound:
             return False
 
@@ -120,12 +206,51 @@ class Auth:
         """
         if session_id is None:
             return None
+        user = self._users.get(session_id)
+        if user is not None:
+            return user
+        updates = self._updates
         try:
-            user = self._db.find_user_by(session_id=session_id)
+            user = _detached_copy(
+                self._db.find_user_by(session_id=session_id))
         except NoResultFound:
             return None
+        with self._lock:
+            if updates == self._updates:
+                self._users.set(session_id, user)
+                if self._users.peek(session_id) is user:
+                    self._session_ids.setdefault(user.id, set()).add(
+                        session_id)
         return user
 
+    def forget_user(self, user_id: int) -> None:
+        """Drops the cached sessions of a user.
+
+        Args:
+            user_id: The ID of the user.
+        """
+        with self._lock:
+            self._updates += 1
+            for session_id in list(self._session_ids.get(user_id, ())):
+                self._users.pop(session_id)
+
+    def cache_metrics(self) -> dict:
+        """Returns the counters of the session cache.
+
+        Returns:
+            The hits, misses and number of cached users.
+        """
+        return {"hits": self._users.hits, "misses": self._users.misses,
+                "entries": len(self._users)}
+
+    def _evicted(self, session_id: str, user: User) -> None:
+        """Forgets the session ID of a user leaving the cache."""
+        session_ids = self._session_ids.get(user.id)
+        if session_ids is not None:
+            session_ids.discard(session_id)
+            if len(session_ids) == 0:
+                del self._session_ids[user.id]
+
     def destroy_session(self, user_id):
         """Destroys a user's session.
 
@@ -157,10 +282,11 @@ class Auth:
         """
         try:
             user = self._db.find_user_by(email=email)
-            user.reset_token = _generate_uuid()
-            return user.reset_token
         except NoResultFound:
             raise ValueError
+        reset_token = _generate_uuid()
+        self._db.update_user(user.id, reset_token=reset_token)
+        return reset_token
 
     def update_password(self, reset_token: str, password: str):
         """Updates a user's password.
@@ -173,11 +299,32 @@ class Auth:
             None
 
         Raises:
-            ValueError: If the reset token is invalid.
+            ValueError: If the reset token is invalid, or if the token
+            or the password is missing: a None token would match the
+            users without a pending reset.
         """
+        if not reset_token or not password:
+            raise ValueError
         try:
             user = self._db.find_user_by(reset_token=reset_token)
         except NoResultFound:
             raise ValueError
-        user.hashed_password = _hash_password(password)
-        user.reset_token = None
+        self._db.update_user(user.id,
+                             hashed_password=_hash_password(password),
+                             reset_token=None)
+
+    def close(self) -> None:
+        """Closes the database connections, e.g. on shutdown.
+
+        Returns:
+            None
+        """
+        self._db.close()
+
+    def close_session(self) -> None:
+        """Releases the database session of the current thread.
+
+        Returns:
+            None
+        """
+        self._db.remove_session()
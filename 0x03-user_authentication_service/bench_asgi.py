@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Load test of GET /profile on the threaded Flask app (app.py)
+and on the ASGI app (asgi_app.py served by uvicorn),
+with a growing number of concurrent keep-alive connections.
+
+Usage: ./bench_asgi.py [seconds per run] [connections ...]
+       (default: 5 100 1000)
+"""
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+SECONDS = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+CONNECTIONS = [int(arg) for arg in sys.argv[2:]] or [100, 1000]
+HOST = "127.0.0.1"
+TIMEOUT = 10
+SERVERS = {
+    "flask": ([sys.executable, "-c",
+               "from app import app; "
+               "app.run(host='{}', port=5101, threaded=True)".format(HOST)],
+              5101),
+    "asgi": ([sys.executable, "-m", "uvicorn", "asgi_app:app",
+              "--host", HOST, "--port", "5102", "--log-level", "warning",
+              "--backlog", "4096"], 5102),
+}
+
+
+async def request(reader, writer, method: str, path: str,
+                  body: dict = None, cookie: str = None):
+    """Send one HTTP/1.1 request, return (status, headers, body)"""
+    payload = urlencode(body or {}).encode()
+    head = "{} {} HTTP/1.1\r\nHost: {}\r\nContent-Length: {}\r\n".format(
+        method, path, HOST, len(payload))
+    if body is not None:
+        head += "Content-Type: application/x-www-form-urlencoded\r\n"
+    if cookie is not None:
+        head += "Cookie: session_id={}\r\n".format(cookie)
+    writer.write(head.encode() + b"\r\n" + payload)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if not line:
+            break
+        name, value = line.split(":", 1)
+        headers[name.lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    return status, headers, await reader.readexactly(length)
+
+
+async def connect(port: int):
+    """Open a connection, retrying while the server starts"""
+    for _ in range(100):
+        try:
+            return await asyncio.open_connection(HOST, port)
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server on port {} did not start".format(port))
+
+
+async def login(port: int) -> str:
+    """Register a user and return a session id for it"""
+    form = {"email": "bench@bench.io", "password": "password"}
+    for path in ("/users", "/sessions"):
+        reader, writer = await connect(port)
+        _, headers, _ = await request(reader, writer, "POST", path, form)
+        writer.close()
+    return headers["set-cookie"].split(";")[0].split("=")[1]
+
+
+async def client(port: int, session_id: str, deadline: float,
+                 latencies: list, errors: list) -> None:
+    """Send GET /profile on one connection until `deadline`"""
+    try:
+        reader, writer = await connect(port)
+    except (OSError, RuntimeError):
+        errors.append(1)
+        return
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, headers, _ = await asyncio.wait_for(request(
+                reader, writer, "GET", "/profile", cookie=session_id),
+                TIMEOUT)
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(status)
+            if headers.get("connection") == "close":
+                writer.close()
+                reader, writer = await connect(port)
+    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError,
+            IndexError):
+        errors.append(1)
+    finally:
+        writer.close()
+
+
+async def run(port: int, session_id: str, connections: int):
+    """Run `connections` clients for SECONDS, return the statistics"""
+    latencies, errors = [], []
+    deadline = time.perf_counter() + SECONDS
+    await asyncio.gather(*(client(port, session_id, deadline,
+                                  latencies, errors)
+                           for _ in range(connections)))
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    return (len(latencies) / SECONDS, percentile(0.5), percentile(0.99),
+            len(errors))
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name, (command, port) in SERVERS.items():
+        directory = tempfile.mkdtemp()
+        env = dict(os.environ, PYTHONPATH=here, DB_DATA_DIR=directory)
+        server = subprocess.Popen(command, cwd=here, env=env,
+                                  stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL)
+        try:
+            session_id = asyncio.run(login(port))
+            for connections in CONNECTIONS:
+                rate, p50, p99, errors = asyncio.run(
+                    run(port, session_id, connections))
+                print("{:>6} {:>5} connections: {:8.0f} req/s  "
+                      "p50 {:7.1f} ms  p99 {:7.1f} ms  errors {}".format(
+                          name, connections, rate, p50 * 1e3, p99 * 1e3,
+                          errors))
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(directory)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark of user lookups by email, session_id and reset_token,
+on a users table without indexes (before) and with them (after).
+
+Usage: ./bench_lookup.py [users ...]    (default: 10000 100000)
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from user import Base, User
+
+SIZES = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+LOOKUPS = 200
+CHUNK = 50000
+
+
+def build(path: str, users: int, indexed: bool):
+    """Create a database of `users` users, with or without indexes"""
+    engine = create_engine("sqlite:///" + path)
+    Base.metadata.create_all(engine)
+    if not indexed:
+        for index in User.__table__.indexes:
+            index.drop(engine)
+    keys = []
+    with engine.begin() as connection:
+        for start in range(0, users, CHUNK):
+            rows = []
+            for i in range(start, min(start + CHUNK, users)):
+                row = {"email": "user{}@bench.io".format(i),
+                       "hashed_password": "x",
+                       "session_id": str(uuid.uuid4()),
+                       "reset_token": str(uuid.uuid4())}
+                rows.append(row)
+            keys.extend(random.sample(rows, min(len(rows), LOOKUPS)))
+            connection.execute(User.__table__.insert(), rows)
+    return engine, random.sample(keys, min(len(keys), LOOKUPS))
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    for users in SIZES:
+        for indexed in (False, True):
+            path = os.path.join(directory, "{}_{}.db".format(users, indexed))
+            engine, keys = build(path, users, indexed)
+            session = sessionmaker(bind=engine)()
+            for column in ("email", "session_id", "reset_token"):
+                start = time.perf_counter()
+                for key in keys:
+                    session.query(User).filter_by(
+                        **{column: key[column]}).first()
+                elapsed = (time.perf_counter() - start) / len(keys)
+                plan = session.execute(text(
+                    "EXPLAIN QUERY PLAN SELECT * FROM users "
+                    "WHERE {} = 'x'".format(column))).fetchone()[-1]
+                print("{:>8} users {:>6} {:>12}: {:10.1f} us  ({})".format(
+                    users, "after" if indexed else "before", column,
+                    elapsed * 1e6, plan))
+            session.close()
+            engine.dispose()
+            os.remove(path)
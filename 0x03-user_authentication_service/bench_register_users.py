@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Throughput of user registration, one user at a time with
+Auth.register_user and in batches with Auth.register_users,
+then of the database inserts alone, DB.add_user against DB.add_users.
+
+The one-at-a-time paths run on the first SAMPLE users only, the
+batched ones on all of them. BCRYPT_ROUNDS defaults to 4 here, as
+the default cost of 12 would take hours at 100k users.
+
+Usage: ./bench_register_users.py [users ...]    (default: 10000 100000)
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ["DB_DATA_DIR"] = tempfile.mkdtemp()
+os.environ.pop("DATABASE_URL", None)
+
+from auth import Auth, HASHER  # noqa: E402
+from db import DB  # noqa: E402
+
+SIZES = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+SAMPLE = 1000
+
+
+def rate(count: int, seconds: float) -> str:
+    """Users per second, formatted"""
+    return "{:10.0f} users/s".format(count / seconds)
+
+
+def timed(function, *args) -> float:
+    """Seconds taken by `function(*args)`"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print("{} hashing workers, bcrypt cost {}".format(
+        HASHER.workers, HASHER.rounds))
+    for size in SIZES:
+        sample = min(size, SAMPLE)
+        users = [("user{}@bench.io".format(i), "password{}".format(i))
+                 for i in range(size)]
+
+        auth = Auth()
+        auth._db = DB("sqlite:///" + os.path.join(tempfile.mkdtemp(), "a.db"))
+        single = timed(lambda: [auth.register_user(email, password)
+                                for email, password in users[:sample]])
+        batched = timed(auth.register_users, users[sample:])
+        print("{:>7} users, register_user:  {} (first {})".format(
+            size, rate(sample, single), sample))
+        print("{:>7} users, register_users: {}".format(
+            size, rate(size - sample, batched)))
+
+        hashed_password = HASHER.hash("password")
+        rows = [(email, hashed_password) for email, _ in users]
+        db = DB("sqlite:///" + os.path.join(tempfile.mkdtemp(), "a.db"))
+        single = timed(lambda: [db.add_user(email, password)
+                                for email, password in rows[:sample]])
+        batched = timed(lambda: [db.add_users(rows[i:i + 1000])
+                                 for i in range(sample, size, 1000)])
+        print("{:>7} users, add_user:       {} (first {})".format(
+            size, rate(sample, single), sample))
+        print("{:>7} users, add_users:      {}".format(
+            size, rate(size - sample, batched)))
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Load test of the user authentication service flows.
+
+Users are seeded through the DB layer in a temporary database, then
+worker threads run each flow for a fixed time, through the Flask test
+client or, with --server, against a local threaded server. Throughput
+and p50/p95/p99 latencies of each flow are printed and written as JSON
+with --output; --compare reports the changes against an earlier file
+and exits with status 1 when a flow regressed.
+
+New hashes use BCRYPT_ROUNDS, 4 unless set, so that the login flows
+measure the service rather than bcrypt alone.
+
+Usage: ./bench_suite.py [--users N] [--threads N] [--seconds S]
+                        [--server] [--output FILE] [--compare FILE]
+"""
+from functools import partial
+from urllib.parse import urlencode
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ["DB_DATA_DIR"] = tempfile.mkdtemp()
+os.environ.pop("DATABASE_URL", None)
+
+from app import app, AUTH, HASHER  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+PASSWORD = "bench pwd"
+
+
+class TestClient:
+    """Sends requests through the Flask test client."""
+
+    def __init__(self) -> None:
+        """Initialize a client without cookie jar."""
+        self.client = app.test_client(use_cookies=False)
+
+    def request(self, method: str, path: str, headers: dict = {},
+                data: dict = None) -> tuple:
+        """Status and headers of the response."""
+        response = self.client.open(path, method=method, headers=headers,
+                                    data=data)
+        return response.status_code, response.headers
+
+
+class ServerClient:
+    """Sends requests to a local server, on a kept-alive connection."""
+
+    def __init__(self, port: int) -> None:
+        """Initialize a client of the server listening on `port`."""
+        self.port = port
+        self.connection = None
+
+    def request(self, method: str, path: str, headers: dict = {},
+                data: dict = None) -> tuple:
+        """Status and headers of the response."""
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection("127.0.0.1",
+                                                         self.port)
+        body = None
+        headers = dict(headers)
+        if data is not None:
+            body = urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        response.read()
+        if response.getheader("Connection", "").lower() == "close":
+            self.connection.close()
+            self.connection = None
+        return response.status, response.headers
+
+
+def seed(users: int) -> list:
+    """Add `users` users sharing one password hash, return their emails."""
+    hashed_password = HASHER.hash(PASSWORD)
+    emails = ["user{}@bench.io".format(i) for i in range(users)]
+    for email in emails:
+        AUTH._db.add_user(email, hashed_password)
+    AUTH.close_session()
+    return emails
+
+
+def log_in(client, email: str) -> str:
+    """Log `email` in, return the session cookie or None."""
+    status, headers = client.request(
+        "POST", "/sessions", data={"email": email, "password": PASSWORD})
+    if status != 200:
+        return None
+    return headers.get("Set-Cookie").split(";")[0]
+
+
+def register(client, worker: dict) -> bool:
+    """POST /users with a new email."""
+    worker["count"] += 1
+    email = "new{}-{}@bench.io".format(worker["index"], worker["count"])
+    status, _ = client.request(
+        "POST", "/users", data={"email": email, "password": PASSWORD})
+    return status == 200
+
+
+def login(client, worker: dict) -> bool:
+    """POST /sessions."""
+    return log_in(client, worker["email"]) is not None
+
+
+def profile(client, worker: dict) -> bool:
+    """GET /profile with the session of the worker."""
+    if "cookie" not in worker:
+        worker["cookie"] = log_in(client, worker["email"])
+    status, _ = client.request("GET", "/profile",
+                               {"Cookie": worker["cookie"]})
+    return status == 200
+
+
+def reset_password(client, worker: dict) -> bool:
+    """POST /reset_password."""
+    status, _ = client.request("POST", "/reset_password",
+                               data={"email": worker["email"]})
+    return status == 200
+
+
+def session_flow(client, worker: dict) -> bool:
+    """POST /sessions, GET /profile, then DELETE /sessions."""
+    cookie = log_in(client, worker["email"])
+    if cookie is None:
+        return False
+    status, _ = client.request("GET", "/profile", {"Cookie": cookie})
+    if status != 200:
+        return False
+    status, _ = client.request("DELETE", "/sessions", {"Cookie": cookie})
+    return status == 302
+
+
+FLOWS = (
+    ("register POST /users", register),
+    ("login POST /sessions", login),
+    ("profile GET /profile", profile),
+    ("reset_password POST /reset_password", reset_password),
+    ("session_flow login, profile, logout", session_flow),
+)
+
+
+def percentile(latencies: list, q: float) -> float:
+    """Nearest-rank percentile `q` of sorted `latencies`, in ms."""
+    if len(latencies) == 0:
+        return None
+    rank = max(int(len(latencies) * q / 100 + 0.5), 1)
+    return latencies[min(rank, len(latencies)) - 1] * 1e3
+
+
+def worker(client, flow, state: dict, deadline: float,
+           results: list) -> None:
+    """Run `flow` until `deadline`, timing each run."""
+    latencies, errors = [], 0
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        ok = flow(client, state)
+        latencies.append(time.perf_counter() - start)
+        if not ok:
+            errors += 1
+    AUTH.close_session()
+    results.append((latencies, errors))
+
+
+def run(name: str, flow, emails: list, threads: int, seconds: float,
+        new_client) -> dict:
+    """Load test `flow` with `threads` workers during `seconds`."""
+    results = []
+    deadline = time.perf_counter() + seconds
+    workers = [threading.Thread(target=worker, args=(
+        new_client(), flow,
+        {"index": i, "email": emails[i % len(emails)], "count": 0},
+        deadline, results)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    latencies = sorted(latency for worker_latencies, _ in results
+                       for latency in worker_latencies)
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "throughput": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] * 1e3 if latencies else None,
+    }
+
+
+def commit() -> str:
+    """Git commit of the benchmarked code, None outside of a checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, file_path: str, tolerance: float) -> bool:
+    """Print the changes against the report in `file_path`.
+
+    Returns:
+        bool: True when a flow lost more than `tolerance`
+        of its throughput or p99.
+    """
+    with open(file_path) as f:
+        earlier = json.load(f)
+    for setting in ("mode", "users", "threads", "bcrypt_rounds"):
+        if earlier.get(setting) != report[setting]:
+            print("warning: {} differs, {} before".format(
+                setting, earlier.get(setting)))
+    previous = {result["name"]: result for result in earlier["results"]}
+    regressed = False
+    for result in report["results"]:
+        before = previous.get(result["name"])
+        if before is None or not before["throughput"] or \
+                not before["p99_ms"] or not result["p99_ms"]:
+            continue
+        throughput = result["throughput"] / before["throughput"] - 1
+        p99 = result["p99_ms"] / before["p99_ms"] - 1
+        worse = throughput < -tolerance or p99 > tolerance
+        regressed = regressed or worse
+        print("{:<40} throughput {:+7.1%}, p99 {:+7.1%}{}".format(
+            result["name"], throughput, p99, "  REGRESSION" if worse else ""))
+    return regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--server", action="store_true",
+                        help="drive a local server instead of the test client")
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--compare", help="earlier results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed throughput or p99 loss, default 0.1")
+    args = parser.parse_args()
+
+    emails = seed(args.users)
+    new_client = TestClient
+    if args.server:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        new_client = partial(ServerClient, server.server_port)
+
+    results = []
+    for name, flow in FLOWS:
+        result = run(name, flow, emails, args.threads, args.seconds,
+                     new_client)
+        results.append(result)
+        print("{:<40} {:8.1f} req/s  p50 {:7.2f}  p95 {:7.2f}  p99 {:7.2f} ms"
+              "  errors {}".format(result["name"], result["throughput"],
+                                   result["p50_ms"] or 0,
+                                   result["p95_ms"] or 0,
+                                   result["p99_ms"] or 0, result["errors"]))
+
+    report = {
+        "suite": "0x03-user_authentication_service",
+        "commit": commit(),
+        "python": platform.python_version(),
+        "mode": "server" if args.server else "client",
+        "users": args.users,
+        "threads": args.threads,
+        "seconds": args.seconds,
+        "bcrypt_rounds": HASHER.rounds,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare is not None:
+        if compare(report, args.compare, args.tolerance):
+            sys.exit(1)
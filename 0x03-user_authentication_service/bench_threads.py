@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Load test of POST /sessions and GET /profile
+with a growing number of worker threads.
+
+Usage: ./bench_threads.py [users] [seconds per run]
+"""
+import sys
+import threading
+import time
+
+from app import app
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+
+def worker(route: str, email: str, deadline: float, counts: list) -> None:
+    """Send requests on `route` until `deadline`, counting successes"""
+    client = app.test_client()
+    data = {"email": email, "password": "password"}
+    response = client.post("/sessions", data=data)
+    session_id = response.headers["Set-Cookie"].split(";")[0].split("=")[1]
+    client.set_cookie("session_id", session_id)
+    done = 0
+    while time.perf_counter() < deadline:
+        if route == "/sessions":
+            response = client.post("/sessions", data=data)
+        else:
+            response = client.get("/profile")
+        if response.status_code == 200:
+            done += 1
+    counts.append(done)
+
+
+if __name__ == "__main__":
+    client = app.test_client()
+    emails = ["user{}@bench.io".format(i) for i in range(USERS)]
+    for email in emails:
+        client.post("/users", data={"email": email, "password": "password"})
+
+    for route in ("/profile", "/sessions"):
+        threads_count = 1
+        while threads_count <= USERS:
+            counts = []
+            deadline = time.perf_counter() + SECONDS
+            threads = [threading.Thread(target=worker,
+                                        args=(route, emails[i],
+                                              deadline, counts))
+                       for i in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            print("{:>9} {:>3} threads: {:8.1f} req/s".format(
+                route, threads_count, sum(counts) / SECONDS))
+            threads_count *= 2
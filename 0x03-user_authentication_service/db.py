@@ -5,46 +5,133 @@ This module contains the DB class
 which provides methods for interacting with the database.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, insert, select
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.session import Session
-from sqlalchemy.exc import NoResultFound, InvalidRequestError
+from sqlalchemy.exc import IntegrityError, NoResultFound
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.pool import QueuePool
+from typing import Callable, List, Tuple
 from user import Base, User
 import logging
+import os
 
 
 logging.disable(logging.WARNING)
 
 
+def database_url() -> str:
+    """Database URL: DATABASE_URL, or `a.db` in the DB_DATA_DIR directory
+
+    Returns:
+        str: The database URL.
+    """
+    url = os.getenv("DATABASE_URL")
+    if url is None:
+        data_dir = os.getenv("DB_DATA_DIR", ".")
+        os.makedirs(data_dir, exist_ok=True)
+        url = "sqlite:///" + os.path.join(data_dir, "a.db")
+    return url
+
+
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    """Configure each new SQLite connection of the pool
+
+    WAL mode lets readers run while a writer commits, and the busy
+    timeout makes writers wait for the lock instead of failing.
+    """
+    busy_timeout = int(os.getenv("DB_BUSY_TIMEOUT", "5000"))
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout={:d}".format(busy_timeout))
+    cursor.close()
+
+
 class DB:
     """DB class
 
     This class provides methods for interacting with the database.
+    Each thread gets its own session from a scoped session registry,
+    backed by a pool of DB_POOL_SIZE connections
+    (plus DB_MAX_OVERFLOW extra ones under load).
     """
 
-    def __init__(self) -> None:
+    def __init__(self, url: str = None) -> None:
         """Initialize a new DB instance
 
-        Initializes a new DB instance
-        and creates the necessary tables in the database.
+        Initializes a new DB instance and creates the missing tables
+        and indexes in the database, leaving existing data alone.
+
+        Args:
+            url (str): The database URL. Defaults to `database_url()`.
+
+        Environment:
+            DB_RESET=1 drops all tables first.
+            DB_ECHO=1 logs every SQL statement.
         """
-        self._engine = create_engine("sqlite:///a.db", echo=True)
-        Base.metadata.drop_all(self._engine)
+        if url is None:
+            url = database_url()
+        sqlite = url.startswith("sqlite")
+        self._engine = create_engine(
+            url, echo=os.getenv("DB_ECHO") == "1", poolclass=QueuePool,
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            connect_args={"check_same_thread": False} if sqlite else {})
+        if sqlite:
+            event.listen(self._engine, "connect", _configure_sqlite)
+        if os.getenv("DB_RESET") == "1":
+            Base.metadata.drop_all(self._engine)
         Base.metadata.create_all(self._engine)
-        self.__session = None
+        self.migrate()
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
+        self._observers = []
+
+    def migrate(self) -> None:
+        """Create the indexes missing from an existing users table
+
+        Tables created before the indexes were declared get them here;
+        existing indexes are left alone.
+
+        Raises:
+            IntegrityError: If existing rows break a unique index,
+            e.g. two users with the same email.
+        """
+        for index in User.__table__.indexes:
+            index.create(self._engine, checkfirst=True)
 
     @property
     def _session(self) -> Session:
-        """Memoized session object
+        """Session object of the current thread
 
         Returns:
             Session: The session object for interacting with the database.
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        return self.__session()
+
+    def observe(self, callback: Callable[[int], None]) -> None:
+        """Call `callback(user_id)` after each commit of `update_user`
+
+        Args:
+            callback (callable): Called with the ID of the updated user.
+        """
+        self._observers.append(callback)
+
+    def remove_session(self) -> None:
+        """Close the session of the current thread
+
+        Its connection goes back to the pool; the next call to
+        `_session` from this thread opens a new session.
+        """
+        self.__session.remove()
+
+    def close(self) -> None:
+        """Close the session of the current thread and the pooled
+        connections
+        """
+        self.__session.remove()
+        self._engine.dispose()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """Add a new user to the database
@@ -55,12 +142,58 @@ class DB:
 
         Returns:
             User: The newly created user object.
+
+        Raises:
+            IntegrityError: If the email is already used.
         """
         user = User(email=email, hashed_password=hashed_password)
         self._session.add(user)
-        self._session.commit()
+        try:
+            self._session.commit()
+        except IntegrityError:
+            self._session.rollback()
+            raise
         return user
 
+    def add_users(self, users: List[Tuple[str, str]]) -> List[str]:
+        """Add a batch of users to the database with a single commit
+
+        The emails already registered, or repeated in the batch, are
+        found with one query and skipped; the other users are inserted
+        with one multi-row INSERT. A user registered meanwhile makes
+        the insert fail: the batch is then checked and inserted again.
+
+        Args:
+            users (list): (email, hashed_password) pairs.
+
+        Returns:
+            list: The skipped emails.
+
+        Raises:
+            IntegrityError: If the second attempt fails too.
+        """
+        emails = [email for email, _ in users]
+        for attempt in range(2):
+            taken = set(self._session.scalars(
+                select(User.email).where(User.email.in_(emails))))
+            rows, skipped = [], []
+            for email, hashed_password in users:
+                if email in taken:
+                    skipped.append(email)
+                    continue
+                taken.add(email)
+                rows.append({"email": email,
+                             "hashed_password": hashed_password})
+            try:
+                if rows:
+                    self._session.execute(insert(User), rows)
+                self._session.commit()
+                return skipped
+            except IntegrityError:
+                self._session.rollback()
+                if attempt > 0:
+                    raise
+
     def find_user_by(self, **kwargs) -> User:
         """Find a user by the specified attributes
 
@@ -106,3 +239,5 @@ class DB:
             else:
                 raise ValueError
         self._session.commit()
+        for callback in self._observers:
+            callback(user_id)
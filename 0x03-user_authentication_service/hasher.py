@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Hasher module
+
+This module contains the Hasher class
+which runs bcrypt work on a bounded pool of workers.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, Iterator
+import asyncio
+import bcrypt
+import os
+import threading
+import time
+
+
+class Overloaded(Exception):
+    """Raised when the hashing queue is full."""
+
+
+def _hashpw(password: bytes, rounds: int) -> bytes:
+    """Hashes a password with a new salt of cost `rounds`."""
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password: bytes, hashed_password: bytes) -> bool:
+    """Checks a password against its hash."""
+    return bcrypt.checkpw(password, hashed_password)
+
+
+class Hasher:
+    """Hasher class to run bcrypt on a bounded worker pool.
+
+    At most `workers + queue_size` calls are running or waiting at any
+    time; further calls raise Overloaded at once instead of piling up.
+
+    Environment:
+        HASH_POOL: `thread` (default) or `process`.
+        HASH_WORKERS: number of workers, defaults to the CPU count.
+        HASH_QUEUE_SIZE: calls allowed to wait, defaults to 4 per worker.
+        BCRYPT_ROUNDS: bcrypt cost factor of new hashes, defaults to 12.
+    """
+
+    def __init__(self, workers: int = None, queue_size: int = None,
+                 rounds: int = None, pool: str = None) -> None:
+        """Initialize a new Hasher, settings default to the environment."""
+        if workers is None:
+            workers = int(os.getenv("HASH_WORKERS", os.cpu_count() or 1))
+        if queue_size is None:
+            queue_size = int(os.getenv("HASH_QUEUE_SIZE", 4 * workers))
+        if rounds is None:
+            rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+        if pool is None:
+            pool = os.getenv("HASH_POOL", "thread")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        if pool == "process":
+            self._executor = ProcessPoolExecutor(workers)
+        else:
+            self._executor = ThreadPoolExecutor(workers, "hasher")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._calls = 0
+        self._rejected = 0
+        self._seconds = 0.0
+        self._max_seconds = 0.0
+
+    def hash(self, password: str) -> bytes:
+        """Hashes a password.
+
+        Raises:
+            Overloaded: If the queue is full.
+        """
+        return self._run(_hashpw, password.encode(), self.rounds)
+
+    def check(self, password: str, hashed_password: bytes) -> bool:
+        """Checks a password against its hash.
+
+        Raises:
+            Overloaded: If the queue is full.
+        """
+        return self._run(_checkpw, password.encode(), hashed_password)
+
+    def map_hash(self, passwords: Iterable[str]) -> Iterator[bytes]:
+        """Hashes many passwords in parallel, yielding hashes in order.
+
+        Up to twice `workers` hashes are in flight, so the workers keep
+        busy while the caller consumes the results. Slots are waited
+        for instead of raising Overloaded: a bulk job slows down
+        rather than fails, and leaves the rest of the queue to the
+        other callers.
+        """
+        pending = deque()
+        for password in passwords:
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+            pending.append(self._submit(_hashpw, password.encode(),
+                                        self.rounds))
+        while pending:
+            yield pending.popleft().result()
+
+    async def hash_async(self, password: str) -> bytes:
+        """Hashes a password without blocking the event loop.
+
+        Raises:
+            Overloaded: If the queue is full.
+        """
+        return await self._run_async(_hashpw, password.encode(), self.rounds)
+
+    async def check_async(self, password: str,
+                          hashed_password: bytes) -> bool:
+        """Checks a password without blocking the event loop.
+
+        Raises:
+            Overloaded: If the queue is full.
+        """
+        return await self._run_async(_checkpw, password.encode(),
+                                     hashed_password)
+
+    def metrics(self) -> dict:
+        """Returns the queue depth and hash latency counters.
+
+        Latencies are in seconds and include the time spent waiting.
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "rounds": self.rounds,
+                "queue_depth": self._depth,
+                "calls": self._calls,
+                "rejected": self._rejected,
+                "latency_avg": self._seconds / self._calls
+                if self._calls else 0.0,
+                "latency_max": self._max_seconds,
+            }
+
+    def _run(self, function, *args):
+        """Runs `function` on the pool and waits for its result."""
+        start = self._enter()
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._leave(start)
+
+    def _submit(self, function, *args) -> Future:
+        """Runs `function` on the pool once a slot is free."""
+        self._slots.acquire()
+        with self._lock:
+            self._depth += 1
+        start = time.perf_counter()
+        future = self._executor.submit(function, *args)
+        future.add_done_callback(lambda future: self._leave(start))
+        return future
+
+    async def _run_async(self, function, *args):
+        """Runs `function` on the pool and awaits its result."""
+        start = self._enter()
+        try:
+            return await asyncio.wrap_future(
+                self._executor.submit(function, *args))
+        finally:
+            self._leave(start)
+
+    def _enter(self) -> float:
+        """Takes a queue slot, returns the start time.
+
+        Raises:
+            Overloaded: If the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise Overloaded
+        with self._lock:
+            self._depth += 1
+        return time.perf_counter()
+
+    def _leave(self, start: float) -> None:
+        """Releases a queue slot and records the call latency."""
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._depth -= 1
+            self._calls += 1
+            self._seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+        self._slots.release()
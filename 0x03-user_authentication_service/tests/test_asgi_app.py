@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests of the ASGI application, called directly with ASGI messages.
+
+The database lives in a temporary directory and new hashes use
+BCRYPT_ROUNDS=4. Run from the 0x03-user_authentication_service
+directory:
+
+    python3 -m unittest discover tests
+"""
+from unittest import mock
+from urllib.parse import urlencode
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+os.environ["DB_DATA_DIR"] = tempfile.mkdtemp()
+os.environ.pop("DATABASE_URL", None)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import asgi_app  # noqa: E402
+from hasher import Overloaded  # noqa: E402
+
+
+async def call(method: str, path: str, chunks: list = (b"",),
+               headers: list = ()) -> tuple:
+    """Status, headers and body of the response to a request whose
+    body is sent in `chunks`."""
+    messages = [{"type": "http.request", "body": chunk,
+                 "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app.app({"type": "http", "method": method, "path": path,
+                        "headers": list(headers)}, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), sent[1]["body"]
+
+
+def form(**fields) -> list:
+    """Body chunks of a urlencoded form."""
+    return [urlencode(fields).encode()]
+
+
+class TestASGIApp(unittest.TestCase):
+    """Routes of the ASGI application."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Create the tables."""
+        asyncio.run(asgi_app.AUTH.setup())
+
+    def run_call(self, *args, **kwargs) -> tuple:
+        """Run `call` on a new event loop."""
+        async def run():
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                await asgi_app.AUTH.close()
+        return asyncio.run(run())
+
+    def register(self, email: str, password: str = "password") -> None:
+        """Register `email`, asserting it succeeds."""
+        status, _, _ = self.run_call("POST", "/users", form(
+            email=email, password=password))
+        self.assertEqual(status, 200)
+
+    def test_update_password_without_token(self) -> None:
+        """A missing token is refused and changes no password."""
+        self.register("asgi-token@test.io")
+        status, _, _ = self.run_call("PUT", "/reset_password", form(
+            email="asgi-token@test.io", new_password="hacked"))
+        self.assertEqual(status, 403)
+        status, _, _ = self.run_call("POST", "/sessions", form(
+            email="asgi-token@test.io", password="hacked"))
+        self.assertEqual(status, 401)
+
+    def test_update_password_without_password(self) -> None:
+        """A missing new password is refused, not a server error."""
+        self.register("asgi-password@test.io")
+        _, _, body = self.run_call("POST", "/reset_password", form(
+            email="asgi-password@test.io"))
+        token = json.loads(body)["reset_token"]
+        status, _, _ = self.run_call("PUT", "/reset_password", form(
+            email="asgi-password@test.io", reset_token=token))
+        self.assertEqual(status, 403)
+        status, _, _ = self.run_call("PUT", "/reset_password", form(
+            email="asgi-password@test.io", reset_token=token,
+            new_password="new password"))
+        self.assertEqual(status, 200)
+
+    def test_utf8_form(self) -> None:
+        """Form values are decoded as UTF-8."""
+        status, _, body = self.run_call("POST", "/users", [
+            "email=andré@test.io&password=pwd".encode()])
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["email"], "andré@test.io")
+
+    def test_body_too_large(self) -> None:
+        """Bodies over MAX_CONTENT_LENGTH are refused with a 413."""
+        half = b"x" * (asgi_app.MAX_CONTENT_LENGTH // 2 + 1)
+        status, headers, body = self.run_call("POST", "/users",
+                                              [half, half])
+        self.assertEqual(status, 413)
+        self.assertEqual(headers[b"content-type"],
+                         b"text/html; charset=utf-8")
+        self.assertIn(b"Request Entity Too Large", body)
+
+    def test_overloaded(self) -> None:
+        """A full hashing queue gets a 503 with retry-after."""
+        with mock.patch.object(asgi_app.HASHER, "hash_async",
+                               side_effect=Overloaded):
+            status, headers, body = self.run_call("POST", "/users", form(
+                email="asgi-overloaded@test.io", password="password"))
+        self.assertEqual(status, 503)
+        self.assertEqual(headers[b"retry-after"], b"1")
+        self.assertEqual(json.loads(body), {"message": "server overloaded"})
+
+    def test_lifespan(self) -> None:
+        """Startup and shutdown messages are acknowledged."""
+        messages = [{"type": "lifespan.startup"},
+                    {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(asgi_app.app({"type": "lifespan"}, receive, send))
+        self.assertEqual(sent, ["lifespan.startup.complete",
+                                "lifespan.shutdown.complete"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests of the Auth service and of the Flask routes using it.
+
+The database lives in a temporary directory and new hashes use
+BCRYPT_ROUNDS=4. Run from the 0x03-user_authentication_service
+directory:
+
+    python3 -m unittest discover tests
+"""
+from unittest import mock
+import os
+import tempfile
+import time
+import unittest
+
+DATA_DIR = os.environ["DB_DATA_DIR"] = tempfile.mkdtemp()
+os.environ.pop("DATABASE_URL", None)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app import app, AUTH  # noqa: E402
+from auth import Auth  # noqa: E402
+
+
+class TestResetPassword(unittest.TestCase):
+    """Password updates through a reset token."""
+
+    def setUp(self) -> None:
+        """Register a user without a pending reset."""
+        self.email = "reset{}@test.io".format(id(self))
+        AUTH.register_user(self.email, "old password")
+        self.client = app.test_client()
+
+    def tearDown(self) -> None:
+        """Release the database session of the test thread."""
+        AUTH.close_session()
+
+    def test_update_password_with_token(self) -> None:
+        """A valid token sets the new password, once."""
+        token = AUTH.get_reset_password_token(self.email)
+        AUTH.update_password(token, "new password")
+        self.assertTrue(AUTH.valid_login(self.email, "new password"))
+        with self.assertRaises(ValueError):
+            AUTH.update_password(token, "other password")
+
+    def test_update_password_without_token(self) -> None:
+        """A missing token matches no user, whatever their reset state."""
+        for token in (None, ""):
+            with self.assertRaises(ValueError):
+                AUTH.update_password(token, "hacked")
+        self.assertFalse(AUTH.valid_login(self.email, "hacked"))
+        self.assertTrue(AUTH.valid_login(self.email, "old password"))
+
+    def test_update_password_without_password(self) -> None:
+        """A missing password leaves the token and password alone."""
+        token = AUTH.get_reset_password_token(self.email)
+        for password in (None, ""):
+            with self.assertRaises(ValueError):
+                AUTH.update_password(token, password)
+        AUTH.update_password(token, "new password")
+        self.assertTrue(AUTH.valid_login(self.email, "new password"))
+
+    def test_route_without_token(self) -> None:
+        """PUT /reset_password without a token is refused with a 403."""
+        response = self.client.put("/reset_password", data={
+            "email": self.email, "new_password": "hacked"})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(AUTH.valid_login(self.email, "hacked"))
+
+
+class TestSessionCache(unittest.TestCase):
+    """Users cached by session ID."""
+
+    def setUp(self) -> None:
+        """Register and log in a user."""
+        self.email = "cache{}@test.io".format(id(self))
+        AUTH.register_user(self.email, "password")
+        self.session_id = AUTH.create_session(self.email)
+
+    def tearDown(self) -> None:
+        """Release the database session of the test thread."""
+        AUTH.close_session()
+
+    def test_hit_without_query(self) -> None:
+        """A cached user is returned without querying the database."""
+        user = AUTH.get_user_from_session_id(self.session_id)
+        with mock.patch.object(AUTH._db, "find_user_by") as find_user_by:
+            self.assertIs(AUTH.get_user_from_session_id(self.session_id),
+                          user)
+        find_user_by.assert_not_called()
+
+    def test_update_drops_cached_user(self) -> None:
+        """Logouts and password changes are seen at once."""
+        user = AUTH.get_user_from_session_id(self.session_id)
+        token = AUTH.get_reset_password_token(self.email)
+        AUTH.update_password(token, "new password")
+        cached = AUTH.get_user_from_session_id(self.session_id)
+        self.assertNotEqual(cached.hashed_password, user.hashed_password)
+        AUTH.destroy_session(user.id)
+        self.assertIsNone(AUTH.get_user_from_session_id(self.session_id))
+
+    def test_other_process_logout(self) -> None:
+        """A logout by another process is seen once the entry expires."""
+        self.assertIsNotNone(AUTH.get_user_from_session_id(self.session_id))
+        with mock.patch.dict(os.environ, {"DB_DATA_DIR": DATA_DIR}):
+            other = Auth()
+        user = other.get_user_from_session_id(self.session_id)
+        other.destroy_session(user.id)
+        other.close()
+        self.assertIsNotNone(AUTH.get_user_from_session_id(self.session_id))
+        ttl = float(os.getenv("USER_CACHE_TTL", "5"))
+        with mock.patch("time.monotonic",
+                        return_value=time.monotonic() + ttl):
+            self.assertIsNone(
+                AUTH.get_user_from_session_id(self.session_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
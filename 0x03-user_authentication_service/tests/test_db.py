@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests of the batched registrations: DB.add_users and Auth.register_users.
+
+Each test uses its own database in a temporary directory and new hashes
+use BCRYPT_ROUNDS=4. Run from the 0x03-user_authentication_service
+directory:
+
+    python3 -m unittest discover tests
+"""
+from unittest import mock
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("DB_DATA_DIR", tempfile.mkdtemp())
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from auth import Auth  # noqa: E402
+from db import DB  # noqa: E402
+from sqlalchemy.exc import IntegrityError  # noqa: E402
+from user import User  # noqa: E402
+import bcrypt  # noqa: E402
+
+
+class DBTestCase(unittest.TestCase):
+    """A database of its own in a temporary directory."""
+
+    def setUp(self) -> None:
+        """Open an empty database."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.url = "sqlite:///" + os.path.join(directory.name, "a.db")
+        self.db = DB(self.url)
+        self.addCleanup(self.db.close)
+
+    def emails(self) -> list:
+        """The registered emails, sorted."""
+        return sorted(user.email for user in
+                      self.db._session.query(User).all())
+
+
+class TestAddUsers(DBTestCase):
+    """Batches inserted with a single commit."""
+
+    def test_batch(self) -> None:
+        """Every user of the batch is inserted with its hash."""
+        users = [("{}@test.io".format(i), "hash{}".format(i))
+                 for i in range(5)]
+        self.assertEqual(self.db.add_users(users), [])
+        self.assertEqual(self.emails(), sorted(email for email, _ in users))
+        user = self.db.find_user_by(email="3@test.io")
+        self.assertEqual(user.hashed_password, "hash3")
+
+    def test_duplicates(self) -> None:
+        """Emails already registered or repeated in the batch are
+        skipped, the first occurrence wins."""
+        self.db.add_user("taken@test.io", "old")
+        skipped = self.db.add_users([("new@test.io", "first"),
+                                     ("taken@test.io", "new"),
+                                     ("new@test.io", "second")])
+        self.assertEqual(skipped, ["taken@test.io", "new@test.io"])
+        self.assertEqual(self.emails(), ["new@test.io", "taken@test.io"])
+        self.assertEqual(
+            self.db.find_user_by(email="taken@test.io").hashed_password,
+            "old")
+        self.assertEqual(
+            self.db.find_user_by(email="new@test.io").hashed_password,
+            "first")
+
+    def test_empty(self) -> None:
+        """An empty batch, or one of duplicates only, inserts nothing."""
+        self.assertEqual(self.db.add_users([]), [])
+        self.db.add_user("taken@test.io", "old")
+        self.assertEqual(self.db.add_users([("taken@test.io", "new")]),
+                         ["taken@test.io"])
+        self.assertEqual(self.emails(), ["taken@test.io"])
+
+    def test_registered_meanwhile(self) -> None:
+        """A user registered by another process between the check and
+        the insert is skipped on the second attempt."""
+        other = DB(self.url)
+        self.addCleanup(other.close)
+        session = self.db._session
+        scalars = session.scalars
+        checks = []
+
+        def check_then_register(*args, **kwargs):
+            taken = list(scalars(*args, **kwargs))
+            checks.append(taken)
+            if len(checks) == 1:
+                other.add_user("race@test.io", "other")
+            return taken
+
+        with mock.patch.object(session, "scalars",
+                               side_effect=check_then_register):
+            skipped = self.db.add_users([("race@test.io", "mine"),
+                                         ("free@test.io", "mine")])
+        self.assertEqual(checks, [[], ["race@test.io"]])
+        self.assertEqual(skipped, ["race@test.io"])
+        self.assertEqual(self.emails(), ["free@test.io", "race@test.io"])
+        self.assertEqual(
+            self.db.find_user_by(email="race@test.io").hashed_password,
+            "other")
+
+    def test_second_conflict(self) -> None:
+        """The IntegrityError of a second failed attempt is raised."""
+        with mock.patch.object(self.db._session, "commit",
+                               side_effect=IntegrityError("", {}, None)):
+            with self.assertRaises(IntegrityError):
+                self.db.add_users([("a@test.io", "hash")])
+        self.assertEqual(self.emails(), [])
+
+
+class TestRegisterUsers(DBTestCase):
+    """Passwords hashed on the pool, users inserted by batches."""
+
+    def setUp(self) -> None:
+        """An Auth service over the test database."""
+        super().setUp()
+        with mock.patch.dict(os.environ, {"DATABASE_URL": self.url}):
+            self.auth = Auth()
+        self.addCleanup(self.auth._db.close)
+
+    def test_counts(self) -> None:
+        """Users created and emails skipped across several batches."""
+        self.auth.register_user("taken@test.io", "password")
+        users = [("{}@test.io".format(i), "pwd{}".format(i))
+                 for i in range(5)]
+        users.insert(2, ("taken@test.io", "password"))
+        users.append(("0@test.io", "again"))
+        created, skipped = self.auth.register_users(users, batch_size=2)
+        self.assertEqual(created, 5)
+        self.assertEqual(skipped, ["taken@test.io", "0@test.io"])
+        self.assertEqual(len(self.emails()), 6)
+        for i in range(5):
+            user = self.db.find_user_by(email="{}@test.io".format(i))
+            self.assertTrue(bcrypt.checkpw("pwd{}".format(i).encode(),
+                                           user.hashed_password))
+
+
+if __name__ == "__main__":
+    unittest.main()
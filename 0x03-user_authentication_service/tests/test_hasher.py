@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests of the Hasher pool and of the 503 response of the Flask app
+when it is full.
+
+The database lives in a temporary directory and new hashes use
+BCRYPT_ROUNDS=4. Run from the 0x03-user_authentication_service
+directory:
+
+    python3 -m unittest discover tests
+"""
+from unittest import mock
+import asyncio
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("DB_DATA_DIR", tempfile.mkdtemp())
+os.environ.pop("DATABASE_URL", None)
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app import app, AUTH  # noqa: E402
+from hasher import Hasher, Overloaded  # noqa: E402
+import auth  # noqa: E402
+import bcrypt  # noqa: E402
+
+
+class TestHasher(unittest.TestCase):
+    """Hashes on a bounded pool."""
+
+    def setUp(self) -> None:
+        """A pool of one worker and one waiting call."""
+        self.hasher = Hasher(workers=1, queue_size=1, rounds=4)
+
+    def test_hash_and_check(self) -> None:
+        """Hashes are bcrypt hashes of the requested cost."""
+        hashed = self.hasher.hash("secret")
+        self.assertTrue(bcrypt.checkpw(b"secret", hashed))
+        self.assertTrue(hashed.startswith(b"$2b$04$"))
+        self.assertTrue(self.hasher.check("secret", hashed))
+        self.assertFalse(self.hasher.check("other", hashed))
+        self.assertTrue(asyncio.run(
+            self.hasher.check_async("secret", hashed)))
+        self.assertEqual(self.hasher.metrics()["calls"], 4)
+
+    def test_overloaded(self) -> None:
+        """Calls over `workers + queue_size` are refused at once."""
+        self.hasher._slots.acquire()
+        self.hasher._slots.acquire()
+        with self.assertRaises(Overloaded):
+            self.hasher.hash("secret")
+        with self.assertRaises(Overloaded):
+            asyncio.run(self.hasher.hash_async("secret"))
+        metrics = self.hasher.metrics()
+        self.assertEqual(metrics["rejected"], 2)
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.hasher._slots.release()
+        self.hasher.hash("secret")
+
+    def test_map_hash(self) -> None:
+        """Bulk hashes come in order and wait for slots."""
+        passwords = ["password{}".format(i) for i in range(6)]
+        hashes = list(self.hasher.map_hash(passwords))
+        for password, hashed in zip(passwords, hashes):
+            self.assertTrue(bcrypt.checkpw(password.encode(), hashed))
+        self.assertEqual(self.hasher.metrics()["queue_depth"], 0)
+
+
+class TestOverloadedRoute(unittest.TestCase):
+    """503 responses while the hashing queue is full."""
+
+    def setUp(self) -> None:
+        """Register a user."""
+        self.email = "overloaded{}@test.io".format(id(self))
+        AUTH.register_user(self.email, "password")
+        AUTH.close_session()
+
+    def test_flask(self) -> None:
+        """Logins get a 503 with Retry-After."""
+        with mock.patch.object(auth.HASHER, "check",
+                               side_effect=Overloaded):
+            response = app.test_client().post("/sessions", data={
+                "email": self.email, "password": "password"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.assertEqual(response.json, {"message": "server overloaded"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -17,10 +17,12 @@ class User(Base):
         session_id (str): The session ID of the user.
         reset_token (str): The reset token for the user's password reset.
 
+    `email` and `session_id` have unique indexes and `reset_token`
+    a plain one, so that lookups by any of them avoid a table scan.
     """
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True)
-    email = Column(String(250), nullable=False)
+    email = Column(String(250), nullable=False, unique=True, index=True)
     hashed_password = Column(String(250), nullable=False)
-    session_id = Column(String(250), nullable=True)
-    reset_token = Column(String(250), nullable=True)
+    session_id = Column(String(250), nullable=True, unique=True, index=True)
+    reset_token = Column(String(250), nullable=True, index=True)